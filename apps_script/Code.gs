@@ -0,0 +1,75 @@
+// Google Apps Script behind the calculator's "Save data" button.
+//
+// Accepts a JSON array of submission records. Each record is upserted by
+// RowID, so the same batch can be delivered more than once (the Shinylive
+// outbox re-sends when it can't confirm delivery) without creating duplicate
+// rows. Records of the form {"RowID": ..., "Deleted": true} are tombstones and
+// remove the row.
+var COLUMNS = ["RowID", "Timestamp", "BeverageType", "BeverageName", "Recommendation", "Reason"];
+
+function doPost(e) {
+  var records = JSON.parse(e.postData.contents);
+  var lock = LockService.getScriptLock();
+  lock.waitLock(30000);
+  try {
+    var sheet = SpreadsheetApp.getActiveSpreadsheet().getSheets()[0];
+    if (sheet.getLastRow() === 0) {
+      sheet.appendRow(COLUMNS);
+    }
+
+    // RowID -> sheet row number
+    var rowNumbers = {};
+    var lastRow = sheet.getLastRow();
+    if (lastRow > 1) {
+      var ids = sheet.getRange(2, 1, lastRow - 1, 1).getValues();
+      for (var i = 0; i < ids.length; i++) {
+        rowNumbers[ids[i][0]] = i + 2;
+      }
+    }
+
+    var toDelete = [];
+    var toAppend = [];
+    // RowID -> index in toAppend, for rows first seen in this batch
+    var pending = {};
+    records.forEach(function(record) {
+      var rowNumber = rowNumbers[record.RowID];
+      var index = pending[record.RowID];
+      if (record.Deleted) {
+        if (index !== undefined) {
+          // Never reached the sheet: drop the pending append
+          toAppend[index] = null;
+          delete pending[record.RowID];
+        } else if (rowNumber !== undefined) {
+          toDelete.push(rowNumber);
+          delete rowNumbers[record.RowID];
+        }
+        return;
+      }
+      var values = COLUMNS.map(function(column) {
+        return record[column] === null || record[column] === undefined ? "" : record[column];
+      });
+      if (index !== undefined) {
+        toAppend[index] = values;
+      } else if (rowNumber !== undefined) {
+        sheet.getRange(rowNumber, 1, 1, COLUMNS.length).setValues([values]);
+      } else {
+        pending[record.RowID] = toAppend.length;
+        toAppend.push(values);
+      }
+    });
+
+    toAppend = toAppend.filter(function(values) { return values !== null; });
+    if (toAppend.length) {
+      sheet.getRange(sheet.getLastRow() + 1, 1, toAppend.length, COLUMNS.length).setValues(toAppend);
+    }
+    // Delete from the bottom up so row numbers stay valid
+    toDelete.sort(function(a, b) { return b - a; }).forEach(function(rowNumber) {
+      sheet.deleteRow(rowNumber);
+    });
+
+    return ContentService.createTextOutput(JSON.stringify({ok: true}))
+      .setMimeType(ContentService.MimeType.JSON);
+  } finally {
+    lock.releaseLock();
+  }
+}
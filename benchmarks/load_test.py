@@ -0,0 +1,384 @@
+# Load test
+#
+# Drives N simulated kiosk sessions against version2/app.py over the Shiny
+# websocket protocol. The app runs under uvicorn in a subprocess with its own
+# data directory, and Save data goes to a local stub endpoint instead of the
+# Google Sheet. Each session runs a scripted sequence of submits, deletes and
+# saves; every message that arrives while an action is in flight is timed
+# against the moment the action was sent, per output / custom message.
+#
+# Reports p50/p95/p99 latency per action and per output, plus the server's
+# resident memory per connected session (Linux only). With --baseline it
+# exits non-zero when a p95 regresses by more than --tolerance.
+#
+#   python benchmarks/load_test.py [--sessions 20] [--rounds 3]
+#       [--script submit*5,delete,save] [--think 0] [--json results.json]
+#       [--baseline old.json --tolerance 0.25]
+import argparse
+import asyncio
+import http.server
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+import websockets
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "version2")
+
+ACTION_TIMEOUT = 30
+
+# One form per beverage type, cycled through by the submit action
+FORMS = [
+    {"beverage_type": "Milk", "beverage_name": "Chocolate milk", "artificial": "False",
+     "is_flavored": "True", "is_sweetened": "True"},
+    {"beverage_type": "Juice", "beverage_name": "Orange juice", "artificial": "False",
+     "juice_serving_size": 6, "is_100_percent": "True"},
+    {"beverage_type": "Other", "beverage_name": "Sparkling water", "artificial": "False",
+     "total_sugar": 10, "added_sugar": 0},
+]
+
+# Outputs a kiosk on the calculator tab has on screen; the rest stay hidden
+# (and suspended) as they would in the browser
+VISIBLE_OUTPUTS = ["recommendation_image", "recommendation_text"]
+HIDDEN_OUTPUTS = ["summary_totals", "summary_by_type", "summary_by_hour", "summary_by_site"]
+
+ROW_ID = re.compile(r'data-row-id="([^"]+)"')
+
+
+# -- Stub Apps Script endpoint ------------------------------------------------
+
+class StubEndpoint:
+    def __init__(self):
+        self.posts = 0
+        self.bytes = 0
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.posts += 1
+                stub.bytes += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"status":"ok"}')
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/exec"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+
+
+# -- App server ---------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, data_dir, script_url):
+    env = dict(os.environ, SSC_DATA_DIR=data_dir, SSC_SCRIPT_URL=script_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("App server exited:\n" + process.stderr.read().decode())
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("App server did not start")
+
+
+def rss_bytes(pid):
+    """Resident set size of `pid`, or None where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+# -- Simulated session --------------------------------------------------------
+
+def init_message(port, number):
+    return {"method": "init", "data": {
+        "filter_type": "", "filter_result": "", "filter_date": "",
+        ".clientdata_url_protocol": "http:",
+        ".clientdata_url_hostname": "127.0.0.1",
+        ".clientdata_url_port": str(port),
+        ".clientdata_url_pathname": "/",
+        ".clientdata_url_search": f"?site=load-test-{number % 5}",
+        ".clientdata_url_hash_initial": "",
+        ".clientdata_singletons": "",
+        ".clientdata_pixelratio": 1,
+        ".clientdata_allowDataUriScheme": True,
+        **{f".clientdata_output_{name}_hidden": False for name in VISIBLE_OUTPUTS},
+        **{f".clientdata_output_{name}_hidden": True for name in HIDDEN_OUTPUTS},
+    }}
+
+
+def message_keys(message):
+    """The names a server message is timed under."""
+    keys = [f"output:{name}" for name in message.get("values", {})]
+    keys += [f"custom:{name}" for name in message.get("custom", {})]
+    if "notification" in message:
+        keys.append("notification")
+    return keys
+
+
+def is_idle(message):
+    return message.get("busy") == "idle"
+
+
+def save_finished(message):
+    notification = message.get("notification", {})
+    if notification.get("type") != "show":
+        return False
+    return not notification["message"]["html"].startswith("Saving")
+
+
+class Session:
+    def __init__(self, port, number, timings):
+        self.port = port
+        self.number = number
+        self.timings = timings
+        self.row_ids = []
+        self.submits = 0
+        self.events = 0
+        self._messages = asyncio.Queue()
+
+    async def run(self, script, rounds, think, connected, release):
+        headers = {"Cookie": f"ssc_client_id=load-test-{self.number}"}
+        async with websockets.connect(
+            f"ws://127.0.0.1:{self.port}/websocket/", max_size=None, additional_headers=headers
+        ) as ws:
+            reader = asyncio.ensure_future(self._read(ws))
+            try:
+                await self._action("connect", ws, init_message(self.port, self.number), is_idle)
+                await self._action("window", ws, self._update("submissions_window", {
+                    "start": 0, "count": 50, "sort": "Date", "desc": True
+                }), lambda m: "submissions_window" in m.get("custom", {}))
+                for _ in range(rounds):
+                    for step in script:
+                        await getattr(self, step)(ws)
+                        if think:
+                            await asyncio.sleep(think)
+                # Stay connected until every session is done, so memory is
+                # measured with all of them open
+                connected()
+                await release.wait()
+            finally:
+                reader.cancel()
+
+    async def _read(self, ws):
+        async for raw in ws:
+            await self._messages.put((time.perf_counter(), json.loads(raw)))
+
+    def _update(self, name, value):
+        self.events += 1
+        return {"method": "update", "data": {name: value}}
+
+    async def _action(self, name, ws, message, done):
+        # Drop whatever arrived between actions (e.g. hub fan-out)
+        while not self._messages.empty():
+            self._remember_rows(self._messages.get_nowait()[1])
+        sent = time.perf_counter()
+        await ws.send(json.dumps(message))
+        seen = set()
+        deadline = sent + ACTION_TIMEOUT
+        while True:
+            arrived, reply = await asyncio.wait_for(self._messages.get(), deadline - time.perf_counter())
+            self._remember_rows(reply)
+            for key in message_keys(reply):
+                if key not in seen:
+                    seen.add(key)
+                    self.timings[key].append(arrived - sent)
+            if done(reply):
+                self.timings[f"action:{name}"].append(arrived - sent)
+                return reply
+
+    def _remember_rows(self, message):
+        window = message.get("custom", {}).get("submissions_window")
+        if window:
+            self.row_ids = ROW_ID.findall("".join(window["rows"]))
+
+    async def submit(self, ws):
+        form = dict(FORMS[self.submits % len(FORMS)], id=self.submits + 1)
+        self.submits += 1
+        await self._action("submit", ws, self._update("beverage_form", form), is_idle)
+
+    async def delete(self, ws):
+        if not self.row_ids:
+            return
+        row_id = self.row_ids.pop(0)
+        await self._action("delete", ws, self._update("delete_rows", {
+            "id": self.events, "row_ids": [row_id]
+        }), lambda m: "delete_rows_result" in m.get("custom", {}))
+
+    async def save(self, ws):
+        await self._action("save", ws, self._update("save_data", self.events), save_finished)
+
+
+# -- Report -------------------------------------------------------------------
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(timings):
+    return {
+        key: {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+        for key, values in sorted(timings.items())
+    }
+
+
+def parse_script(text):
+    steps = []
+    for part in text.split(","):
+        name, _, repeat = part.strip().partition("*")
+        if name not in ("submit", "delete", "save"):
+            raise SystemExit(f"Unknown script step: {name}")
+        steps += [name] * int(repeat or 1)
+    return steps
+
+
+def compare(results, baseline, tolerance):
+    """p95 regressions beyond `tolerance` compared to a previous run."""
+    regressions = []
+    for key, old in baseline["latency"].items():
+        new = results["latency"].get(key)
+        if new and new["p95"] > old["p95"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {old['p95'] * 1000:.1f}ms -> {new['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+async def run_sessions(port, pid, args):
+    timings = defaultdict(list)
+    release = asyncio.Event()
+    remaining = [args.sessions]
+    all_connected = asyncio.Event()
+
+    def connected():
+        remaining[0] -= 1
+        if not remaining[0]:
+            all_connected.set()
+
+    baseline_rss = rss_bytes(pid)
+    script = parse_script(args.script)
+    sessions = [Session(port, number, timings) for number in range(args.sessions)]
+    start = time.perf_counter()
+    tasks = [
+        asyncio.ensure_future(session.run(script, args.rounds, args.think, connected, release))
+        for session in sessions
+    ]
+    waiter = asyncio.ensure_future(all_connected.wait())
+    done, _ = await asyncio.wait(tasks + [waiter], return_when=asyncio.FIRST_COMPLETED)
+    if waiter not in done:
+        # A session failed before finishing its script
+        release.set()
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    loaded_rss = rss_bytes(pid)
+    release.set()
+    await asyncio.gather(*tasks)
+
+    memory = None
+    if baseline_rss is not None and loaded_rss is not None:
+        memory = {
+            "baseline_rss": baseline_rss,
+            "loaded_rss": loaded_rss,
+            "per_session": (loaded_rss - baseline_rss) / args.sessions,
+        }
+    actions = sum(len(v) for k, v in timings.items() if k.startswith("action:"))
+    return {
+        "sessions": args.sessions,
+        "rounds": args.rounds,
+        "script": args.script,
+        "elapsed": elapsed,
+        "actions_per_second": actions / elapsed,
+        "latency": summarize(timings),
+        "memory": memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated kiosk sessions against version2/app.py")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--script", default="submit*5,delete,save",
+                        help="comma separated steps per round: submit, delete, save (step*N repeats)")
+    parser.add_argument("--think", type=float, default=0, help="seconds between steps")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p95 slowdown against --baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    stub = StubEndpoint()
+    port = free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = start_server(port, data_dir, stub.url)
+        try:
+            results = asyncio.run(run_sessions(port, server.pid, args))
+        finally:
+            server.terminate()
+            server.wait()
+            stub.close()
+    results["stub"] = {"posts": stub.posts, "bytes": stub.bytes}
+
+    print(f"{args.sessions} sessions x {args.rounds} rounds of {args.script}: "
+          f"{results['elapsed']:.2f}s, {results['actions_per_second']:.1f} actions/s")
+    print(f"{'':40}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for key, r in results["latency"].items():
+        print(f"{key:40}{r['count']:>7}" + "".join(f"{r[p] * 1000:>8.1f}ms" for p in ("p50", "p95", "p99")))
+    if results["memory"]:
+        memory = results["memory"]
+        print(f"server RSS {memory['baseline_rss'] / 2**20:.1f} -> {memory['loaded_rss'] / 2**20:.1f} MiB, "
+              f"{memory['per_session'] / 1024:.0f} KiB per session")
+    print(f"stub endpoint: {results['stub']['posts']} posts, {results['stub']['bytes']} bytes")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
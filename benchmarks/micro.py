@@ -0,0 +1,268 @@
+# Micro-benchmarks
+#
+# Times the hot paths that grow with the number of submissions or catalog
+# rows: beverage classification (single, cached and batch), rendering the
+# submissions grid HTML (the whole table and the scrolled window), building
+# the Save data payload, and appending to / deleting from the submissions
+# store. Each benchmark is calibrated to run for at least --min-time per
+# round and repeated --rounds times, pytest-benchmark style; results are
+# written as JSON so runs from different commits can be compared.
+#
+#   python benchmarks/micro.py [--filter grid] [--rounds 7] [--json results.json]
+#       [--compare old.json [--fail-above 0.25]]
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "version2")
+sys.path.insert(0, APP_DIR)
+
+from app import DEFAULT_WINDOW_SIZE, recommend, recommendation_cache, submission_row  # noqa: E402
+from classify import classify_beverage, classify_beverages  # noqa: E402
+from rules import current_rules  # noqa: E402
+from store import SubmissionStore  # noqa: E402
+from sync import SyncTracker  # noqa: E402
+
+SIZES = (10, 1000, 10000)
+
+SINGLE_INPUTS = [
+    ("Milk", {"is_flavored": "True", "is_sweetened": "False", "artificial": "False"}),
+    ("Juice", {"juice_serving_size": 6.0, "is_100_percent": "True"}),
+    ("Other", {"total_sugar": 10.0, "added_sugar": 0.0, "artificial": "False"}),
+]
+
+
+# -- Fixtures -----------------------------------------------------------------
+
+def sample_rows(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6, 8)
+    rows = []
+    for i in range(n):
+        beverage_type = rng.choice(["Juice", "Milk", "Other"])
+        rows.append((
+            f"row-{seed}-{i}",
+            (start + timedelta(seconds=37 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            beverage_type,
+            f"{beverage_type} product {i}",
+            rng.choice(["green", "yellow", "red"]),
+            "Contains added sugar" if rng.random() < 0.5 else None,
+        ))
+    return rows
+
+
+def filled_store(n):
+    store = SubmissionStore()
+    for row in sample_rows(n):
+        store.append(*row)
+    return store
+
+
+def sample_catalog(n, seed=0):
+    rng = random.Random(seed)
+    catalog = {name: [] for name in (
+        "beverage_type", "juice_serving_size", "is_100_percent", "is_flavored",
+        "is_sweetened", "artificial", "total_sugar", "added_sugar"
+    )}
+    for _ in range(n):
+        catalog["beverage_type"].append(rng.choice(["Juice", "Milk", "Other"]))
+        catalog["juice_serving_size"].append(rng.choice([4, 6, 8, 12]))
+        total = rng.uniform(0, 30)
+        catalog["total_sugar"].append(total)
+        catalog["added_sugar"].append(rng.uniform(0, total))
+        for flag in ("is_100_percent", "is_flavored", "is_sweetened", "artificial"):
+            catalog[flag].append(rng.choice(["True", "False"]))
+    return catalog
+
+
+# -- Benchmarks ---------------------------------------------------------------
+# Each entry is (name, setup, run). setup() builds the untimed state; run(state)
+# is what gets timed. Benchmarks that mutate their state set fresh=True so
+# setup runs before every call.
+
+def benchmarks():
+    def classify_single(_):
+        for beverage_type, inputs in SINGLE_INPUTS:
+            classify_beverage(beverage_type, **inputs)
+
+    rules = current_rules()
+
+    def recommend_cached(_):
+        for beverage_type, inputs in SINGLE_INPUTS:
+            recommend(rules, beverage_type, inputs)
+
+    def recommend_uncached(_):
+        recommendation_cache.clear()
+        for beverage_type, inputs in SINGLE_INPUTS:
+            recommend(rules, beverage_type, inputs)
+
+    yield "classify.single", None, classify_single, False
+    yield "classify.recommend_cached", None, recommend_cached, False
+    yield "classify.recommend_uncached", None, recommend_uncached, False
+    for n in SIZES:
+        yield f"classify.batch[{n}]", lambda n=n: sample_catalog(n), classify_beverages, False
+
+    for n in SIZES:
+        def grid_full(store):
+            return [str(submission_row(row)) for row in store.rows_at(store.select())]
+
+        def grid_window(store):
+            positions = store.select(sort_by="Date", descending=True)
+            return [str(submission_row(row)) for row in store.rows_at(positions[:DEFAULT_WINDOW_SIZE])]
+
+        yield f"grid_html.full[{n}]", lambda n=n: filled_store(n), grid_full, False
+        yield f"grid_html.window[{n}]", lambda n=n: filled_store(n), grid_window, False
+
+    for n in SIZES:
+        def save_payload(store):
+            tracker = SyncTracker(store)
+            return json.dumps(tracker.begin())
+
+        yield f"save_payload[{n}]", lambda n=n: filled_store(n), save_payload, False
+
+    for n in SIZES:
+        def append(rows):
+            store = SubmissionStore()
+            for row in rows:
+                store.append(*row)
+
+        def delete(state):
+            store, row_ids = state
+            for row_id in row_ids:
+                store.delete(row_id)
+
+        def delete_many(state):
+            store, row_ids = state
+            store.delete_many(row_ids)
+
+        def shuffled_ids(n):
+            store = filled_store(n)
+            row_ids = [row[0] for row in store.rows()]
+            random.Random(1).shuffle(row_ids)
+            return store, row_ids
+
+        yield f"store.append[{n}]", lambda n=n: sample_rows(n), append, False
+        yield f"store.delete[{n}]", lambda n=n: shuffled_ids(n), delete, True
+        yield f"store.delete_many[{n}]", lambda n=n: shuffled_ids(n), delete_many, True
+
+
+# -- Runner -------------------------------------------------------------------
+
+def measure(setup, run, fresh, rounds, min_time):
+    """Per-call times (seconds) for `rounds` rounds."""
+    if fresh:
+        # One call per round on freshly built state
+        times = []
+        for _ in range(rounds):
+            state = setup()
+            start = time.perf_counter()
+            run(state)
+            times.append(time.perf_counter() - start)
+        return times, 1
+
+    state = setup() if setup else None
+    run(state)
+    # Calibrate calls per round so a round takes at least min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run(state)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            run(state)
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for version2's hot paths")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results from an earlier run to compare against")
+    parser.add_argument("--fail-above", type=float,
+                        help="with --compare, exit non-zero if a median is this much slower (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+
+    results = {}
+    regressions = []
+    print(f"{'':32}{'median':>10}{'min':>10}{'stdev':>10}{'calls':>8}")
+    for name, setup, run, fresh in benchmarks():
+        if args.filter and args.filter not in name:
+            continue
+        times, number = measure(setup, run, fresh, args.rounds, args.min_time)
+        median = statistics.median(times)
+        results[name] = {
+            "median": median,
+            "min": min(times),
+            "mean": statistics.fmean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "rounds": len(times),
+            "calls_per_round": number,
+        }
+        line = (f"{name:32}{format_time(median):>10}{format_time(min(times)):>10}"
+                f"{format_time(results[name]['stdev']):>10}{number:>8}")
+        old = baseline.get(name)
+        if old:
+            change = median / old["median"] - 1
+            line += f"  {change:+.0%} vs {format_time(old['median'])}"
+            if args.fail_above is not None and change > args.fail_above:
+                regressions.append(name)
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "benchmarks": results,
+            }, f, indent=2)
+
+    for name in regressions:
+        print(f"REGRESSION {name}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Startup benchmark
+#
+# Measures cold-start time-to-interactive of version2/app.py: each run is a
+# fresh interpreter that imports the app, builds the App and renders the page
+# HTML, which is the work done before the first page can be served. The
+# "before" column preloads pandas (what the app imported at startup before
+# the submissions store went pandas-free), "after" is the app as it is.
+#
+#   python benchmarks/startup.py [--runs 10] [--json results.json]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "version2")
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+if {preload!r}:
+    import pandas
+import app
+from htmltools import HTMLDocument
+imported = time.perf_counter()
+HTMLDocument(app.app_ui).render()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "render": rendered - imported,
+    "total": rendered - start,
+    "pandas_loaded": "pandas" in sys.modules,
+    "modules": len(sys.modules),
+}}))
+"""
+
+
+def run_once(preload_pandas):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(preload=preload_pandas)],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Wall time includes interpreter startup, which a browser pays as well
+    result["wall"] = time.perf_counter() - start
+    return result
+
+
+def summarize(results):
+    summary = {"pandas_loaded": results[0]["pandas_loaded"], "modules": results[0]["modules"]}
+    for key in ("import", "render", "total", "wall"):
+        summary[key] = statistics.median(r[key] for r in results)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time of version2/app.py with and without pandas")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, preload in (("before", True), ("after", False)):
+        # Warm the OS file cache so both sides are measured the same way
+        run_once(preload)
+        results[name] = summarize([run_once(preload) for _ in range(args.runs)])
+
+    print(f"{'':8}{'import':>10}{'render':>10}{'total':>10}{'wall':>10}{'modules':>9}  pandas")
+    for name, r in results.items():
+        print(f"{name:8}" + "".join(f"{r[k] * 1000:>8.1f}ms" for k in ("import", "render", "total", "wall"))
+              + f"{r['modules']:>9}  {'yes' if r['pandas_loaded'] else 'no'}")
+    saved = results["before"]["wall"] - results["after"]["wall"]
+    print(f"saved {saved * 1000:.1f}ms ({saved / results['before']['wall']:.0%}) of wall time")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
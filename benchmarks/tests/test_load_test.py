@@ -0,0 +1,46 @@
+import pytest
+
+from load_test import compare, message_keys, parse_script, percentile, save_finished, summarize
+
+
+def test_percentile():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 95) == 5
+    assert percentile(values, 0) == 1
+    assert percentile([7], 99) == 7
+
+
+def test_summarize():
+    summary = summarize({"custom:b": [0.2, 0.1], "output:a": [0.3]})
+    assert list(summary) == ["custom:b", "output:a"]
+    assert summary["custom:b"] == {"count": 2, "p50": 0.1, "p95": 0.2, "p99": 0.2}
+
+
+def test_parse_script():
+    assert parse_script("submit*3, delete,save") == ["submit"] * 3 + ["delete", "save"]
+    with pytest.raises(SystemExit):
+        parse_script("submit,dance")
+
+
+def test_compare_flags_p95_regressions_only():
+    baseline = {"latency": {"a": {"p95": 0.100}, "b": {"p95": 0.100}, "gone": {"p95": 0.1}}}
+    results = {"latency": {"a": {"p95": 0.124}, "b": {"p95": 0.130}}}
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("b: p95 100.0ms -> 130.0ms")
+
+
+def test_message_keys():
+    message = {"values": {"summary": {}}, "custom": {"live_feed": {}}, "notification": {}}
+    assert message_keys(message) == ["output:summary", "custom:live_feed", "notification"]
+    assert message_keys({"busy": "idle"}) == []
+
+
+def test_save_finished():
+    def shown(html):
+        return {"notification": {"type": "show", "message": {"html": html}}}
+
+    assert not save_finished(shown("Saving data to Google Sheet..."))
+    assert save_finished(shown("Data saved successfully!"))
+    assert not save_finished({"notification": {"type": "remove", "message": "saving"}})
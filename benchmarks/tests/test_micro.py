@@ -0,0 +1,30 @@
+from micro import benchmarks, filled_store, measure, sample_catalog
+
+
+def test_every_benchmark_runs():
+    names = []
+    for name, setup, run, fresh in benchmarks():
+        # Smallest size only; the others differ in data volume alone
+        if "[" in name and not name.endswith("[10]"):
+            continue
+        names.append(name)
+        run(setup() if setup else None)
+    assert "classify.single" in names
+    assert "store.delete_many[10]" in names
+
+
+def test_samples_are_deterministic():
+    assert sample_catalog(20) == sample_catalog(20)
+    assert len(filled_store(25)) == 25
+
+
+def test_measure():
+    calls = []
+    times, number = measure(None, calls.append, fresh=False, rounds=3, min_time=0.001)
+    assert len(times) == 3
+    assert number >= 1
+    assert len(calls) >= 1 + 3 * number
+
+    setups = []
+    times, number = measure(lambda: setups.append(1), lambda state: None, fresh=True, rounds=4, min_time=1)
+    assert (len(times), number, len(setups)) == (4, 1, 4)
@@ -0,0 +1,21 @@
+// Registers precache-sw.js (Shinylive's service worker plus offline
+// precaching) in place of shinylive/load-shinylive-sw.js.
+const localhostNames = ["localhost", "127.0.0.1", "[::1]"];
+if (window.location.protocol !== "https:" && !localhostNames.includes(window.location.hostname)) {
+  const errorMessage = "Shinylive uses a Service Worker, which requires either a connection to localhost, or a connection via https.";
+  document.body.innerText = errorMessage;
+  throw Error(errorMessage);
+}
+
+if ("serviceWorker" in navigator) {
+  const serviceWorkerPath = new URL("./precache-sw.js", import.meta.url).pathname;
+  navigator.serviceWorker
+    .register(serviceWorkerPath, { type: "module" })
+    .then(() => console.log("Service Worker registered"))
+    .catch(() => console.log("Service Worker registration failed"));
+  navigator.serviceWorker.ready.then(() => {
+    if (!navigator.serviceWorker.controller) {
+      window.location.reload();
+    }
+  });
+}
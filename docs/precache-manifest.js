@@ -0,0 +1,67 @@
+// Generated by tools/build_precache.py; do not edit.
+export default {
+  "version": "72a8225db46343f9",
+  "cachePrefix": "v9::shinyliveServiceworker",
+  "pyodideVersion": "0.27.3",
+  "files": [
+    ["app.json", "64921a08a95f6a90"],
+    ["index.html", "898852f5f3ae302f"],
+    ["assets/goforit-400w.2a6974ce85.webp", "2a6974ce8511ff18"],
+    ["assets/goforit-400w.ed380a9bbe.avif", "ed380a9bbe934da9"],
+    ["assets/goforit-799w.0107eb3107.webp", "0107eb3107417b8d"],
+    ["assets/goforit-799w.eec9102823.avif", "eec9102823375ec3"],
+    ["assets/goforit.d077eca6a9.png", "d077eca6a9bdbb55"],
+    ["assets/guidelines_full-480w.d2950b1876.webp", "d2950b18763aa8b9"],
+    ["assets/guidelines_full-480w.e5a80736f9.avif", "e5a80736f945246b"],
+    ["assets/guidelines_full-940w.38754d8079.avif", "38754d8079ebe47d"],
+    ["assets/guidelines_full-940w.84e23a37a6.webp", "84e23a37a6a8e72f"],
+    ["assets/guidelines_full.3c5dcfd2b5.png", "3c5dcfd2b5d8c626"],
+    ["assets/logo_transparent_background-100w.12b95aa9b9.avif", "12b95aa9b9775b3d"],
+    ["assets/logo_transparent_background-100w.a767b91468.webp", "a767b91468ff5e03"],
+    ["assets/logo_transparent_background-200w.ad0d7c5cdf.avif", "ad0d7c5cdf8e3adc"],
+    ["assets/logo_transparent_background-200w.d8a7af94e7.webp", "d8a7af94e71f4095"],
+    ["assets/logo_transparent_background.9ed374430b.png", "9ed374430b0d3d58"],
+    ["assets/maybenot-400w.53a1e6c874.webp", "53a1e6c8741f7387"],
+    ["assets/maybenot-400w.d7d080de7c.avif", "d7d080de7c7c1d22"],
+    ["assets/maybenot-800w.ac512001d1.avif", "ac512001d1ecc21b"],
+    ["assets/maybenot-800w.cc3574c8a4.webp", "cc3574c8a4ab84bd"],
+    ["assets/maybenot.0a8f3a2186.png", "0a8f3a218641f3e7"],
+    ["assets/oksometimes-400w.22aaedd140.avif", "22aaedd140e2e579"],
+    ["assets/oksometimes-400w.66a5556a5f.webp", "66a5556a5fd5fdf6"],
+    ["assets/oksometimes-800w.2a3c95c5c9.webp", "2a3c95c5c9bd908f"],
+    ["assets/oksometimes-800w.8934c396cf.avif", "8934c396cf40bfb8"],
+    ["assets/oksometimes.0df1567321.png", "0df1567321af435e"],
+    ["assets/snack_guidelines-480w.13b4439c25.webp", "13b4439c257256e7"],
+    ["assets/snack_guidelines-480w.2869bd4437.avif", "2869bd443783ec05"],
+    ["assets/snack_guidelines-940w.0b8df12ff8.webp", "0b8df12ff818cba1"],
+    ["assets/snack_guidelines-940w.3668ed56c2.avif", "3668ed56c2456260"],
+    ["assets/snack_guidelines.8d3e9c749b.png", "8d3e9c749b858178"],
+    ["shinylive/SourceSansPro-Regular.otf-PVQ5ZP77.woff2", "c4eadfb32b246471"],
+    ["shinylive/browser-LBGOSY7M.js", "9d3bc78348f226b0"],
+    ["shinylive/browser-UJESOSMQ.js", "908cbe8a453b3be4"],
+    ["shinylive/chunk-FXX3C5WG.js", "3894c315d6bc1ebc"],
+    ["shinylive/chunk-V7CCVFQU.js", "f30ffc61486fa639"],
+    ["shinylive/load-shinylive-sw.js", "3373429f638e1d93"],
+    ["shinylive/lzstring-worker.js", "9e5cc669a2c9fc63"],
+    ["shinylive/pyodide-worker.js", "3450d5cff0425795"],
+    ["shinylive/shinylive.css", "e932a61eb367116b"],
+    ["shinylive/shinylive.js", "3a94304c6d376d57"],
+    ["shinylive/style-resets.css", "719cacc9ab04a5a1"],
+    ["shinylive/pyodide/anyio-4.4.0-py3-none-any.whl", "c1b2d8f46a8a8125"],
+    ["shinylive/pyodide/htmltools-0.6.0-py3-none-any.whl", "9c0a20a4c91a06f5"],
+    ["shinylive/pyodide/micropip-0.8.0-py3-none-any.whl", "8be261d01ec63c0c"],
+    ["shinylive/pyodide/narwhals-1.12.1-py3-none-any.whl", "e251cb5fe4cabdca"],
+    ["shinylive/pyodide/openssl-1.1.1w.zip", "3a9b7ca64491569e"],
+    ["shinylive/pyodide/orjson-3.10.1-cp312-cp312-pyodide_2024_0_wasm32.whl", "304fe252e6ef5dcd"],
+    ["shinylive/pyodide/packaging-24.2-py3-none-any.whl", "70b0c82fd5049fbc"],
+    ["shinylive/pyodide/pyodide-lock.json", "15915c32ac17bfd9"],
+    ["shinylive/pyodide/pyodide.asm.js", "0ea527c5d589df08"],
+    ["shinylive/pyodide/pyodide_http-0.2.1-py3-none-any.whl", "53cf46105a7b262a"],
+    ["shinylive/pyodide/python_stdlib.zip", "cad21b7df47ac3d6"],
+    ["shinylive/pyodide/shiny-1.3.0-py3-none-any.whl", "2cf4812c1ac2acbc"],
+    ["shinylive/pyodide/sniffio-1.3.1-py3-none-any.whl", "2f6da418d1f1e0fd"],
+    ["shinylive/pyodide/ssl-1.0.0-py2.py3-none-any.whl", "ab685560e77eee7b"],
+    ["shinylive/pyodide/starlette-0.38.1-py3-none-any.whl", "42688a287165bd6a"],
+    ["shinylive/pyodide/typing_extensions-4.11.0-py3-none-any.whl", "06f019e2da1427a5"]
+  ]
+};
@@ -0,0 +1,116 @@
+// Service worker for the exported app
+//
+// Adds offline precaching on top of Shinylive's own service worker. On
+// install every file in precache-manifest.js is stored, reusing files whose
+// hash is unchanged from the previous version's cache instead of downloading
+// them again; those files are then served cache-first. Pyodide packages that
+// aren't needed at startup (the wheels left out of the manifest, and numpy and
+// friends from the jsDelivr CDN) are cached on first use.
+// Everything else, including the app itself, is left to shinylive-sw.js.
+import manifest from "./precache-manifest.js";
+import "./shinylive-sw.js";
+
+const precachePrefix = manifest.cachePrefix + ":precache-";
+const precacheName = precachePrefix + manifest.version;
+const packagesCachePrefix = manifest.cachePrefix + ":pyodide-";
+const packagesCacheName = packagesCachePrefix + manifest.pyodideVersion;
+const cdnUrl = "https://cdn.jsdelivr.net/pyodide/v" + manifest.pyodideVersion + "/";
+
+function scopeUrl(path) {
+  return new URL(path, self.registration.scope).href;
+}
+
+const revisionsUrl = scopeUrl("__precache_revisions__");
+const localPackagesUrl = scopeUrl("shinylive/pyodide/");
+const revisions = new Map(manifest.files.map(([path, revision]) => [scopeUrl(path), revision]));
+
+async function loadRevisions(cache) {
+  const response = await cache.match(revisionsUrl);
+  return response ? new Map(Object.entries(await response.json())) : new Map();
+}
+
+async function precache() {
+  const previous = [];
+  for (const name of await caches.keys()) {
+    if (name.startsWith(precachePrefix) && name !== precacheName) {
+      const cache = await caches.open(name);
+      previous.push([cache, await loadRevisions(cache)]);
+    }
+  }
+
+  const cache = await caches.open(precacheName);
+  await Promise.all(
+    [...revisions].map(async ([url, revision]) => {
+      let response;
+      for (const [oldCache, oldRevisions] of previous) {
+        if (oldRevisions.get(url) === revision) {
+          response = await oldCache.match(url);
+          if (response) break;
+        }
+      }
+      if (!response) {
+        response = await fetch(url, { cache: "no-cache" });
+        if (!response.ok) {
+          throw new Error(`Precaching ${url} failed: ${response.status}`);
+        }
+      }
+      await cache.put(url, response);
+    })
+  );
+  await cache.put(
+    revisionsUrl,
+    new Response(JSON.stringify(Object.fromEntries(revisions)), {
+      headers: { "Content-Type": "application/json" },
+    })
+  );
+}
+
+async function deleteOldCaches() {
+  for (const name of await caches.keys()) {
+    if (
+      (name.startsWith(precachePrefix) && name !== precacheName) ||
+      (name.startsWith(packagesCachePrefix) && name !== packagesCacheName)
+    ) {
+      await caches.delete(name);
+    }
+  }
+}
+
+async function cacheFirst(cacheName, url, request, storeMisses) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(url);
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(request);
+  if (storeMisses && response.ok) {
+    await cache.put(url, response.clone());
+  }
+  return response;
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(precache());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(deleteOldCaches());
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET") return;
+  // Shinylive answers cross-origin-isolated requests itself
+  if (new URL(request.url).searchParams.get("coi") === "1" || request.referrer.includes("coi=1")) return;
+
+  let url = request.url.split(/[?#]/)[0];
+  if (url === scopeUrl("")) {
+    url = scopeUrl("index.html");
+  }
+  if (revisions.has(url)) {
+    event.respondWith(cacheFirst(precacheName, url, request, false));
+  } else if (url.startsWith(cdnUrl) || (url.startsWith(localPackagesUrl) && /\.(whl|zip)$/.test(url))) {
+    // Package file names carry their version, so they never change
+    event.respondWith(cacheFirst(packagesCacheName, url, request, true));
+  }
+});
@@ -0,0 +1,124 @@
+# Image asset pipeline
+#
+# Turns the source PNGs in docs/www into the files version2/app.py serves
+# from /assets: AVIF and WebP variants at a few widths, a PNG fallback and a
+# tiny blurred placeholder (inlined as a data URI). Every output file name
+# carries a hash of its contents, so the files can be cached forever and a
+# changed image gets a new URL. The result is described by
+# version2/assets/manifest.json, which version2/assets.py reads at startup.
+#
+# Requires Pillow built with AVIF support (Pillow >= 11.3 wheels are).
+#
+#   python tools/build_assets.py
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+
+from PIL import Image
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+SOURCE_DIR = os.path.join(ROOT, "docs", "www")
+OUTPUT_DIR = os.path.join(ROOT, "version2", "assets")
+MANIFEST = "manifest.json"
+
+# Source image -> widths to generate (capped at the source width)
+IMAGES = {
+    "goforit.png": (400, 800),
+    "maybenot.png": (400, 800),
+    "oksometimes.png": (400, 800),
+    "snack_guidelines.png": (480, 960),
+    "guidelines_full.png": (480, 960),
+    "logo_transparent_background.png": (100, 200),
+}
+
+FORMATS = {
+    "image/avif": ("avif", {"quality": 60}),
+    "image/webp": ("webp", {"quality": 80, "method": 6}),
+}
+
+PLACEHOLDER_WIDTH = 24
+HASH_LENGTH = 10
+
+
+def _resize(image, width):
+    if width >= image.width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _encode(image, extension, options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=extension.upper(), **options)
+    return buffer.getvalue()
+
+
+def _write(stem, suffix, extension, data, written):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    name = f"{stem}{suffix}.{digest}.{extension}"
+    with open(os.path.join(OUTPUT_DIR, name), "wb") as f:
+        f.write(data)
+    written.add(name)
+    return name
+
+
+def build_image(filename, widths, written):
+    image = Image.open(os.path.join(SOURCE_DIR, filename))
+    image.load()
+    stem = os.path.splitext(filename)[0]
+    widths = sorted({min(width, image.width) for width in widths})
+
+    sources = {}
+    for media_type, (extension, options) in FORMATS.items():
+        sources[media_type] = [
+            [_write(stem, f"-{width}w", extension, _encode(_resize(image, width), extension, options), written), width]
+            for width in widths
+        ]
+
+    if widths[-1] == image.width:
+        # The source PNG is already optimized; re-encoding it only grows it
+        with open(os.path.join(SOURCE_DIR, filename), "rb") as f:
+            fallback = f.read()
+    else:
+        fallback = _encode(_resize(image, widths[-1]), "png", {"optimize": True})
+    fallback_name = _write(stem, "", "png", fallback, written)
+
+    placeholder = _encode(_resize(image, PLACEHOLDER_WIDTH), "webp", {"quality": 40})
+    return {
+        "width": image.width,
+        "height": image.height,
+        "fallback": fallback_name,
+        "sources": sources,
+        "placeholder": "data:image/webp;base64," + base64.b64encode(placeholder).decode("ascii"),
+    }
+
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    written = set()
+    manifest = {}
+    source_bytes = output_bytes = 0
+    for filename, widths in IMAGES.items():
+        manifest[filename] = build_image(filename, widths, written)
+        source_bytes += os.path.getsize(os.path.join(SOURCE_DIR, filename))
+        # What a modern browser downloads: the largest AVIF
+        output_bytes += os.path.getsize(os.path.join(OUTPUT_DIR, manifest[filename]["sources"]["image/avif"][-1][0]))
+
+    with open(os.path.join(OUTPUT_DIR, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+    # Drop files from earlier builds
+    for name in os.listdir(OUTPUT_DIR):
+        if name != MANIFEST and name not in written:
+            os.remove(os.path.join(OUTPUT_DIR, name))
+
+    print(f"{len(manifest)} images, {len(written)} files -> {os.path.relpath(OUTPUT_DIR)}", file=sys.stderr)
+    print(f"source PNGs {source_bytes / 1024:.0f} KiB, largest AVIFs {output_bytes / 1024:.0f} KiB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
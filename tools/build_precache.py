@@ -0,0 +1,126 @@
+# Service worker precache manifest for the Shinylive build in docs/
+#
+# Lists every file the exported app needs to start (the Shinylive runtime, the
+# startup Pyodide wheels and python_stdlib.zip, app.json and the images) with a
+# hash of its contents, and writes it to docs/precache-manifest.js for
+# docs/precache-sw.js. The manifest version is a hash of all entries, so any
+# changed file makes browsers install a new service worker, which downloads
+# only the files whose hash changed.
+#
+# Wheels that build_pyodide_bundle.py deferred are left out; the service
+# worker caches those the first time they are loaded.
+#
+# Run after every tools/export_docs.py and build_pyodide_bundle.py:
+#
+#   python tools/build_precache.py
+import hashlib
+import json
+import os
+import re
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+DOCS_DIR = os.path.join(ROOT, "docs")
+MANIFEST = "precache-manifest.js"
+
+# Only used by the Shinylive editor / Quarto, never by the exported app
+EXCLUDE = {
+    "edit",
+    "shinylive/pyright",
+    "shinylive/Editor.js",
+    "shinylive/Editor.css",
+    "shinylive/run-python-blocks.js",
+    # Source images for tools/build_assets.py; the app uses docs/assets
+    "www",
+    # The service worker scripts are cached by the browser itself
+    "shinylive-sw.js",
+    "precache-sw.js",
+    "load-precache-sw.js",
+    "pyodide-bundle.json",
+    MANIFEST,
+}
+EXCLUDE_SUFFIXES = (".map", ".md", ".txt")
+
+LOADER_TAG = '<script src="./load-precache-sw.js" type="module"></script>'
+SHINYLIVE_LOADER_RE = re.compile(r'<script\s+src="\./shinylive/load-shinylive-sw\.js"\s+type="module"\s*>\s*</script>')
+
+
+def _deferred_wheels():
+    path = os.path.join(DOCS_DIR, "pyodide-bundle.json")
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {"shinylive/pyodide/" + entry["file"] for entry in json.load(f)["deferred"]}
+
+
+def _files():
+    exclude = EXCLUDE | _deferred_wheels()
+    for directory, dirnames, filenames in os.walk(DOCS_DIR):
+        relative_dir = os.path.relpath(directory, DOCS_DIR).replace(os.sep, "/")
+        relative_dir = "" if relative_dir == "." else relative_dir + "/"
+        dirnames[:] = sorted(d for d in dirnames if relative_dir + d not in exclude)
+        for filename in sorted(filenames):
+            path = relative_dir + filename
+            if path not in exclude and not filename.endswith(EXCLUDE_SUFFIXES):
+                yield path
+
+
+def _hash(path):
+    digest = hashlib.sha256()
+    with open(os.path.join(DOCS_DIR, path), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _shinylive_cache_prefix():
+    # Shinylive's service worker deletes every cache whose name doesn't start
+    # with its own prefix when it activates, so ours has to share it
+    with open(os.path.join(DOCS_DIR, "shinylive-sw.js"), encoding="utf-8") as f:
+        source = f.read()
+    cache_name = re.search(r'var cacheName = "([^"]+)"', source).group(1)
+    version = re.search(r'var version = "([^"]+)"', source).group(1)
+    return version + cache_name
+
+
+def _pyodide_version():
+    with open(os.path.join(DOCS_DIR, "shinylive", "pyodide", "pyodide-lock.json"), encoding="utf-8") as f:
+        return json.load(f)["info"]["version"]
+
+
+def _use_precache_loader():
+    path = os.path.join(DOCS_DIR, "index.html")
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+    if LOADER_TAG not in html:
+        html, count = SHINYLIVE_LOADER_RE.subn(LOADER_TAG, html)
+        if not count:
+            sys.exit("docs/index.html: couldn't find the Shinylive service worker loader")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def main():
+    _use_precache_loader()
+    files = [[path, _hash(path)] for path in _files()]
+    sizes = sum(os.path.getsize(os.path.join(DOCS_DIR, path)) for path, _ in files)
+    version = hashlib.sha256(json.dumps(files).encode()).hexdigest()[:16]
+    manifest = {
+        "version": version,
+        "cachePrefix": _shinylive_cache_prefix(),
+        "pyodideVersion": _pyodide_version(),
+        "files": files,
+    }
+    with open(os.path.join(DOCS_DIR, MANIFEST), "w", encoding="utf-8") as f:
+        f.write("// Generated by tools/build_precache.py; do not edit.\n")
+        f.write("export default {\n")
+        for key in ("version", "cachePrefix", "pyodideVersion"):
+            f.write(f"  {json.dumps(key)}: {json.dumps(manifest[key])},\n")
+        f.write('  "files": [\n')
+        f.write(",\n".join(f"    {json.dumps(entry)}" for entry in files))
+        f.write("\n  ]\n};\n")
+    print(f"precache {version}: {len(files)} files, {sizes / 1e6:.1f} MB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
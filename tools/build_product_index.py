@@ -0,0 +1,118 @@
+# Product index builder
+#
+# Builds version2/products.idx, the prefix-searchable product index behind
+# the beverage name autocomplete, from a catalog CSV (by default the sample
+# catalog in tools/product_catalog.csv). The CSV uses the bulk import column
+# names (beverage_name, beverage_type, juice_serving_size, is_100_percent,
+# is_flavored, is_sweetened, artificial, total_sugar, added_sugar, with the
+# same aliases) plus an optional barcode / upc / gtin column.
+#
+# --synthetic N builds an index of N generated products instead, and --check
+# times lookups against the result, e.g. to confirm a 200k product index stays
+# under 10 ms per keystroke:
+#
+#   python tools/build_product_index.py [catalog.csv] [--output path]
+#   python tools/build_product_index.py --synthetic 200000 --output /tmp/products.idx --check
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, "version2"))
+
+from bulk_import import COLUMN_ALIASES  # noqa: E402
+from products import DEFAULT_INDEX, ProductIndex, build_product_index  # noqa: E402
+
+DEFAULT_CATALOG = os.path.join(ROOT, "tools", "product_catalog.csv")
+
+BARCODE_ALIASES = {"upc": "barcode", "gtin": "barcode", "ean": "barcode", "upc_code": "barcode"}
+
+WORDS = [
+    "apple", "berry", "cherry", "citrus", "cola", "cranberry", "grape", "lemon", "lime",
+    "mango", "orange", "peach", "punch", "raspberry", "strawberry", "tropical", "vanilla",
+    "chocolate", "coconut", "ginger", "green", "tea", "coffee", "sparkling", "water",
+]
+SIZES = ["4 fl oz", "6 fl oz", "8 fl oz", "12 fl oz can", "16.9 fl oz", "20 fl oz bottle"]
+
+
+def read_catalog(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            product = {}
+            for name, value in row.items():
+                key = str(name).strip().lower().replace(" ", "_").replace("-", "_")
+                key = BARCODE_ALIASES.get(key, COLUMN_ALIASES.get(key, key))
+                product[key] = value.strip() if isinstance(value, str) else value
+            if product.get("beverage_type"):
+                product["beverage_type"] = product["beverage_type"].capitalize()
+            yield product
+
+
+def synthetic_catalog(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        beverage_type = rng.choice(["Juice", "Milk", "Other"])
+        words = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        total = round(rng.uniform(0, 40), 1)
+        yield {
+            "beverage_name": f"Brand{i % 5000} {words} {beverage_type.lower()} {rng.choice(SIZES)}",
+            "barcode": f"{rng.randrange(10 ** 11, 10 ** 12)}",
+            "beverage_type": beverage_type,
+            "juice_serving_size": rng.choice([4, 6, 8, 10, 12, 15.2]),
+            "is_100_percent": rng.choice(["Yes", "No"]),
+            "is_flavored": rng.choice(["Yes", "No"]),
+            "is_sweetened": rng.choice(["Yes", "No"]),
+            "artificial": rng.choice(["Yes", "No"]),
+            "total_sugar": total,
+            "added_sugar": round(rng.uniform(0, total), 1),
+        }
+
+
+def check(path, queries=2000, seed=1):
+    index = ProductIndex(path)
+    rng = random.Random(seed)
+    samples = [index.get(rng.randrange(len(index))) for _ in range(200)]
+    terms = []
+    for _ in range(queries):
+        product = rng.choice(samples)
+        if "barcode" in product and rng.random() < 0.2:
+            text = product["barcode"]
+        else:
+            text = rng.choice(product["beverage_name"].split())
+        # What the user has typed so far
+        terms.append(text[:rng.randint(1, len(text))])
+
+    times = []
+    for term in terms:
+        start = time.perf_counter()
+        index.search(term)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    p50, p99 = times[len(times) // 2], times[int(len(times) * 0.99)]
+    print(f"{len(times)} lookups over {len(index)} products: p50 {p50 * 1000:.2f}ms, "
+          f"p99 {p99 * 1000:.2f}ms, max {times[-1] * 1000:.2f}ms")
+    index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the product autocomplete index")
+    parser.add_argument("catalog", nargs="?", default=DEFAULT_CATALOG)
+    parser.add_argument("--output", default=DEFAULT_INDEX)
+    parser.add_argument("--synthetic", type=int, help="index this many generated products instead")
+    parser.add_argument("--check", action="store_true", help="time lookups against the built index")
+    args = parser.parse_args()
+
+    products = synthetic_catalog(args.synthetic) if args.synthetic else read_catalog(args.catalog)
+    start = time.perf_counter()
+    count = build_product_index(products, args.output)
+    print(f"Indexed {count} products into {os.path.relpath(args.output)} "
+          f"({os.path.getsize(args.output) / 1024:.0f} KiB) in {time.perf_counter() - start:.1f}s")
+    if args.check:
+        check(args.output)
+
+
+if __name__ == "__main__":
+    main()
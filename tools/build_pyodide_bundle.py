@@ -0,0 +1,275 @@
+# Minimal Pyodide wheel set for the Shinylive build in docs/
+#
+# Shinylive loads, before the app starts, every package the app's source
+# imports anywhere (Pyodide's loadPackagesFromImports) plus everything those
+# packages list as dependencies in pyodide-lock.json, whether or not anything
+# imports them. This works out which of those packages are actually imported
+# while the app starts and reports the bytes and parse time the rest cost.
+#
+# The app is imported natively, but against the pure-Python wheels in the
+# bundle (shiny 1.3 rather than whatever is installed here), with the
+# standard library modules Pyodide unvendors (ssl, sqlite3, lzma, ...)
+# missing, as they are until their package is loaded. One the start-up
+# can't do without is put back and the import retried; the report lists
+# each with the module that needed it.
+#
+# With --apply the unused entries are dropped from the `depends` lists in
+# pyodide-lock.json, so Pyodide skips them at startup. The wheels and their
+# lock entries stay, so they can still be loaded on first use (see
+# version2/lazy.py). Shinylive's worker start-up code imports ssl itself,
+# which loads ssl and openssl (2 MB); when the app starts without ssl,
+# --apply drops that import too. (With the bundled anyio 4.4, which imports
+# ssl when starlette imports it, it can't.)
+#
+# Run after tools/export_docs.py and before build_precache.py:
+#
+#   python tools/build_pyodide_bundle.py [--apply] [--json report.json]
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+APP_DIR = os.path.join(ROOT, "version2")
+APP_JSON = os.path.join(ROOT, "docs", "app.json")
+SHINYLIVE_JS = os.path.join(ROOT, "docs", "shinylive", "shinylive.js")
+PYODIDE_DIR = os.path.join(ROOT, "docs", "shinylive", "pyodide")
+LOCK_FILE = os.path.join(PYODIDE_DIR, "pyodide-lock.json")
+REPORT = os.path.join(ROOT, "docs", "pyodide-bundle.json")
+
+# Imported by Shinylive's own worker start-up code (_pyodide_env_init and
+# _start_app in shinylive.js), so always loaded
+SHINYLIVE_IMPORTS = {"micropip", "pyodide_http", "shiny"}
+
+# ...and ssl, which --apply takes out of _pyodide_env_init if the app
+# doesn't need it
+SHINYLIVE_SSL_IMPORT = re.compile(
+    r"\n[ \t]*# We don't use ssl in this function, but this is needed for Shiny to load\.\n[ \t]*import ssl\n"
+)
+
+# argv[1]: JSON list of the modules to treat as missing
+STARTUP_IMPORTS = r"""
+import importlib.abc, json, sys
+
+missing = set(json.loads(sys.argv[1]))
+
+class Missing(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if name.split(".")[0] in missing:
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+for name in list(sys.modules):
+    if name.split(".")[0] in missing:
+        del sys.modules[name]
+sys.meta_path.insert(0, Missing())
+
+import app
+from htmltools import HTMLDocument
+HTMLDocument(app.app_ui).render()
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+
+def source_imports(app_json):
+    """Top-level names of every import statement in the exported app's .py
+    files, which is what loadPackagesFromImports looks at."""
+    with open(app_json, encoding="utf-8") as f:
+        files = json.load(f)
+    names = set()
+    for entry in files:
+        if not entry["name"].endswith(".py"):
+            continue
+        tree = ast.parse(entry["content"], entry["name"])
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module.split(".")[0])
+    return names
+
+
+def unvendored_modules(packages):
+    """{module: package} for the standard library modules Pyodide ships as
+    separate packages."""
+    return {
+        module: name for name, package in packages.items() if package.get("package_type") == "cpython_module"
+        for module in package.get("imports", [])
+    }
+
+
+MISSING_MODULE = re.compile(r"ModuleNotFoundError: No module named '([\w.]+)'")
+IMPORTED_FROM = re.compile(r'File "([^"]+)", line \d+, in <module>')
+
+
+def startup_imports(directory, wheels, unvendored):
+    """Top-level modules imported while the app in `directory` starts, with
+    the pure-Python `wheels` ahead of the installed packages and the
+    `unvendored` modules ({module: package}) missing unless the start-up
+    needs them. Returns (modules, {needed package: file that imported it})."""
+    needed = {}
+    with tempfile.TemporaryDirectory() as site:
+        for wheel in wheels:
+            with zipfile.ZipFile(wheel) as f:
+                f.extractall(site)
+        env = {**os.environ, "PYTHONPATH": site}
+        while True:
+            missing = sorted(module for module, package in unvendored.items() if package not in needed)
+            result = subprocess.run(
+                [sys.executable, "-c", STARTUP_IMPORTS, json.dumps(missing)],
+                cwd=directory, env=env, capture_output=True, text=True
+            )
+            if not result.returncode:
+                break
+            match = MISSING_MODULE.search(result.stderr)
+            module = match and match.group(1).split(".")[0]
+            if module not in missing:
+                sys.exit(f"The app doesn't start against the bundled packages:\n{result.stderr}")
+            files = IMPORTED_FROM.findall(result.stderr) or ["?"]
+            where = files[-1]
+            needed[unvendored[module]] = (
+                os.path.relpath(where, site) if where.startswith(site + os.sep) else os.path.basename(where)
+            )
+    return set(json.loads(result.stdout.strip().splitlines()[-1])), needed
+
+
+def pure_python_wheels(names, packages):
+    paths = [os.path.join(PYODIDE_DIR, packages[name]["file_name"]) for name in sorted(names)]
+    return [path for path in paths if path.endswith("-none-any.whl") and os.path.exists(path)]
+
+
+def drop_shinylive_ssl_import(path=SHINYLIVE_JS):
+    """Take the ssl import out of Shinylive's worker start-up code; returns
+    False if it isn't there (already dropped, or a Shinylive without it)."""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    source, count = SHINYLIVE_SSL_IMPORT.subn("\n", source)
+    if count:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+    return bool(count)
+
+
+def packages_for(imports, packages):
+    by_import = {}
+    for name, package in packages.items():
+        for module in package.get("imports", []):
+            by_import[module] = name
+    return {by_import[name] for name in imports if name in by_import}
+
+
+def closure(roots, packages, keep=lambda name: True):
+    seen = set()
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        if name in seen or name not in packages:
+            continue
+        seen.add(name)
+        pending.extend(d for d in packages[name].get("depends", []) if keep(d))
+    return seen
+
+
+def parse_seconds(path):
+    """Time to unpack a wheel and compile its Python sources (native CPython;
+    expect several times this under Pyodide on a phone)."""
+    if not zipfile.is_zipfile(path):
+        return 0.0
+    start = time.perf_counter()
+    with zipfile.ZipFile(path) as wheel:
+        for info in wheel.infolist():
+            data = wheel.read(info)
+            if info.filename.endswith(".py"):
+                compile(data, info.filename, "exec", dont_inherit=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Work out the Pyodide packages the app needs at startup")
+    parser.add_argument("--apply", action="store_true", help="drop unused packages from the startup dependencies")
+    parser.add_argument("--json", default=REPORT, help=f"where to write the report (default {os.path.relpath(REPORT)})")
+    args = parser.parse_args()
+
+    with open(LOCK_FILE, encoding="utf-8") as f:
+        lock = json.load(f)
+    packages = lock["packages"]
+
+    roots = packages_for(SHINYLIVE_IMPORTS | source_imports(APP_JSON), packages)
+    wheels = pure_python_wheels(closure(roots, packages), packages)
+    modules, unvendored = startup_imports(APP_DIR, wheels, unvendored_modules(packages))
+    imported = packages_for(modules, packages)
+    if "ssl" in unvendored:
+        # Shinylive's own import of it has to stay, too
+        roots.add("ssl")
+
+    # Shared libraries (openssl for ssl) are never imported by name
+    def needed(name):
+        return name in imported or packages[name].get("package_type") == "shared_library"
+
+    startup = closure(roots, packages, keep=lambda name: name in packages and needed(name))
+    # Everything Shinylive would otherwise load, plus the wheels the export
+    # shipped in docs/ for earlier versions of the app (requests, pandas' deps)
+    bundled = {name for name, package in packages.items()
+               if os.path.exists(os.path.join(PYODIDE_DIR, package["file_name"]))}
+    deferred = sorted((closure(roots, packages) | bundled) - startup)
+
+    report = {
+        "startup": sorted(startup),
+        # Unvendored standard library modules the start-up needs, and where from
+        "unvendored_needed": unvendored,
+        "deferred": [],
+        "bytes_saved": 0,
+        "parse_seconds_saved": 0.0,
+    }
+    for name in deferred:
+        path = os.path.join(PYODIDE_DIR, packages[name]["file_name"])
+        local = os.path.exists(path)
+        entry = {
+            "package": name,
+            "file": packages[name]["file_name"],
+            "bytes": os.path.getsize(path) if local else None,
+            "parse_seconds": round(parse_seconds(path), 4) if local else None,
+        }
+        report["deferred"].append(entry)
+        report["bytes_saved"] += entry["bytes"] or 0
+        report["parse_seconds_saved"] += entry["parse_seconds"] or 0.0
+    report["parse_seconds_saved"] = round(report["parse_seconds_saved"], 4)
+    startup_bytes = sum(
+        os.path.getsize(os.path.join(PYODIDE_DIR, packages[name]["file_name"]))
+        for name in startup
+        if os.path.exists(os.path.join(PYODIDE_DIR, packages[name]["file_name"]))
+    )
+
+    print(f"startup: {len(startup)} packages, {startup_bytes / 1e6:.1f} MB local")
+    for name, where in sorted(unvendored.items()):
+        print(f"  {name} (unvendored) is imported by {where}")
+    print(f"deferred until first use: {len(deferred)} packages")
+    for entry in report["deferred"]:
+        size = f"{entry['bytes'] / 1e3:8.0f} kB" if entry["bytes"] is not None else "     (CDN)"
+        parse = f"{entry['parse_seconds'] * 1000:7.1f} ms" if entry["parse_seconds"] is not None else ""
+        print(f"  {entry['package']:22}{size}{parse}")
+    print(f"saved {report['bytes_saved'] / 1e6:.2f} MB and {report['parse_seconds_saved'] * 1000:.0f} ms "
+          f"of unpack + compile (native)")
+
+    if args.apply:
+        for name in startup:
+            package = packages[name]
+            package["depends"] = [d for d in package.get("depends", []) if d in startup]
+        with open(LOCK_FILE, "w", encoding="utf-8") as f:
+            json.dump(lock, f)
+        print(f"updated {os.path.relpath(LOCK_FILE)}")
+        if "ssl" not in unvendored and drop_shinylive_ssl_import():
+            print(f"updated {os.path.relpath(SHINYLIVE_JS)}")
+
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Shinylive export of version2 into docs/
+#
+# `shinylive export` puts every file in the app directory into docs/app.json,
+# which the browser downloads (base64 for binary files) before the app
+# starts. This exports a staged copy of the app instead, without:
+#
+#   - the server-only modules (multi-worker mode; see lazy.py for how the app
+#     imports them), the tests and local data
+#   - the images: they are copied to docs/assets as plain static files, which
+#     the browser fetches (and caches) only when they are shown, and only in
+#     the format and size it picked from the <picture> (see assets.py)
+#
+# Then run build_pyodide_bundle.py and build_precache.py:
+#
+#   python tools/export_docs.py
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+APP_DIR = os.path.join(ROOT, "version2")
+DOCS_DIR = os.path.join(ROOT, "docs")
+ASSETS = "assets"
+ASSETS_MANIFEST = "manifest.json"
+
+# Never used under Pyodide
+SERVER_ONLY = {"backend.py", "cluster.py", "tests", "data", "__pycache__"}
+
+
+def stage_app(directory):
+    """Copy the app into `directory`, leaving out SERVER_ONLY and the images."""
+    def ignore(path, names):
+        ignored = {name for name in names if name in SERVER_ONLY}
+        if os.path.samefile(path, os.path.join(APP_DIR, ASSETS)):
+            ignored |= {name for name in names if name != ASSETS_MANIFEST}
+        return ignored
+
+    shutil.copytree(APP_DIR, directory, ignore=ignore)
+
+
+def copy_assets():
+    """Mirror the app's images into docs/assets, dropping files no longer built."""
+    source = os.path.join(APP_DIR, ASSETS)
+    target = os.path.join(DOCS_DIR, ASSETS)
+    os.makedirs(target, exist_ok=True)
+    images = {name for name in os.listdir(source) if name != ASSETS_MANIFEST}
+    for name in os.listdir(target):
+        if name not in images:
+            os.remove(os.path.join(target, name))
+    for name in sorted(images):
+        shutil.copy2(os.path.join(source, name), os.path.join(target, name))
+    return len(images)
+
+
+def main():
+    shinylive = shutil.which("shinylive")
+    if shinylive is None:
+        sys.exit("shinylive isn't installed (pip install shinylive)")
+    with tempfile.TemporaryDirectory() as staging:
+        app = os.path.join(staging, "version2")
+        stage_app(app)
+        subprocess.run([shinylive, "export", app, DOCS_DIR], check=True)
+    count = copy_assets()
+    size = os.path.getsize(os.path.join(DOCS_DIR, "app.json"))
+    print(f"app.json: {size / 1e3:.0f} kB; {count} images in docs/{ASSETS}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# The tools are scripts, not a package; put tools/ on the path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
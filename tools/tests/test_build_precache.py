@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import build_precache
+
+SHINYLIVE_LOADER = '<script\n  src="./shinylive/load-shinylive-sw.js"\n  type="module"\n></script>'
+
+
+@pytest.fixture
+def docs(tmp_path, monkeypatch):
+    files = {
+        "index.html": f"<html><head>{SHINYLIVE_LOADER}</head></html>",
+        "app.json": "[]",
+        "shinylive-sw.js": 'var version = "v7";\nvar cacheName = "::shinyliveServiceworker";\n',
+        "precache-sw.js": "",
+        "assets/goforit.0123456789.png": "png",
+        "www/goforit.png": "source png",
+        "edit/index.html": "editor",
+        "shinylive/shinylive.js": "js",
+        "shinylive/shinylive.js.map": "map",
+        "shinylive/pyodide/pyodide-lock.json": json.dumps({"info": {"version": "0.27.3"}}),
+        "shinylive/pyodide/shiny-1.3.0-py3-none-any.whl": "shiny",
+        "shinylive/pyodide/jinja2-3.1.3-py3-none-any.whl": "jinja2",
+        "pyodide-bundle.json": json.dumps({"deferred": [{"file": "jinja2-3.1.3-py3-none-any.whl"}]}),
+    }
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    monkeypatch.setattr(build_precache, "DOCS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def manifest(docs):
+    source = (docs / build_precache.MANIFEST).read_text()
+    body = source[source.index("export default ") + len("export default "):].rstrip().rstrip(";")
+    return json.loads(body)
+
+
+def test_manifest_lists_what_the_app_needs_at_startup(docs):
+    build_precache.main()
+    written = manifest(docs)
+    assert sorted(path for path, _ in written["files"]) == [
+        "app.json",
+        "assets/goforit.0123456789.png",
+        "index.html",
+        "shinylive/pyodide/pyodide-lock.json",
+        "shinylive/pyodide/shiny-1.3.0-py3-none-any.whl",
+        "shinylive/shinylive.js",
+    ]
+    assert written["cachePrefix"] == "v7::shinyliveServiceworker"
+    assert written["pyodideVersion"] == "0.27.3"
+
+
+def test_index_html_loads_the_precache_worker(docs):
+    build_precache.main()
+    html = (docs / "index.html").read_text()
+    assert build_precache.LOADER_TAG in html
+    assert "load-shinylive-sw.js" not in html
+    # Running again changes nothing
+    version = manifest(docs)["version"]
+    build_precache.main()
+    assert (docs / "index.html").read_text() == html
+    assert manifest(docs)["version"] == version
+
+
+def test_version_changes_with_any_file(docs):
+    build_precache.main()
+    version = manifest(docs)["version"]
+    (docs / "app.json").write_text('[{"name": "app.py"}]')
+    build_precache.main()
+    assert manifest(docs)["version"] != version
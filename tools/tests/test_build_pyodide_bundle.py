@@ -0,0 +1,61 @@
+import json
+
+import build_pyodide_bundle as bundle
+
+PACKAGES = {
+    "shiny": {"depends": ["starlette", "markdown-it-py"], "imports": ["shiny"]},
+    "starlette": {"depends": ["anyio"], "imports": ["starlette"]},
+    "anyio": {"depends": ["ssl"], "imports": ["anyio"]},
+    "markdown-it-py": {"depends": [], "imports": ["markdown_it"]},
+    "ssl": {"depends": ["openssl"], "imports": ["ssl", "_ssl"], "package_type": "cpython_module"},
+    "openssl": {"depends": [], "imports": [], "package_type": "shared_library"},
+    "sqlite3": {"depends": [], "imports": ["sqlite3", "_sqlite3"], "package_type": "cpython_module"},
+}
+
+
+def test_closure_and_imports():
+    assert bundle.packages_for({"shiny", "markdown_it", "os"}, PACKAGES) == {"shiny", "markdown-it-py"}
+    assert bundle.closure({"shiny"}, PACKAGES) == {"shiny", "starlette", "anyio", "markdown-it-py", "ssl", "openssl"}
+    assert bundle.closure({"shiny"}, PACKAGES, keep=lambda name: name != "markdown-it-py") == {
+        "shiny", "starlette", "anyio", "ssl", "openssl"
+    }
+    assert bundle.unvendored_modules(PACKAGES) == {
+        "ssl": "ssl", "_ssl": "ssl", "sqlite3": "sqlite3", "_sqlite3": "sqlite3"
+    }
+
+
+def test_source_imports_read_the_exported_app(tmp_path):
+    app_json = tmp_path / "app.json"
+    app_json.write_text(json.dumps([
+        {"name": "app.py", "content": "import os\nfrom shiny import ui\nfrom .local import x\n", "type": "text"},
+        {"name": "helpers.py", "content": "def f():\n    import numpy.linalg\n", "type": "text"},
+        {"name": "data.json", "content": "import nothing", "type": "text"},
+    ]))
+    assert bundle.source_imports(str(app_json)) == {"os", "shiny", "numpy"}
+
+
+def test_startup_imports_put_back_only_the_unvendored_modules_needed(tmp_path):
+    (tmp_path / "app.py").write_text("import json\nimport sqlite3\napp_ui = 'hello'\n")
+    modules, needed = bundle.startup_imports(
+        str(tmp_path), [], {"sqlite3": "sqlite3", "_sqlite3": "sqlite3", "lzma": "lzma", "_lzma": "lzma"}
+    )
+    assert needed == {"sqlite3": "app.py"}
+    assert {"app", "json", "sqlite3"} <= modules
+    assert "lzma" not in modules
+
+
+def test_drop_shinylive_ssl_import(tmp_path):
+    source = tmp_path / "shinylive.js"
+    source.write_text(
+        "def _pyodide_env_init():\n"
+        "    import pyodide_http\n"
+        "\n"
+        "    # We don't use ssl in this function, but this is needed for Shiny to load.\n"
+        "    import ssl\n"
+        "\n"
+        "    pyodide_http.patch_all()\n"
+    )
+    assert bundle.drop_shinylive_ssl_import(str(source))
+    assert "ssl" not in source.read_text()
+    assert "pyodide_http.patch_all()" in source.read_text()
+    assert not bundle.drop_shinylive_ssl_import(str(source))
@@ -0,0 +1,43 @@
+import ast
+import os
+
+import export_docs
+
+
+def imported_modules(directory):
+    names = set()
+    for filename in os.listdir(directory):
+        if filename.endswith(".py"):
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    names.update(alias.name.split(".")[0] for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and node.module:
+                    names.add(node.module.split(".")[0])
+    return names
+
+
+def test_staged_app_leaves_out_server_only_files_and_images(tmp_path):
+    app = tmp_path / "version2"
+    export_docs.stage_app(str(app))
+    names = set(os.listdir(app))
+    assert "app.py" in names and "products.idx" in names
+    assert not names & export_docs.SERVER_ONLY
+    assert os.listdir(app / "assets") == ["manifest.json"]
+
+    # Nothing left in the build imports a module that was left out
+    server_only = {name[:-3] for name in export_docs.SERVER_ONLY if name.endswith(".py")}
+    assert not imported_modules(str(app)) & server_only
+
+
+def test_copy_assets_mirrors_the_images(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_docs, "DOCS_DIR", str(tmp_path))
+    stale = tmp_path / "assets" / "old.0000000000.png"
+    stale.parent.mkdir()
+    stale.write_bytes(b"old")
+
+    count = export_docs.copy_assets()
+    copied = set(os.listdir(tmp_path / "assets"))
+    source = set(os.listdir(os.path.join(export_docs.APP_DIR, "assets"))) - {"manifest.json"}
+    assert copied == source and count == len(source)
@@ -1,37 +1,317 @@
 from datetime import datetime
-import json
-import pandas as pd
-import requests
+import os
+from urllib.parse import parse_qs
 from shiny import App, ui, render, reactive, req
+from htmltools import Tag
 import asyncio
 import uuid  
+from classify import INVALID, classify_beverage, classify_beverages
+from bulk_import import CatalogImportError, iter_catalog_chunks, load_catalog_reader
+from store import SORTABLE_COLUMNS, SubmissionStore
+from sync import SharedSheetSync, SheetSync, SyncTracker
+from persistence import open_browser_submission_log, open_client_submissions
+from cache import LRUCache, normalize_inputs, recommendation_key
+from hub import SubmissionsHub
+from lazy import import_package, is_pyodide
+from products import open_product_index
+from rules import current_rules
+from rollups import DIMENSIONS, RESULTS
+from assets import ASSETS_DIR, ASSETS_PATH, CacheHeadersMiddleware, picture, preload_links
+from metrics import (
+    ACTIVE_SESSIONS, CACHE_ENTRIES, CACHE_HITS, CACHE_MISSES, DELETES, EFFECT_SECONDS,
+    RENDER_SECONDS, SAVES, SESSIONS, SUBMITS, MetricsEndpoint, log_event, logger, setup_logging, timed
+)
+from profiler import profiled_value, watch_session
 
 
 
-# Function to check if we're running in a browser/Shinylive environment
-def is_pyodide_environment():
-    try:
-        import pyodide
-        return True
-    except ImportError:
-        return False
+# Placeholder row for an empty table (also used client-side)
+EMPTY_SUBMISSIONS_ROW = ui.HTML('<tr class="empty-row"><td colspan="6" style="text-align: center;">No data available</td></tr>')
 
-# Initialize empty DataFrame for submissions
-submissions_df = pd.DataFrame(
-    columns=["RowID", "Timestamp", "BeverageType", "BeverageName", "Recommendation", "Reason"]
+# Google Apps Script URL
+SCRIPT_URL = os.environ.get(
+    "SSC_SCRIPT_URL",
+    "https://script.google.com/macros/s/AKfycby6D2dpPUHUrPSzl-mXoVWGuhpYOrORQScpEsWN8zHy_01-0NORjVRgtX0VnvAFkHkHeA/exec"
 )
 
-# Helper function to convert first letter to uppercase
-def str_to_sentence(text):
-    if not text:
-        return ""
-    return text[0].upper() + text[1:].lower()
+# State shared with the other workers in multi-worker mode (SSC_BACKEND, set
+# by cluster.py); None when this process is the whole app. backend.py is
+# server-only and not part of the Shinylive build, so it's imported by name
+shared_backend = import_package("backend").open_backend() if os.environ.get("SSC_BACKEND") else None
+
+# Process-wide Google Sheets sync worker, created on first save
+sheet_sync = None
+
+def get_sheet_sync():
+    global sheet_sync
+    if sheet_sync is None:
+        compress = os.environ.get("SSC_SCRIPT_GZIP") == "1"
+        if shared_backend is not None:
+            sheet_sync = SharedSheetSync(SCRIPT_URL, shared_backend, import_package("backend").worker_id(), compress=compress)
+        else:
+            sheet_sync = SheetSync(SCRIPT_URL, compress=compress)
+    return sheet_sync
+
+# Recommendation images, preloaded so the first result shows without a fetch
+RECOMMENDATION_IMAGES = ["goforit.png", "oksometimes.png", "maybenot.png"]
+RECOMMENDATION_IMAGE_SIZES = "(max-width: 768px) 440px, 800px"
+GUIDELINES_IMAGE_SIZES = "(max-width: 768px) 100vw, 40vw"
+
+# Structured logs (SSC_LOG_LEVEL, SSC_LOG_SAMPLE) through a background queue
+setup_logging()
+
+# Compile the guideline rule table at startup, so a broken table fails here
+# rather than on the first submit; it is reloaded when the file changes
+current_rules()
+
+# Process-wide cache of recommendations, including their rendered HTML
+recommendation_cache = LRUCache(maxsize=1024)
+CACHE_HITS.set_function(lambda: recommendation_cache.hits)
+CACHE_MISSES.set_function(lambda: recommendation_cache.misses)
+CACHE_ENTRIES.set_function(lambda: len(recommendation_cache))
+
+# Read-only product index for the beverage name autocomplete (None if no
+# index file is bundled); shared by every session
+product_index = open_product_index()
+PRODUCT_SUGGESTIONS = 8
+
+# Process-wide log of live submissions from every session, with the result
+# counts for the Summary tab (a replica of the shared log in multi-worker mode)
+hub = SubmissionsHub(backend=shared_backend)
+LIVE_FEED_ROWS = 20
+
+# Classify one beverage and render its recommendation image and text
+def build_recommendation(rules, beverage_type, normalized):
+    classification = classify_beverage(beverage_type, rules, **normalized)
+    image = classification["image"]
+    return {
+        "recommendation": classification["image"],
+        "color": classification["color"],
+        "text_label": classification["label"],
+        "reason": classification["reason"],
+        "image_html": str(ui.tags.div(
+            {"style": "text-align: center;"},
+            picture(image, sizes=RECOMMENDATION_IMAGE_SIZES, class_="recommendation") if image else None
+        )),
+        "text_html": str(ui.tags.p(
+            classification["label"],
+            class_=f"recommendation-text {classification['color']}-result"
+        ))
+    }
+
+def recommend(rules, beverage_type, inputs):
+    normalized = normalize_inputs(rules, beverage_type, inputs)
+    return recommendation_cache.get_or_compute(
+        recommendation_key(rules, beverage_type, normalized),
+        lambda: build_recommendation(rules, beverage_type, normalized)
+    )
+
+# Submissions table columns (RowID is kept on the <tr>, not displayed)
+SUBMISSIONS_TABLE_COLUMNS = ["Date", "Type", "Name", "Result", "Reason", "Actions"]
+
+# Build one submissions table row, keyed by its RowID
+def submission_row(row):
+    row_id, *row_values = row
+    cells = [ui.tags.td(str(value) if value is not None else "") for value in row_values]
+    
+    # Selection checkbox and delete button; the RowID is read from the <tr>
+    select_box = ui.tags.input({"type": "checkbox", "class": "select-row", "aria-label": "Select row"})
+    delete_btn = ui.tags.button(
+        ui.tags.i({"class": "fas fa-trash"}),
+        {"class": "btn btn-sm btn-danger delete-row", "type": "button"}
+    )
+    cells.append(ui.tags.td(select_box, " ", delete_btn))
+    
+    return ui.tags.tr({"data-row-id": row_id}, cells)
+
+# One row of the Summary tab's live feed of submissions from every kiosk
+def live_feed_row(row):
+    row_id, timestamp, beverage_type, beverage_name, recommendation, _ = row
+    return ui.tags.tr(
+        {"data-row-id": row_id},
+        ui.tags.td(timestamp[11:16]),
+        ui.tags.td(beverage_type or ""),
+        ui.tags.td(beverage_name or ""),
+        ui.tags.td({"class": f"{recommendation}-result"}, (recommendation or "").capitalize())
+    )
+
+# Summary tab table of green/yellow/red counts for one rollup dimension
+SUMMARY_TITLES = {"type": "Type", "hour": "Hour", "site": "Site"}
+
+def summary_table(dimension, rows):
+    header = [SUMMARY_TITLES[dimension]] + [result.capitalize() for result in RESULTS] + ["Total"]
+    if rows:
+        body = [ui.tags.tr([ui.tags.td(str(value)) for value in row]) for row in rows]
+    else:
+        body = [ui.tags.tr(ui.tags.td({"colspan": len(header), "style": "text-align: center;"}, "No data available"))]
+    return ui.tags.table(
+        {"class": "table table-sm summary-table"},
+        ui.tags.thead(ui.tags.tr([ui.tags.th(title) for title in header])),
+        ui.tags.tbody(body)
+    )
+
+# The beverage form's fields stay in the browser (not bound as Shiny inputs)
+# until Submit sends them all in one `beverage_form` message
+def unbound_input(tag):
+    if tag.attrs.get("id") and tag.name != "label":
+        tag.attrs["data-shiny-no-bind-input"] = ""
+    for child in tag.children:
+        if isinstance(child, Tag):
+            unbound_input(child)
+    return tag
+
+# Inputs for each beverage type, all rendered up front; switching type only
+# shows another group, so values already entered are kept
+def beverage_inputs():
+    groups = {
+        "Juice": [
+            ui.input_numeric("juice_serving_size", "Serving Size (oz):", min=0, value=None),
+            ui.input_radio_buttons(
+                "is_100_percent",
+                "Is this 100% Juice?",
+                choices={"True": "Yes", "False": "No"},
+                inline=True
+            )
+        ],
+        "Milk": [
+            ui.input_radio_buttons(
+                "is_flavored",
+                "Is the milk flavored?",
+                choices={"True": "Yes", "False": "No"},
+                inline=True
+            ),
+            ui.input_radio_buttons(
+                "is_sweetened",
+                "Is the milk sweetened?",
+                choices={"True": "Yes", "False": "No"},
+                inline=True
+            )
+        ],
+        "Other": [
+            ui.input_numeric("total_sugar", "Total Sugar (grams):", min=0, value=None),
+            ui.input_numeric("added_sugar", "Added Sugar (grams):", min=0, value=None),
+            ui.tags.div(
+                "Note: Added sugar must be less than or equal to total sugar",
+                style="font-size: 0.8em; color: #666; margin-top: 5px;"
+            )
+        ]
+    }
+    return ui.tags.div(
+        {"id": "beverage_inputs"},
+        *[
+            ui.tags.div(
+                {
+                    "class": "beverage-inputs",
+                    "data-beverage-type": beverage_type,
+                    "style": None if beverage_type == "Juice" else "display: none;"
+                },
+                *[unbound_input(field) for field in fields]
+            )
+            for beverage_type, fields in groups.items()
+        ]
+    )
+
+# Column widths, shared by the header table and the scrolling rows table
+SUBMISSIONS_COLUMN_WIDTHS = ["17%", "9%", "20%", "9%", "35%", "10%"]
+
+# Rows per window the client may ask for
+DEFAULT_WINDOW_SIZE = 50
+MAX_WINDOW_SIZE = 200
+
+# Window requests come straight from the client; anything that isn't a
+# whole number falls back to the default
+def window_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+# Delete requests come straight from the client too: (request id, RowIDs),
+# keeping only the RowIDs that are strings (Shiny hands JSON arrays over as
+# tuples)
+def delete_request(request):
+    if not isinstance(request, dict):
+        request = {}
+    row_ids = request.get("row_ids")
+    if not isinstance(row_ids, (list, tuple)):
+        row_ids = []
+    return request.get("id"), [row_id for row_id in row_ids if isinstance(row_id, str)]
+
+# Product autocomplete queries: (request id, query), with the query cut to
+# 100 characters and an id that isn't a number or string dropped
+def product_query_request(request):
+    if not isinstance(request, dict):
+        request = {}
+    query = request.get("q")
+    query = query[:100] if isinstance(query, str) else ""
+    request_id = request.get("id")
+    if not isinstance(request_id, (int, str)):
+        request_id = None
+    return request_id, query
+
+def submissions_colgroup():
+    return ui.tags.colgroup([ui.tags.col(style=f"width: {width};") for width in SUBMISSIONS_COLUMN_WIDTHS])
+
+# Virtualized submissions grid. Only the rows in view are in the DOM; the
+# client asks for windows of rows through the submissions_window input and
+# the server answers with a submissions_window message; store changes then
+# only send the rows new to that window (submissions_window_changes).
+def submissions_grid():
+    header_cells = []
+    for col in SUBMISSIONS_TABLE_COLUMNS:
+        if col in SORTABLE_COLUMNS:
+            header_cells.append(ui.tags.th({"class": "sortable", "data-sort": col}, col, ui.tags.span({"class": "sort-indicator"})))
+        else:
+            header_cells.append(ui.tags.th(col))
+    
+    return ui.tags.div(
+        {"id": "submissions_grid"},
+        ui.tags.div(
+            {"class": "grid-filters"},
+            ui.input_select(
+                "filter_type",
+                "Type:",
+                choices={"": "All", "Juice": "Juice", "Milk": "Milk", "Other": "Other"}
+            ),
+            ui.input_select(
+                "filter_result",
+                "Result:",
+                choices={"": "All", "green": "Green", "yellow": "Yellow", "red": "Red"}
+            ),
+            ui.input_text("filter_date", "Date:", placeholder="YYYY-MM-DD")
+        ),
+        ui.tags.table(
+            {"id": "submissions_header", "class": "table"},
+            submissions_colgroup(),
+            ui.tags.thead(ui.tags.tr(header_cells))
+        ),
+        ui.tags.div(
+            {"id": "submissions_viewport"},
+            ui.tags.div(
+                {"id": "submissions_spacer"},
+                ui.tags.table(
+                    {"id": "submissions_rows", "class": "table table-striped"},
+                    submissions_colgroup(),
+                    ui.tags.tbody({"id": "submissions_tbody"}, EMPTY_SUBMISSIONS_ROW)
+                )
+            )
+        ),
+        ui.tags.div(
+            {"class": "grid-footer"},
+            ui.tags.div({"id": "submissions_count", "class": "text-muted"}, "0 rows"),
+            ui.tags.button(
+                {"id": "delete_selected", "class": "btn btn-sm btn-outline-danger", "type": "button", "disabled": ""},
+                ui.tags.i({"class": "fas fa-trash"}), " Delete selected"
+            )
+        )
+    )
 
 # CSS styles
 css = """
     /* Base styling */
     img.recommendation {
         max-height: 150px; 
+        height: auto;
         width: auto; 
         object-fit: contain;
         margin: 0 auto;
@@ -47,6 +327,98 @@ css = """
         font-weight: bold !important;
     }
     
+    /* Virtualized submissions grid */
+    .grid-filters {
+        display: flex;
+        gap: 8px;
+    }
+    
+    .summary-table td:not(:first-child),
+    .summary-table th:not(:first-child) {
+        text-align: right;
+    }
+    
+    /* Product autocomplete */
+    .product-search {
+        position: relative;
+    }
+    
+    .product-suggestions {
+        position: absolute;
+        left: 0;
+        right: 0;
+        z-index: 100;
+        margin-top: -12px;
+        max-height: 320px;
+        overflow-y: auto;
+        box-shadow: 0 4px 8px rgba(0,0,0,0.15);
+    }
+    
+    .product-suggestions .list-group-item {
+        cursor: pointer;
+        padding: 6px 12px;
+    }
+    
+    .product-suggestions .list-group-item small {
+        color: #666;
+    }
+    
+    .live-feed td {
+        white-space: nowrap;
+        overflow: hidden;
+        text-overflow: ellipsis;
+        max-width: 10em;
+    }
+    
+    .summary-totals {
+        display: flex;
+        gap: 24px;
+        font-size: 1.25rem;
+        margin-bottom: 12px;
+    }
+    
+    .grid-footer {
+        display: flex;
+        justify-content: space-between;
+        align-items: center;
+        margin-top: 6px;
+    }
+    
+    #submissions_header,
+    #submissions_rows {
+        table-layout: fixed;
+        width: 100%;
+        margin-bottom: 0;
+    }
+    
+    #submissions_viewport {
+        height: 400px;
+        overflow-y: auto;
+        position: relative;
+    }
+    
+    #submissions_spacer {
+        position: relative;
+    }
+    
+    #submissions_rows {
+        position: absolute;
+        top: 0;
+        left: 0;
+    }
+    
+    #submissions_rows td {
+        height: 40px;
+        white-space: nowrap;
+        overflow: hidden;
+        text-overflow: ellipsis;
+        vertical-align: middle;
+    }
+    
+    th.sortable {
+        cursor: pointer;
+    }
+    
       /* Delete button styling */
     .delete-row {
         cursor: pointer;
@@ -103,6 +475,11 @@ css = """
         max-height: 90%;
     }
     
+    .lightbox-content.loading {
+        width: 90vmin;
+        filter: blur(12px);
+    }
+    
     .lightbox-close {
         position: absolute;
         top: 15px;
@@ -157,22 +534,37 @@ app_ui = ui.page_fluid(
     ui.tags.head(
         ui.tags.title("SSC Calculator"),
         ui.tags.meta(name="viewport", content="width=device-width, initial-scale=1"),
+        *preload_links(RECOMMENDATION_IMAGES, sizes=RECOMMENDATION_IMAGE_SIZES),
         ui.tags.style(css),
         ui.tags.link(rel="stylesheet", href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css"),
         ui.tags.script(src="https://code.jquery.com/jquery-3.6.0.min.js"),
         ui.tags.script("""
+// Stable id for this browser, used to find its saved submissions
+if (!document.cookie.match(/(^|;\\s*)ssc_client_id=/)) {
+  var clientId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : Date.now() + '-' + Math.random().toString(16).slice(2);
+  document.cookie = 'ssc_client_id=' + clientId + '; path=/; max-age=31536000; SameSite=Lax';
+}
+
 $(document).ready(function() {
   // Click handler for the guidelines image
-  $(document).on('click', '#full_guidelines img, #snack_guidelines img, .clickable-image', function() {
-    var imgSrc = $(this).attr('src');
-    if (!imgSrc) {
-      imgSrc = $(this).find('img').attr('src');
-    }
-    
-    if (imgSrc) {
-      $('#lightbox-img').attr('src', imgSrc);
-      $('#lightbox').css('display', 'flex');
-    }
+  // Shows the blurred placeholder right away and swaps in the full image once loaded
+  $(document).on('click', '.clickable-image', function() {
+    var img = $(this).find('img');
+    var fullSrc = img.data('full') || img.prop('currentSrc') || img.attr('src');
+    if (!fullSrc) return;
+
+    var lightboxImg = $('#lightbox-img');
+    lightboxImg.attr('src', img.data('placeholder') || fullSrc).addClass('loading');
+    lightboxImg.data('pending', fullSrc);
+    $('#lightbox').css('display', 'flex');
+
+    var full = new Image();
+    full.onload = function() {
+      if (lightboxImg.data('pending') === fullSrc) {
+        lightboxImg.attr('src', fullSrc).removeClass('loading');
+      }
+    };
+    full.src = fullSrc;
   });
   
   // Close lightbox when clicking on the X or anywhere outside the image
@@ -187,15 +579,396 @@ $(document).ready(function() {
     e.stopPropagation();
   });
   
+  // Beverage form: switching type only swaps the visible group of inputs;
+  // Submit sends every field the chosen type needs in one message
+  $(document).on('change', '#beverage_type', function() {
+    var beverageType = this.value;
+    $('.beverage-inputs').each(function() {
+      $(this).toggle(this.dataset.beverageType === beverageType);
+    });
+  });
+  
+  function fieldValue(id) {
+    var el = document.getElementById(id);
+    if (!el) return null;
+    if (el.classList.contains('shiny-input-radiogroup')) {
+      var checked = el.querySelector('input[type="radio"]:checked');
+      return checked ? checked.value : null;
+    }
+    if (el.type === 'number') {
+      return el.value === '' || isNaN(el.valueAsNumber) ? null : el.valueAsNumber;
+    }
+    return el.value;
+  }
+  
+  var beverageFormSubmits = 0;
+  $(document).on('click', '#submit', function() {
+    var beverageType = fieldValue('beverage_type');
+    var form = {
+      id: ++beverageFormSubmits,
+      beverage_type: beverageType,
+      beverage_name: fieldValue('beverage_name'),
+      artificial: fieldValue('artificial')
+    };
+    $('.beverage-inputs').filter(function() {
+      return this.dataset.beverageType === beverageType;
+    }).find('[data-shiny-no-bind-input]').each(function() {
+      form[this.id] = fieldValue(this.id);
+    });
+    Shiny.setInputValue('beverage_form', form, {priority: 'event'});
+  });
+  
+  // Product autocomplete: look up what has been typed (debounced), and fill
+  // in the form from the picked product
+  var productSearch = {timer: null, id: 0, items: [], active: -1};
+  
+  function hideProductSuggestions() {
+    productSearch.items = [];
+    productSearch.active = -1;
+    $('#product_suggestions').empty();
+  }
+  
+  $(document).on('input', '#beverage_name', function() {
+    if (!document.getElementById('product_suggestions')) return;
+    clearTimeout(productSearch.timer);
+    var query = this.value.trim();
+    if (query.length < 2) {
+      hideProductSuggestions();
+      return;
+    }
+    productSearch.timer = setTimeout(function() {
+      Shiny.setInputValue('product_query', {id: ++productSearch.id, q: query}, {priority: 'event'});
+    }, 120);
+  });
+  
+  Shiny.addCustomMessageHandler('product_suggestions', function(message) {
+    // Answers to older keystrokes are stale
+    if (message.id !== productSearch.id) return;
+    var list = $('#product_suggestions').empty();
+    productSearch.items = message.items;
+    productSearch.active = -1;
+    message.items.forEach(function(item, i) {
+      var details = [item.beverage_type, item.barcode].filter(Boolean).join(' \u00b7 ');
+      $('<a href="#" class="list-group-item list-group-item-action">')
+        .attr('data-index', i)
+        .text(item.beverage_name)
+        .append(details ? $('<small>').text(' ' + details) : null)
+        .appendTo(list);
+    });
+  });
+  
+  function setRadio(id, value) {
+    if (value !== undefined) $('#' + id + ' input[value="' + value + '"]').prop('checked', true);
+  }
+  
+  function pickProduct(item) {
+    $('#beverage_name').val(item.beverage_name);
+    if (item.beverage_type) $('#beverage_type').val(item.beverage_type).trigger('change');
+    ['juice_serving_size', 'total_sugar', 'added_sugar'].forEach(function(id) {
+      if (item[id] !== undefined) $('#' + id).val(item[id]);
+    });
+    ['is_100_percent', 'is_flavored', 'is_sweetened', 'artificial'].forEach(function(id) {
+      setRadio(id, item[id]);
+    });
+    hideProductSuggestions();
+  }
+  
+  $(document).on('mousedown', '#product_suggestions .list-group-item', function(e) {
+    e.preventDefault();
+    pickProduct(productSearch.items[this.dataset.index]);
+  });
+  
+  $(document).on('keydown', '#beverage_name', function(e) {
+    var count = productSearch.items.length;
+    if (!count) return;
+    if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+      e.preventDefault();
+      productSearch.active = (productSearch.active + (e.key === 'ArrowDown' ? 1 : count - 1)) % count;
+      $('#product_suggestions .list-group-item').removeClass('active')
+        .eq(productSearch.active).addClass('active');
+    } else if (e.key === 'Enter' && productSearch.active >= 0) {
+      e.preventDefault();
+      pickProduct(productSearch.items[productSearch.active]);
+    } else if (e.key === 'Escape') {
+      hideProductSuggestions();
+    }
+  });
+  
+  $(document).on('blur', '#beverage_name', hideProductSuggestions);
+  
   // Handle tab navigation
   $(document).on('click', '.nav-link', function() {
     let target = $(this).data('value');
     $('.tab-content').hide();
-    $('#' + target).show();
+    $('#' + target).show().trigger('shown');
     $('.nav-link').removeClass('active');
     $(this).addClass('active');
+    if (target === 'beverages') {
+      requestSubmissionsWindow(true);
+    }
+  });
+  
+  // Virtualized submissions grid. The server filters and sorts; we only ask
+  // for the window of rows around the scroll position.
+  var grid = {rowHeight: 41, overscan: 15, start: 0, count: 0, total: 0, requested: null, sort: 'Date', desc: false};
+  
+  function requestSubmissionsWindow(force) {
+    var viewport = document.getElementById('submissions_viewport');
+    if (!viewport || !window.Shiny || !Shiny.setInputValue) return;
+    var visible = Math.ceil(viewport.clientHeight / grid.rowHeight) + 1;
+    var first = Math.floor(viewport.scrollTop / grid.rowHeight);
+    var last = Math.min(first + visible, grid.total);
+    // Still covered by the rows we have
+    if (!force && first >= grid.start && last <= grid.start + grid.count) return;
+    var start = Math.max(0, first - grid.overscan);
+    var request = {start: start, count: visible + 2 * grid.overscan, sort: grid.sort, desc: grid.desc};
+    if (!force && grid.requested && grid.requested.start === start) return;
+    grid.requested = request;
+    Shiny.setInputValue('submissions_window', request, {priority: 'event'});
+  }
+  
+  // Rows hidden by a delete the server hasn't confirmed yet (RowID -> request
+  // id), and rows ticked for "Delete selected" (kept by RowID across windows)
+  var pendingDeletes = {};
+  var selectedRows = {};
+  var deleteRequestId = 0;
+  
+  function rowsById(rowId) {
+    return $('#submissions_tbody tr').filter(function() { return this.dataset.rowId === rowId; });
+  }
+  
+  function updateGridFooter() {
+    $('#submissions_count').text(grid.total + (grid.total === 1 ? ' row' : ' rows'));
+    var selected = Object.keys(selectedRows).length;
+    $('#delete_selected').prop('disabled', selected === 0)
+      .contents().last().replaceWith(selected ? ' Delete selected (' + selected + ')' : ' Delete selected');
+  }
+  
+  // Show a window of rows: <tr> elements (new, or already in the table), or
+  // null for a row that was deleted here and isn't in the table any more
+  function showSubmissionsWindow(total, start, rows) {
+    var tbody = $('#submissions_tbody');
+    var present = rows.filter(Boolean);
+    tbody.children().detach();
+    if (total) {
+      tbody.append(present);
+    } else {
+      tbody.html('<tr class="empty-row"><td colspan="6" style="text-align: center;">No data available</td></tr>');
+    }
+    // Keep optimistically deleted rows hidden, and ticked rows ticked
+    var hidden = rows.length - present.length;
+    tbody.find('tr[data-row-id]').each(function() {
+      if (pendingDeletes[this.dataset.rowId]) {
+        $(this).remove();
+        hidden++;
+      } else if (selectedRows[this.dataset.rowId]) {
+        $(this).find('.select-row').prop('checked', true);
+      }
+    });
+    var firstRow = tbody.find('tr')[0];
+    if (firstRow && firstRow.getBoundingClientRect().height) {
+      grid.rowHeight = firstRow.getBoundingClientRect().height;
+    }
+    grid.start = start;
+    grid.count = rows.length;
+    grid.total = total - hidden;
+    $('#submissions_spacer').css('height', Math.max(total, 1) * grid.rowHeight + 'px');
+    $('#submissions_rows').css('transform', 'translateY(' + start * grid.rowHeight + 'px)');
+    updateGridFooter();
+  }
+  
+  Shiny.addCustomMessageHandler('submissions_window', function(message) {
+    grid.requested = null;
+    showSubmissionsWindow(message.total, message.start, $(message.rows.join('')).filter('tr').toArray());
+  });
+  
+  // The store changed: same window, new RowIDs; only new rows come as markup
+  Shiny.addCustomMessageHandler('submissions_window_changes', function(message) {
+    var kept = {};
+    $('#submissions_tbody tr[data-row-id]').each(function() { kept[this.dataset.rowId] = this; });
+    showSubmissionsWindow(message.total, message.start, message.row_ids.map(function(rowId) {
+      if (kept[rowId]) return kept[rowId];
+      return message.rows[rowId] ? $(message.rows[rowId]).filter('tr')[0] : null;
+    }));
+  });
+  
+  // Deletes are optimistic: the rows disappear right away and come back if
+  // the server doesn't confirm them
+  function deleteRows(rowIds) {
+    if (!rowIds.length) return;
+    var id = ++deleteRequestId;
+    rowIds.forEach(function(rowId) {
+      pendingDeletes[rowId] = id;
+      delete selectedRows[rowId];
+      if (rowsById(rowId).remove().length) {
+        grid.total = Math.max(grid.total - 1, 0);
+      }
+    });
+    updateGridFooter();
+    Shiny.setInputValue('delete_rows', {id: id, row_ids: rowIds}, {priority: 'event'});
+  }
+  
+  // Live feed on the Summary tab: newest rows first, trimmed to message.limit
+  Shiny.addCustomMessageHandler('live_feed', function(message) {
+    var feed = $('#live_feed');
+    message.deleted.forEach(function(rowId) {
+      feed.find('tr').filter(function() { return this.dataset.rowId === rowId; }).remove();
+    });
+    feed.prepend(message.rows.slice().reverse().join(''));
+    feed.find('tr').slice(message.limit).remove();
+  });
+  
+  Shiny.addCustomMessageHandler('delete_rows_result', function(message) {
+    message.deleted.concat(message.rejected).forEach(function(rowId) {
+      if (pendingDeletes[rowId] === message.id) delete pendingDeletes[rowId];
+    });
+    // Reconcile: show whatever the server still has
+    if (message.rejected.length) {
+      requestSubmissionsWindow(true);
+    }
+  });
+  
+  $(document).on('click', '#submissions_tbody .delete-row', function() {
+    deleteRows([$(this).closest('tr')[0].dataset.rowId]);
+  });
+  
+  $(document).on('change', '#submissions_tbody .select-row', function() {
+    var rowId = $(this).closest('tr')[0].dataset.rowId;
+    if (this.checked) {
+      selectedRows[rowId] = true;
+    } else {
+      delete selectedRows[rowId];
+    }
+    updateGridFooter();
+  });
+  
+  $(document).on('click', '#delete_selected', function() {
+    var rowIds = Object.keys(selectedRows);
+    if (rowIds.length > 1 && !window.confirm('Delete ' + rowIds.length + ' submissions?')) return;
+    deleteRows(rowIds);
+  });
+  
+  var scrollScheduled = false;
+  $('#submissions_viewport').on('scroll', function() {
+    if (scrollScheduled) return;
+    scrollScheduled = true;
+    window.requestAnimationFrame(function() {
+      scrollScheduled = false;
+      requestSubmissionsWindow(false);
+    });
+  });
+  
+  // Sort by clicking a header; clicking again flips the direction
+  $(document).on('click', '#submissions_header th.sortable', function() {
+    var sort = $(this).data('sort');
+    grid.desc = grid.sort === sort ? !grid.desc : false;
+    grid.sort = sort;
+    $('#submissions_header .sort-indicator').text('');
+    $(this).find('.sort-indicator').text(grid.desc ? ' \u25BC' : ' \u25B2');
+    $('#submissions_viewport').scrollTop(0);
+    requestSubmissionsWindow(true);
+  });
+  
+  // New filters start from the top, with nothing selected
+  $(document).on('shiny:inputchanged', function(e) {
+    if (e.name === 'filter_type' || e.name === 'filter_result' || e.name === 'filter_date') {
+      $('#submissions_viewport').scrollTop(0);
+      selectedRows = {};
+      updateGridFooter();
+    }
+  });
+  
+  $(document).on('shiny:connected', function() {
+    requestSubmissionsWindow(true);
   });
   
+  // Offline outbox for Shinylive saves. Records are kept in localStorage keyed
+  // by RowID, so repeated saves coalesce, and everything pending goes out as
+  // one request whenever the browser is online. no-cors responses are opaque,
+  // so a resolved fetch counts as delivered; the sheet dedupes by RowID, which
+  // makes re-sending after an uncertain delivery safe.
+  var OUTBOX_KEY = 'ssc_outbox';
+  var outbox = {flushing: false, timer: null, delay: 5000};
+  
+  function loadOutbox() {
+    try {
+      return JSON.parse(localStorage.getItem(OUTBOX_KEY)) || {url: null, records: {}};
+    } catch (e) {
+      return {url: null, records: {}};
+    }
+  }
+  
+  function saveOutbox(pending) {
+    try {
+      localStorage.setItem(OUTBOX_KEY, JSON.stringify(pending));
+    } catch (e) {
+      $('#outbox_status').text('Could not store unsent data on this device: ' + e.message);
+      return false;
+    }
+    showOutboxStatus(pending);
+    return true;
+  }
+  
+  function showOutboxStatus(pending) {
+    var count = Object.keys(pending.records).length;
+    $('#outbox_status').text(count ? count + (count === 1 ? ' change' : ' changes') + ' waiting to upload' : '');
+  }
+  
+  function scheduleOutboxFlush(delay) {
+    clearTimeout(outbox.timer);
+    outbox.timer = setTimeout(flushOutbox, delay);
+  }
+  
+  function flushOutbox() {
+    if (outbox.flushing || !navigator.onLine) return;
+    var pending = loadOutbox();
+    var ids = Object.keys(pending.records);
+    if (!ids.length || !pending.url) return;
+    var batch = ids.map(function(id) { return pending.records[id]; });
+    var sent = ids.map(function(id) { return JSON.stringify(pending.records[id]); });
+    
+    outbox.flushing = true;
+    fetch(pending.url, {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify(batch),
+      mode: 'no-cors'
+    }).then(function() {
+      // Drop what we sent, unless it was re-queued with new content meanwhile
+      var current = loadOutbox();
+      ids.forEach(function(id, i) {
+        if (current.records[id] && JSON.stringify(current.records[id]) === sent[i]) {
+          delete current.records[id];
+        }
+      });
+      saveOutbox(current);
+      outbox.delay = 5000;
+      if (Object.keys(current.records).length) scheduleOutboxFlush(0);
+    }).catch(function() {
+      // Offline or the request failed; back off and try again
+      outbox.delay = Math.min(outbox.delay * 2, 300000);
+      scheduleOutboxFlush(outbox.delay);
+    }).finally(function() {
+      outbox.flushing = false;
+    });
+  }
+  
+  Shiny.addCustomMessageHandler('outbox_enqueue', function(message) {
+    var pending = loadOutbox();
+    pending.url = message.url;
+    message.records.forEach(function(record) {
+      pending.records[record.RowID] = record;
+    });
+    saveOutbox(pending);
+    // Short delay so back-to-back saves go out as one request
+    scheduleOutboxFlush(1000);
+  });
+  
+  window.addEventListener('online', function() { scheduleOutboxFlush(0); });
+  setInterval(flushOutbox, 60000);
+  showOutboxStatus(loadOutbox());
+  scheduleOutboxFlush(0);
+  
   // Initialize first tab as active
   $('.nav-link:first').addClass('active');
   $('.tab-content:first').show();
@@ -212,7 +985,7 @@ $(document).ready(function() {
                 {"class": "col-12 d-flex justify-content-between align-items-center"},
                 # Logo on left
                 ui.tags.div(
-                    ui.tags.img(src="https://raw.githubusercontent.com/brendensm/calc-test/main/www/logo_transparent_background.png", height="50px", style="margin-right:10px;")
+                    picture("logo_transparent_background.png", sizes="90px", style="height:50px; width:auto; margin-right:10px;")
                 ),
                 # Navigation tabs on right
                 ui.tags.ul(
@@ -225,6 +998,10 @@ $(document).ready(function() {
                         {"class": "nav-item"},
                         ui.tags.a("Snacks", {"class": "nav-link", "data-value": "snacks"})
                     ),
+                    ui.tags.li(
+                        {"class": "nav-item"},
+                        ui.tags.a("Summary", {"class": "nav-link", "data-value": "summary"})
+                    ),
                     ui.tags.li(
                         {"class": "nav-item"},
                         ui.tags.a("About", {"class": "nav-link", "data-value": "about"})
@@ -269,23 +1046,29 @@ $(document).ready(function() {
                             "The SSC Beverage Calculator can then be used to determine if a USDA-compliant beverage is in ",
                             "the green or yellow category."
                         ),
-                        ui.input_select(
+                        unbound_input(ui.input_select(
                             "beverage_type",
                             "Select Beverage Type:",
                             choices=["Juice", "Milk", "Other"]
+                        )),
+                        ui.tags.div(
+                            {"class": "product-search"},
+                            unbound_input(ui.input_text(
+                                "beverage_name",
+                                "Beverage Name:",
+                                placeholder="Optional; type a name or barcode to look it up"
+                                if product_index is not None else "Optional"
+                            )),
+                            ui.tags.div({"id": "product_suggestions", "class": "list-group product-suggestions"})
+                            if product_index is not None else None
                         ),
-                        ui.input_text(
-                            "beverage_name",
-                            "Beverage Name:",
-                            placeholder="Optional"
-                        ),
-                        ui.input_radio_buttons(
+                        unbound_input(ui.input_radio_buttons(
                             "artificial",
                             ui.HTML("Does this contain artificial sweeteners?<sup>1</sup>"),
                             choices={"True": "Yes", "False": "No"},
                             inline=True
-                        ),
-                        ui.output_ui("dynamic_inputs"),
+                        )),
+                        beverage_inputs(),
                         ui.tags.h6(
                             ui.HTML("<sup>1</sup>Artificial sweeteners include acesulfame potassium, advantame, aspartame, neotame, saccharin, and sucralose. Stevia and monk fruit are not considered to be artificial sweeteners."),
                             style="font-size:.8em; font-weight:normal;"
@@ -293,20 +1076,52 @@ $(document).ready(function() {
                         ui.hr(),
                         ui.tags.div(
                             {"class": "button-container"},
-                            ui.input_action_button("submit", "Submit", class_="btn-primary"),
+                            unbound_input(ui.input_action_button("submit", "Submit", class_="btn-primary")),
                             ui.input_action_button(
                                 "save_data", "Save data", 
                                 class_="btn-success", 
                                 icon=ui.tags.i({"class": "fas fa-download"})
-                            ),
-                            
-                
+                            )
+                        ),
+                        ui.tags.div(
+                            {"id": "outbox_status", "class": "text-muted", "style": "font-size: 0.8em;"}
                         )
 
                     )
+                ),
+
+                # Bulk upload card
+                ui.tags.div(
+                    {"class": "card mt-3"},
+                    ui.tags.div(
+                        {"class": "card-header"},
+                        "Bulk Upload"
+                    ),
+                    ui.tags.div(
+                        {"class": "card-body"},
+                        ui.p(
+                            "Upload a CSV or Parquet catalog with the columns ",
+                            ui.tags.code("beverage_type"), ", ",
+                            ui.tags.code("beverage_name"), ", ",
+                            ui.tags.code("juice_serving_size"), ", ",
+                            ui.tags.code("is_100_percent"), ", ",
+                            ui.tags.code("is_flavored"), ", ",
+                            ui.tags.code("is_sweetened"), ", ",
+                            ui.tags.code("artificial"), ", ",
+                            ui.tags.code("total_sugar"), " and ",
+                            ui.tags.code("added_sugar"), ".",
+                            style="font-size: 0.9em;"
+                        ),
+                        ui.input_file(
+                            "catalog_file",
+                            "Beverage catalog:",
+                            accept=[".csv", ".parquet", ".pq"],
+                            multiple=False
+                        )
+                    )
                 )
             ),
-            
+
             # Column for results
             ui.tags.div(
                 {"class": "col-12 col-md-8"},
@@ -334,7 +1149,7 @@ $(document).ready(function() {
                     ),
                     ui.tags.div(
                         {"class": "card-body table-wrapper"},
-                        ui.output_ui("submissions_table")
+                        submissions_grid()
                     )
                 )
             )
@@ -381,11 +1196,7 @@ $(document).ready(function() {
                         {"class": "card-body"},
                         ui.tags.div(
                             {"id": "snack_guidelines", "class": "clickable-image"},
-                            ui.tags.img(
-                                src="https://raw.githubusercontent.com/brendensm/calc-test/main/www/snack_guidelines.png",
-                                width="100%",
-                                class_="guidelines-img"
-                            )
+                            picture("snack_guidelines.png", sizes=GUIDELINES_IMAGE_SIZES, class_="guidelines-img")
                         )
                     )
                 )
@@ -393,7 +1204,49 @@ $(document).ready(function() {
         )
     ),
     
-    # 3. About Tab
+    # 3. Summary Tab
+    ui.tags.div(
+        {"id": "summary", "class": "tab-content container-fluid", "style": "display: none;"},
+        ui.tags.div(
+            {"class": "row mt-3"},
+            ui.tags.div(
+                {"class": "col-12"},
+                ui.tags.h2("Summary"),
+                ui.tags.p({"class": "text-muted"}, "Live results from every kiosk"),
+                ui.output_ui("summary_totals")
+            )
+        ),
+        ui.tags.div(
+            {"class": "row"},
+            *[
+                ui.tags.div(
+                    {"class": "col-md-3 col-12"},
+                    ui.tags.div(
+                        {"class": "card"},
+                        ui.tags.div({"class": "card-header"}, f"By {SUMMARY_TITLES[dimension].lower()}"),
+                        ui.tags.div({"class": "card-body"}, ui.output_ui(f"summary_by_{dimension}"))
+                    )
+                )
+                for dimension in DIMENSIONS
+            ],
+            ui.tags.div(
+                {"class": "col-md-3 col-12"},
+                ui.tags.div(
+                    {"class": "card"},
+                    ui.tags.div({"class": "card-header"}, "Latest submissions"),
+                    ui.tags.div(
+                        {"class": "card-body"},
+                        ui.tags.table(
+                            {"class": "table table-sm live-feed"},
+                            ui.tags.tbody({"id": "live_feed"})
+                        )
+                    )
+                )
+            )
+        )
+    ),
+    
+    # 4. About Tab
     ui.tags.div(
         {"id": "about", "class": "tab-content container-fluid", "style": "display: none;"},
         ui.tags.div(
@@ -455,11 +1308,7 @@ $(document).ready(function() {
                         {"class": "card-body"},
                         ui.tags.div(
                             {"id": "full_guidelines", "class": "clickable-image"},
-                            ui.tags.img(
-                                src="https://raw.githubusercontent.com/brendensm/calc-test/main/www/guidelines_full.png",
-                                width="100%",
-                                class_="guidelines-img"
-                            )
+                            picture("guidelines_full.png", sizes=GUIDELINES_IMAGE_SIZES, class_="guidelines-img")
                         )
                     )
                 )
@@ -479,313 +1328,218 @@ $(document).ready(function() {
 )
 
 def server(input, output, session):
-    # Store submissions in a reactive value
-    submissions = reactive.Value(submissions_df)
-    
-    # Dynamic inputs based on beverage type
-    @output
-    @render.ui
-    def dynamic_inputs():
-        beverage_type = input.beverage_type()
-        
-        if beverage_type == "Juice":
-            return ui.div(
-                ui.input_numeric("juice_serving_size", "Serving Size (oz):", min=0, value=None),
-                ui.input_radio_buttons(
-                    "is_100_percent",
-                    "Is this 100% Juice?",
-                    choices={"True": "Yes", "False": "No"},
-                    inline=True
-                )
-            )
-        elif beverage_type == "Milk":
-            return ui.div(
-                ui.input_radio_buttons(
-                    "is_flavored",
-                    "Is the milk flavored?",
-                    choices={"True": "Yes", "False": "No"},
-                    inline=True
-                ),
-                ui.input_radio_buttons(
-                    "is_sweetened",
-                    "Is the milk sweetened?",
-                    choices={"True": "Yes", "False": "No"},
-                    inline=True
-                )
-            )
-        elif beverage_type == "Other":
-            return ui.div(
-                ui.input_numeric("total_sugar", "Total Sugar (grams):", min=0, value=None),
-                ui.input_numeric("added_sugar", "Added Sugar (grams):", min=0, value=None),
-                ui.tags.div(
-                    "Note: Added sugar must be less than or equal to total sugar",
-                    style="font-size: 0.8em; color: #666; margin-top: 5px;"
-                )
+    # Store submissions in a columnar store. The store itself is mutated in
+    # place; submissions_version is the reactive signal that it changed.
+    # On a server every session (tab) of one client shares the client's
+    # store, sync tracker and log, and a change in any of them signals all.
+    def on_submissions_changed():
+        submissions_version.set(submissions.version)
+
+    client = None
+    client_error = None
+    if not is_pyodide():
+        try:
+            client = open_client_submissions(
+                session.http_conn.cookies.get("ssc_client_id"),
+                on_submissions_changed,
+                backend=shared_backend
             )
-        else:
-            return ui.div()
+        except (OSError, ValueError) as e:
+            client_error = e
 
-    # Helper function to validate inputs
-    def validate_inputs(beverage_type):
-        if beverage_type == "Juice":
-            juice_size = input.juice_serving_size()
-            if juice_size is None or juice_size <= 0:
-                ui.notification_show(
-                    "Please enter a valid serving size greater than 0",
-                    type="error"
-                )
-                return False
-        elif beverage_type == "Other":
-            total_sugar = input.total_sugar()
-            added_sugar = input.added_sugar()
-            
-            if total_sugar is None or total_sugar < 0:
-                ui.notification_show(
-                    "Please enter a valid total sugar amount (0 or greater)",
-                    type="error"
-                )
-                return False
-                
-            if added_sugar is None or added_sugar < 0:
-                ui.notification_show(
-                    "Please enter a valid added sugar amount (0 or greater)",
-                    type="error"
-                )
-                return False
-                
-            if added_sugar > total_sugar:
-                ui.notification_show(
-                    "Added sugar cannot be greater than total sugar",
-                    type="error"
-                )
-                return False
-        
-        return True
+    if client is not None:
+        submissions = client.store
+        # Tracks which rows have reached the sheet, so saves only send changes
+        sync_tracker = client.tracker
+        submissions_changed = client.changed
 
-    # Function to generate reasons based on inputs and criteria
-    def generate_reasons(criteria_list, reason_texts):
-        return [reason for criteria, reason in zip(criteria_list, reason_texts) if criteria]
+        async def release_client():
+            await client.detach(on_submissions_changed)
 
-    # Store recommendation result in a reactive value
-    recommendation_result = reactive.Value(None)
+        session.on_ended(release_client)
+    else:
+        # No client id to keep them under (or under Pyodide, until the
+        # browser's log is replayed into it); this session's own store
+        submissions = SubmissionStore()
+        sync_tracker = SyncTracker(submissions)
+        submissions_changed = on_submissions_changed
+    submissions_version = profiled_value("submissions", submissions.version)
+
+    # Kiosks say where they are with ?site=... in the app URL
+    def session_site():
+        search = session.clientdata.url_search() or ""
+        site = parse_qs(search.lstrip("?")).get("site", [""])[0].strip()
+        return site[:64] or None
     
-    row_to_delete = reactive.Value(None)
+    # Store recommendation result in a reactive value
+    recommendation_result = profiled_value("recommendation_result")
     
-    # Helper function for debugging recommendations
-    # def debug_recommendation_values():
-    #     # Get input values
-    #     beverage_type = input.beverage_type()
-    #     
-    #     if beverage_type == "Other":
-    #         total_sugar = input.total_sugar()
-    #         added_sugar = input.added_sugar()
-    #         has_artificial = input.artificial() 
-    #         
-    #         # Log values and conditions
-    #         print(f"Debug - Other beverage inputs:")
-    #         print(f"  total_sugar: {total_sugar} (type: {type(total_sugar)})")
-    #         print(f"  added_sugar: {added_sugar} (type: {type(added_sugar)})")
-    #         print(f"  has_artificial: {has_artificial} (type: {type(has_artificial)})")
-    #         
-    #         # Check conditions
-    #         condition1 = total_sugar <= 12
-    #         condition2 = added_sugar == 0
-    #         condition3 = not has_artificial
-    #         
-    #         print(f"  Condition checks:")
-    #         print(f"    total_sugar <= 12: {condition1}")
-    #         print(f"    added_sugar == 0: {condition2}")
-    #         print(f"    not has_artificial: {condition3}")
-    #         print(f"    All conditions met for GREEN: {condition1 and condition2 and condition3}")
-    #         
-    #         return {
-    #             "total_sugar": total_sugar,
-    #             "added_sugar": added_sugar,
-    #             "has_artificial": has_artificial,
-    #             "conditions_met": condition1 and condition2 and condition3
-    #         }
-    #     
-    #     return None
+    row_to_delete = profiled_value("row_to_delete")
     
-    # Check environment on startup
+    # With SSC_PROFILE set, trace what this session's observers send
+    watch_session(session)
+
+    # Count the session and log where it runs from
+    SESSIONS.inc()
+    ACTIVE_SESSIONS.inc()
+    session.on_ended(ACTIVE_SESSIONS.dec)
+
     @reactive.Effect
-    def check_environment():
-        # Check if we're running in a browser environment
-        pyodide_env = is_pyodide_environment()
-        print(f"Running in Pyodide/browser environment: {pyodide_env}")
-        
-        # Test numeric comparisons
-        test_val1 = 0
-        test_val2 = 0.0
-        print(f"Numeric comparison test: {test_val1} == {test_val2} is {test_val1 == test_val2}")
-        
-        # Test boolean operations
-        test_bool = "True" == "True"
-        print(f"Boolean test: 'True' == 'True' evaluates to {test_bool}")
-        print(f"Boolean negation: not {test_bool} evaluates to {not test_bool}")
+    def log_session_start():
+        with reactive.isolate():
+            log_event("session_start", site=session_site(), pyodide=is_pyodide())
     
     # Validate beverage input and calculate recommendation
     @reactive.Effect
-    @reactive.event(input.submit)
+    @reactive.event(input.beverage_form)
+    @timed(EFFECT_SECONDS)
     def validate_and_store_beverage():
-        # Require beverage type
-        req(input.beverage_type())
+        # Every field arrives in one message from the Submit button
+        form = input.beverage_form()
         
-        beverage_type = input.beverage_type()
-        
-        # Add debug logging
-        #debug_values = debug_recommendation_values()
-        #print(f"Debug values: {debug_values}")
+        # Require beverage type
+        req(form.get("beverage_type"))
         
-        print(f"bev_type: {beverage_type}")
+        beverage_type = form["beverage_type"]
+        beverage_name = form.get("beverage_name") or ""
         
-        # Validate inputs based on beverage type
-        if not validate_inputs(beverage_type):
+        # The active guideline table decides which types exist, what counts
+        # as a valid entry and which inputs are used
+        rules = current_rules()
+        compiled = rules.types.get(beverage_type)
+        if compiled is None:
             return
         
-        # Initialize variables
-        recommendation_text = ""
-        recommendation_color = ""
-        reason = None
-        text_label = ""
-        
-        if beverage_type == "Milk":
-            # Require all milk inputs
-            req(input.is_flavored(), input.is_sweetened(), input.artificial())
-            
-            is_flavored = input.is_flavored() == "True"
-            is_sweetened = input.is_sweetened() == "True"
-            has_artificial = input.artificial() == "True"
-            
-            criteria = [is_sweetened, is_flavored, has_artificial]
-            reasons_text = ["milk sweetened", "milk flavored", "contains artificial sweeteners"]
-            
-            if not any(criteria):
-                recommendation_text = "goforit.png"
-                recommendation_color = "green"
-                text_label = "Go For It!"
-            else:
-                recommendation_text = "maybenot.png"
-                recommendation_color = "red"
-                text_label = "Maybe Not"
-                
-                reasons = generate_reasons(criteria, reasons_text)
-                if reasons:
-                    reason = str_to_sentence(", ".join(reasons))
+        message = compiled.failed_validation(form)
+        if message:
+            SUBMITS.inc(result="invalid")
+            ui.notification_show(message, type="error")
+            return
         
-        elif beverage_type == "Juice":
-            # Require juice inputs
-            req(input.juice_serving_size(), input.is_100_percent())
-            
-            juice_size = input.juice_serving_size()
-            juice_size_ok = juice_size <= 12
-            is_100_percent = input.is_100_percent() == "True"
-            
-            criteria = [not juice_size_ok, not is_100_percent]
-            reasons_text = ["serving size > 12oz", "not 100% juice"]
-            
-            if is_100_percent and juice_size_ok:
-                recommendation_text = "oksometimes.png"
-                recommendation_color = "yellow"
-                text_label = "OK Sometimes"
-            else:
-                recommendation_text = "maybenot.png"
-                recommendation_color = "red"
-                text_label = "Maybe Not"
-                
-                reasons = generate_reasons(criteria, reasons_text)
-                if reasons:
-                    reason = str_to_sentence(", ".join(reasons))
+        inputs = {name: form.get(name) for name in compiled.inputs}
         
-        elif beverage_type == "Other":
-            # Require other beverage inputs
-            req(input.total_sugar())
-            
-            # Convert input values to floats
-            try:
-                total_sugar = float(input.total_sugar())
-                added_sugar = float(input.added_sugar())
-            except ValueError:
-                ui.notification_show(
-                    "Please enter valid numeric values for total and added sugar.",
-                    type="error"
-                )
-                return
-    
-            has_artificial = input.artificial() == "True"
-    
-            # Debug output
-            print(f"Other beverage values: total={total_sugar}, added={added_sugar}, artificial={has_artificial}")
-            
-            # Check individual conditions and collect reasons
-            reasons = []
-            
-            # Check conditions for green (negated to find failures)
-            if total_sugar > 12.0:
-                reasons.append("Total sugar exceeds 12g")
-            
-            if added_sugar > 0.0:
-                reasons.append("Contains added sugar")
-            
-            if has_artificial:
-                reasons.append("Contains artificial sweeteners")
-            
-            # Determine category based on conditions
-            if not reasons:
-                # All green conditions met
-                recommendation_text = "goforit.png"
-                recommendation_color = "green"
-                text_label = "Go For It!"
-                reason = "No added sugar, low total sugar, no artificial sweeteners"
-            elif (total_sugar <= 24.0 and added_sugar <= 12.0):
-                # Yellow conditions met
-                recommendation_text = "oksometimes.png"
-                recommendation_color = "yellow"
-                text_label = "OK Sometimes"
-                # Join all the reasons that prevented it from being green
-                reason = ", ".join(reasons)
-            else:
-                # Red category
-                recommendation_text = "maybenot.png"
-                recommendation_color = "red"
-                text_label = "Maybe Not"
-                
-                # Add specific red category reasons
-                if total_sugar > 24.0:
-                    reasons.append("Total sugar exceeds 24g")
-                if added_sugar > 12.0:
-                    reasons.append("Added sugar exceeds 12g")
-                
-                # Join all reasons
-                reason = ", ".join(reasons)
+        # Classify (or reuse the cached result for the same inputs)
+        result = recommend(rules, beverage_type, inputs)
+        recommendation_color = result["color"]
+        reason = result["reason"]
         
-        # Create a new submission record
-        new_submission = pd.DataFrame({
-            "RowID": [str(uuid.uuid4())],  # Generate a unique ID
-            "Timestamp": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-            "BeverageType": [beverage_type],
-            "BeverageName": [input.beverage_name()],
-            "Recommendation": [recommendation_color],
-            "Reason": [reason if reason else None]
-        })
+        # Append the new submission record
+        row_id = str(uuid.uuid4())  # Generate a unique ID
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        submissions.append(
+            row_id,
+            timestamp,
+            beverage_type,
+            beverage_name,
+            recommendation_color,
+            reason if reason else None
+        )
+        submissions_changed()
+        hub.publish_append(
+            row_id,
+            timestamp,
+            beverage_type,
+            beverage_name,
+            recommendation_color,
+            reason if reason else None,
+            site=session_site()
+        )
         
-        # Update submissions
-        current_submissions = submissions.get().copy()
-        updated_submissions = pd.concat([current_submissions, new_submission], ignore_index=True)
-        submissions.set(updated_submissions)
+        SUBMITS.inc(result=recommendation_color)
+        log_event("submit", beverage_type=beverage_type, result=recommendation_color, rules=rules.version)
         
         # Store the result in reactive value
-        result = {
-            "recommendation": recommendation_text,
-            "color": recommendation_color,
-            "text_label": text_label
-        }
-        print(f"Setting recommendation result: {result}")
         recommendation_result.set(result)
     
+    # Bulk catalog import state. The chunk iterator is plain Python state; the
+    # reactive tick drives one chunk per flush so the table updates in batches.
+    catalog_import = {"chunks": None, "imported": 0, "skipped": 0}
+    catalog_tick = profiled_value("catalog_tick", 0)
+
+    @reactive.Effect
+    @reactive.event(input.catalog_file)
+    @timed(EFFECT_SECONDS)
+    async def start_catalog_import():
+        files = input.catalog_file()
+        if not files:
+            return
+
+        try:
+            await load_catalog_reader(files[0]["name"])
+        except CatalogImportError as e:
+            ui.notification_show(f"Error: {str(e)}", type="error")
+            return
+        catalog_import["chunks"] = iter_catalog_chunks(files[0]["datapath"], files[0]["name"])
+        catalog_import["imported"] = 0
+        catalog_import["skipped"] = 0
+        ui.notification_show(
+            f"Importing {files[0]['name']}...",
+            type="default",
+            duration=None,
+            id="catalog_import"
+        )
+        catalog_tick.set(catalog_tick.get() + 1)
+
+    @reactive.Effect
+    @timed(EFFECT_SECONDS)
+    def import_catalog_chunk():
+        catalog_tick()
+        chunks = catalog_import["chunks"]
+        if chunks is None:
+            return
+
+        try:
+            chunk = next(chunks, None)
+        except (CatalogImportError, OSError, UnicodeDecodeError) as e:
+            catalog_import["chunks"] = None
+            ui.notification_remove("catalog_import")
+            ui.notification_show(f"Error: {str(e)}", type="error")
+            return
+
+        if chunk is None:
+            # Finished
+            catalog_import["chunks"] = None
+            ui.notification_remove("catalog_import")
+            message = f"Imported {catalog_import['imported']} beverages"
+            if catalog_import["skipped"]:
+                message += f" ({catalog_import['skipped']} rows skipped for missing or invalid inputs)"
+            ui.notification_show(message, type="success")
+            return
+
+        # Classify the whole chunk in one pass and append it in one go
+        result = classify_beverages(chunk)
+        valid = result["code"] != INVALID
+        count = int(valid.sum())
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        columns = (
+            [str(uuid.uuid4()) for _ in range(count)],
+            [timestamp] * count,
+            [t for t, ok in zip(chunk["beverage_type"], valid) if ok],
+            [n for n, ok in zip(chunk["beverage_name"], valid) if ok],
+            result["color"][valid].tolist(),
+            result["reason"][valid].tolist()
+        )
+        submissions.extend(*columns)
+        submissions_changed()
+        # Imported rows reach the live feed and Summary like submitted ones
+        hub.publish_appends(zip(*columns), site=session_site())
+
+        catalog_import["imported"] += count
+        catalog_import["skipped"] += len(valid) - count
+        ui.notification_show(
+            f"Importing... {catalog_import['imported']} beverages classified",
+            type="default",
+            duration=None,
+            id="catalog_import"
+        )
+
+        # Come back for the next chunk after this flush has gone out
+        reactive.invalidate_later(0)
+
     # Render recommendation image
     @output
     @render.ui
+    @timed(RENDER_SECONDS)
     def recommendation_image():
         result = recommendation_result.get()
         if result is None:
@@ -795,162 +1549,183 @@ def server(input, output, session):
                           style="text-align: center; color: #666;")
             )
         
-        # Map filenames to GitHub URLs
-        image_urls = {
-            "goforit.png": "https://raw.githubusercontent.com/brendensm/calc-test/main/www/goforit.png",
-            "maybenot.png": "https://raw.githubusercontent.com/brendensm/calc-test/main/www/maybenot.png",
-            "oksometimes.png": "https://raw.githubusercontent.com/brendensm/calc-test/main/www/oksometimes.png"
-        }
-        
-        # Get the URL for the recommendation - with debug info
-        image_url = image_urls.get(result["recommendation"], "")
-        print(f"Displaying image: {result['recommendation']} -> {image_url}")
-        
-        # Return the image UI
-        return ui.tags.div(
-            {"style": "text-align: center;"},
-            ui.tags.img(src=image_url, class_="recommendation")
-        )
+        # Pre-rendered with the cached recommendation
+        return ui.HTML(result["image_html"])
     
     # Render recommendation text
     @output
     @render.ui
+    @timed(RENDER_SECONDS)
     def recommendation_text():
         result = recommendation_result.get()
         if result is None:
             return ui.tags.div()
         
-        # Create a styled text based on the color
-        class_name = f"{result['color']}-result"
-        return ui.tags.p(result["text_label"], class_=f"recommendation-text {class_name}")
-
-    # Display submissions table
-    # @output
-    # @render.ui
-    # def submissions_table():
-    #     df = submissions.get()
-    #     
-    #     if len(df) == 0:
-    #         # Create empty table with headers
-    #         columns = ["Date", "Type", "Name", "Result", "Reason"]
-    #         return ui.tags.table(
-    #             {"class": "table table-striped"},
-    #             ui.tags.thead(
-    #                 ui.tags.tr([ui.tags.th(col) for col in columns])
-    #             ),
-    #             ui.tags.tbody(
-    #                 ui.tags.tr(ui.tags.td("No data available", colspan=5, style="text-align: center;"))
-    #             )
-    #         )
-    #     else:
-    #         # Rename columns for display
-    #         display_df = df.copy().rename(columns={
-    #             "Timestamp": "Date",
-    #             "BeverageType": "Type",
-    #             "BeverageName": "Name",
-    #             "Recommendation": "Result",
-    #             "Reason": "Reason"
-    #         })
-    #         
-    #         # Get columns and data
-    #         columns = display_df.columns.tolist()
-    #         
-    #         # Create table header
-    #         thead = ui.tags.thead(
-    #             ui.tags.tr([ui.tags.th(col) for col in columns])
-    #         )
-    #         
-    #         # Create table rows
-    #         rows = []
-    #         for _, row in display_df.iterrows():
-    #             cells = []
-    #             for col in columns:
-    #                 cell_value = row[col] if not pd.isna(row[col]) else ""
-    #                 cells.append(ui.tags.td(str(cell_value)))
-    #             rows.append(ui.tags.tr(cells))
-    #         
-    #         # Create table body
-    #         tbody = ui.tags.tbody(rows)
-    #         
-    #         # Return complete table
-    #         return ui.tags.table(
-    #             {"class": "table table-striped"},
-    #             thead,
-    #             tbody
-    #         )
-    
-    @output
-    @render.ui
-    def submissions_table():
-        df = submissions.get()
-        
-        if len(df) == 0:
-            # Create empty table with headers
-            columns = ["Date", "Type", "Name", "Result", "Reason", "Actions"]
-            return ui.tags.table(
-                {"class": "table table-striped"},
-                ui.tags.thead(
-                    ui.tags.tr([ui.tags.th(col) for col in columns])
-                ),
-                ui.tags.tbody(
-                    ui.tags.tr(ui.tags.td("No data available", colspan=6, style="text-align: center;"))
-                )
+        # Pre-rendered with the cached recommendation
+        return ui.HTML(result["text_html"])
+
+    # Filtered/sorted view of the store for the submissions grid, cached
+    # until the store or the filters change so scrolling is just a slice.
+    # Deletes don't invalidate it; deleted rows are just dropped from it.
+    grid_view = {"key": None, "version": None, "positions": []}
+
+    def submissions_view(sort_by, descending):
+        key = (
+            submissions.layout_version,
+            input.filter_type(),
+            input.filter_result(),
+            input.filter_date().strip(),
+            sort_by,
+            descending
+        )
+        if grid_view["key"] != key:
+            grid_view["positions"] = submissions.select(
+                beverage_type=input.filter_type(),
+                recommendation=input.filter_result(),
+                date_prefix=input.filter_date().strip(),
+                sort_by=sort_by,
+                descending=descending
             )
-        else:
-            # Rename columns for display
-            display_df = df.copy().rename(columns={
-                "Timestamp": "Date",
-                "BeverageType": "Type",
-                "BeverageName": "Name",
-                "Recommendation": "Result",
-                "Reason": "Reason"
-            })
-            
-            # Get columns for display (exclude RowID)
-            display_columns = [col for col in display_df.columns if col != "RowID"]
-            
-            # Create table header (add Actions column)
-            all_columns = display_columns + ["Actions"]
-            thead = ui.tags.thead(
-                ui.tags.tr([ui.tags.th(col) for col in all_columns])
+            grid_view["key"] = key
+        elif grid_view["version"] != submissions.version:
+            grid_view["positions"] = submissions.live_positions(grid_view["positions"])
+        grid_view["version"] = submissions.version
+        return grid_view["positions"]
+
+    # The window the client asked for, against the current view: (total,
+    # start, positions of the rows in the window)
+    def submissions_window():
+        request = input.submissions_window() if input.submissions_window.is_set() else {}
+        if not isinstance(request, dict):
+            request = {}
+        count = min(max(window_int(request.get("count"), DEFAULT_WINDOW_SIZE), 0), MAX_WINDOW_SIZE)
+        sort_by = request.get("sort") if request.get("sort") in SORTABLE_COLUMNS else "Date"
+        descending = bool(request.get("desc", False))
+        
+        positions = submissions_view(sort_by, descending)
+        total = len(positions)
+        start = min(max(window_int(request.get("start"), 0), 0), max(total - count, 0))
+        return total, start, positions[start:start + count]
+
+    # The window the client has, by RowID, so store changes only send the
+    # rows that came into it
+    grid_sent = {"total": None, "start": None, "row_ids": None}
+
+    async def send_submissions_window(total, start, window):
+        rows = submissions.rows_at(window)
+        grid_sent["total"] = total
+        grid_sent["start"] = start
+        grid_sent["row_ids"] = [row[0] for row in rows]
+        await session.send_custom_message("submissions_window", {
+            "total": total,
+            "start": start,
+            "rows": [str(submission_row(row)) for row in rows]
+        })
+
+    # Send the window of rows the client asked for, plus the total row count.
+    # Re-runs when the filters or the requested window change.
+    @reactive.Effect
+    @timed(EFFECT_SECONDS)
+    async def submissions_table():
+        await send_submissions_window(*submissions_window())
+
+    # When the store changes, send the window's RowIDs in order and markup
+    # only for the rows that weren't in it; the client keeps the rest
+    @reactive.Effect
+    @timed(EFFECT_SECONDS)
+    async def submissions_table_changes():
+        submissions_version()
+        if grid_sent["row_ids"] is None:
+            return
+        with reactive.isolate():
+            total, start, window = submissions_window()
+        if start != grid_sent["start"]:
+            await send_submissions_window(total, start, window)
+            return
+        
+        row_ids = submissions.row_ids_at(window)
+        if total == grid_sent["total"] and row_ids == grid_sent["row_ids"]:
+            return
+        shown = set(grid_sent["row_ids"])
+        added = [position for position, row_id in zip(window, row_ids) if row_id not in shown]
+        grid_sent["total"] = total
+        grid_sent["row_ids"] = row_ids
+        await session.send_custom_message("submissions_window_changes", {
+            "total": total,
+            "start": start,
+            "row_ids": row_ids,
+            "rows": {row[0]: str(submission_row(row)) for row in submissions.rows_at(added)}
+        })
+
+
+    # Under Pyodide, the browser's durable copy of its submissions is
+    # replayed once its storage is mounted
+    submission_log = {"log": None}
+
+    @reactive.Effect
+    @timed(EFFECT_SECONDS)
+    async def restore_submissions():
+        if client_error is not None:
+            ui.notification_show(
+                f"Saved submissions could not be loaded: {str(client_error)}",
+                type="warning"
             )
-            
-            # Create table rows with UUID-based delete buttons
-            rows = []
-            for idx, row_data in display_df.iterrows():
-                row_id = row_data["RowID"]  # Get the unique row ID
-                
-                cells = []
-                for col in display_columns:
-                    cell_value = row_data[col] if not pd.isna(row_data[col]) else ""
-                    cells.append(ui.tags.td(str(cell_value)))
-                
-                # Add delete button cell with row UUID
-                delete_btn = ui.tags.button(
-                    ui.tags.i({"class": "fas fa-trash"}),
-                    {"class": "btn btn-sm btn-danger delete-row", 
-                     "type": "button",
-                     "onclick": f"Shiny.setInputValue('delete_row_id', '{row_id}')"}
-                )
-                cells.append(ui.tags.td(delete_btn))
-                
-                rows.append(ui.tags.tr(cells))
-            
-            # Create table body
-            tbody = ui.tags.tbody(rows)
-            
-            # Return complete table
-            return ui.tags.table(
-                {"class": "table table-striped"},
-                thead,
-                tbody
+            return
+        if not is_pyodide() or submission_log["log"] is not None:
+            return
+        
+        try:
+            log = await open_browser_submission_log(submissions, sync_tracker)
+        except (OSError, ValueError) as e:
+            ui.notification_show(
+                f"Saved submissions could not be loaded: {str(e)}",
+                type="warning"
             )
+            return
+        
+        submission_log["log"] = log
+        session.on_ended(log.close)
+        submissions_changed()
 
+    # Upload runs as an extended task so a slow endpoint doesn't hold up this
+    # session's outputs (or anyone else's)
+    @reactive.extended_task
+    async def upload_rows(records):
+        if is_pyodide():
+            # For Shinylive environment (browser): hand the records to the
+            # browser's outbox, which keeps them in localStorage and uploads
+            # them (no-cors) whenever the device is online
+            await session.send_custom_message("outbox_enqueue", {
+                "url": SCRIPT_URL,
+                "records": records
+            })
+            return False
+        
+        # For local environment: background sync worker with retries
+        await get_sheet_sync().submit(records)
+        return True
 
-   # Save data to Google Sheet
+    # Save data to Google Sheet
     @reactive.Effect
     @reactive.event(input.save_data)
-    async def save_data():
+    @timed(EFFECT_SECONDS)
+    def save_data():
+        with reactive.isolate():
+            # The tracker is shared with this client's other tabs
+            if upload_rows.status() == "running" or sync_tracker.in_flight:
+                SAVES.inc(outcome="busy")
+                ui.notification_show("A save is already in progress", type="warning")
+                return
+        
+        # Check if there's anything new to save
+        if not sync_tracker.has_changes():
+            SAVES.inc(outcome="no_changes")
+            ui.notification_show(
+                "No new data to save",
+                type="warning"
+            )
+            return
+        
         # Show saving notification
         ui.notification_show(
             "Saving data to Google Sheet...",
@@ -959,108 +1734,152 @@ def server(input, output, session):
             id="saving"
         )
         
-        current_data = submissions.get()
-        
-        # Check if there's data to save
-        if len(current_data) == 0:
-            ui.notification_remove("saving")
-            ui.notification_show(
-                "No data to save",
-                type="warning"
-            )
+        # New rows plus tombstones for saved rows deleted since
+        records = sync_tracker.begin()
+        SAVES.inc(outcome="started")
+        log_event("save_started", records=len(records))
+        upload_rows(records)
+
+    @reactive.Effect
+    @timed(EFFECT_SECONDS)
+    def save_data_result():
+        status = upload_rows.status()
+        if status not in ("success", "error"):
             return
         
-        # Convert DataFrame to JSON
-        data_json = current_data.to_json(orient="records")
-        
-        # Google Apps Script URL
-        script_url = "https://script.google.com/macros/s/AKfycby6D2dpPUHUrPSzl-mXoVWGuhpYOrORQScpEsWN8zHy_01-0NORjVRgtX0VnvAFkHkHeA/exec"
+        # Remove saving notification
+        ui.notification_remove("saving")
         
-        try:
-            # Handle the request based on environment
-            if is_pyodide_environment():
-                # For Shinylive environment (browser)
-                # Use PyJS to make a fetch with no-cors mode
-                from js import fetch, Object, JSON
-                from pyodide.ffi import to_js
-                
-                # Convert the data to JavaScript format
-                js_data = to_js(json.loads(data_json))
-                
-                # Create request options
-                options = Object.fromEntries(to_js({
-                    "method": "POST",
-                    "headers": {"Content-Type": "application/json"},
-                    "body": JSON.stringify(js_data),
-                    "mode": "no-cors"  # Add this line to use no-cors mode
-                }))
-                
-                # Use JavaScript's fetch directly
-                response = await fetch(script_url, options)
-                
-                # Since no-cors returns an opaque response, we can't check status
-                # Just assume it worked if no exception
-                ui.notification_remove("saving")
+        if status == "success":
+            sync_tracker.commit()
+            if upload_rows.result():
+                SAVES.inc(outcome="saved")
                 ui.notification_show(
-                    "Data sent to the server (no confirmation available)",
+                    "Data saved successfully!",
                     type="success"
                 )
             else:
-                # For local environment
-                response = requests.post(
-                    script_url,
-                    headers={"Content-Type": "application/json"},
-                    data=data_json
+                SAVES.inc(outcome="queued")
+                ui.notification_show(
+                    "Data queued for upload (it is sent whenever this device is online)",
+                    type="success"
                 )
-                
-                # Remove saving notification
-                ui.notification_remove("saving")
-                
-                # Check response status
-                if response.status_code == 200:
-                    ui.notification_show(
-                        "Data saved successfully!",
-                        type="success"
-                    )
-                else:
-                    ui.notification_show(
-                        f"Error: Server returned status {response.status_code}",
-                        type="error"
-                    )
-                
-        except Exception as e:
-            # Remove saving notification
-            ui.notification_remove("saving")
+        else:
+            sync_tracker.abort()
+            SAVES.inc(outcome="error")
+            logger.warning("save_failed", extra={"fields": {"error": str(upload_rows.error.get())}})
             
             # Show error notification
             ui.notification_show(
-                f"Error: {str(e)}",
+                f"Error: {str(upload_rows.error.get())}",
                 type="error"
             )
 
+    # A save this session started has nobody to finish it once the session
+    # ends; leave its changes pending so the client's other tabs can save
+    def abort_unfinished_save():
+        with reactive.isolate():
+            if upload_rows.status() == "running":
+                sync_tracker.abort()
+
+    session.on_ended(abort_unfinished_save)
+
 
             
+    # Delete one or more rows. The client has already hidden them; it gets
+    # back which RowIDs were deleted and restores any that weren't.
     @reactive.Effect
-    @reactive.event(input.delete_row_id)
-    def handle_delete_row():
-        # Get the row ID to delete
-        row_id = input.delete_row_id()
+    @reactive.event(input.delete_rows)
+    @timed(EFFECT_SECONDS)
+    async def handle_delete_rows():
+        request_id, row_ids = delete_request(input.delete_rows())
         
-        if row_id:
-            # Copy the current dataframe
-            current_data = submissions.get().copy()
-            
-            # Find the row with the matching ID
-            matching_rows = current_data["RowID"] == row_id
-            
-            if matching_rows.any():
-                # Drop the row with the matching ID
-                updated_data = current_data[~matching_rows].reset_index(drop=True)
-                
-                # Update the reactive value
-                submissions.set(updated_data)
-                
+        # Indexed lookups and tombstones, no copy; one refresh for the batch
+        deleted = submissions.delete_many(row_ids)
+        for row_id, seq in deleted:
+            sync_tracker.record_delete(row_id, seq)
+            hub.publish_delete(row_id)
+        if deleted:
+            submissions_changed()
+        
+        deleted_ids = {row_id for row_id, _ in deleted}
+        DELETES.inc(len(deleted_ids), outcome="deleted")
+        DELETES.inc(len(row_ids) - len(deleted_ids), outcome="rejected")
+        log_event("delete", requested=len(row_ids), deleted=len(deleted_ids))
+        await session.send_custom_message("delete_rows_result", {
+            "id": request_id,
+            "deleted": sorted(deleted_ids),
+            "rejected": [row_id for row_id in row_ids if row_id not in deleted_ids]
+        })
+
+
+    # Product autocomplete: prefix search of the shared index as the user
+    # types; the client fills in the form itself from the picked result
+    @reactive.Effect
+    @reactive.event(input.product_query)
+    @timed(EFFECT_SECONDS)
+    async def suggest_products():
+        request_id, query = product_query_request(input.product_query())
+        items = product_index.search(query, limit=PRODUCT_SUGGESTIONS) if product_index is not None else []
+        await session.send_custom_message("product_suggestions", {
+            "id": request_id,
+            "items": items
+        })
+
+    # Summary tab and live feed, fed by the process-wide hub. The hub hands
+    # this session everything that changed since its cursor in one batch (at
+    # most every few hundred ms, in one reactive flush shared by all
+    # sessions); hidden summary outputs stay suspended until the tab shows.
+    hub_batch = profiled_value("hub_batch")
+    subscription = hub.subscribe(
+        lambda rows, deleted: hub_batch.set((rows, deleted)),
+        max_rows=LIVE_FEED_ROWS
+    )
+    session.on_ended(subscription.close)
+
+    @reactive.Effect
+    @timed(EFFECT_SECONDS)
+    async def push_live_feed():
+        batch = hub_batch()
+        if batch is None:
+            return
+        rows, deleted = batch
+        await session.send_custom_message("live_feed", {
+            "rows": [str(live_feed_row(row)) for row in rows],
+            "deleted": deleted,
+            "limit": LIVE_FEED_ROWS
+        })
+
+    @output
+    @render.ui
+    @timed(RENDER_SECONDS)
+    def summary_totals():
+        hub_batch()
+        rollups = hub.rollups
+        totals = rollups.totals()
+        return ui.tags.div(
+            {"class": "summary-totals"},
+            ui.tags.span(f"{len(rollups)} submissions"),
+            *[
+                ui.tags.span({"class": f"{result}-result"}, f"{result.capitalize()}: {totals[result]}")
+                for result in RESULTS
+            ]
+        )
+
+    def summary_output(dimension):
+        @render.ui
+        @timed(RENDER_SECONDS, f"summary_by_{dimension}")
+        def render_summary():
+            hub_batch()
+            return summary_table(dimension, hub.rollups.table(dimension))
+        return render_summary
+
+    for dimension in DIMENSIONS:
+        output(summary_output(dimension), id=f"summary_by_{dimension}")
 
 
 # Create app
-app = App(app_ui, server)
+app = App(app_ui, server, static_assets={ASSETS_PATH: ASSETS_DIR})
+app.starlette_app.add_middleware(CacheHeadersMiddleware)
+if not is_pyodide():
+    app.starlette_app.add_middleware(MetricsEndpoint)
@@ -0,0 +1,117 @@
+# Self-hosted images
+#
+# Images are served from /assets with content-hashed file names (built by
+# tools/build_assets.py), so responses can carry a far-future Cache-Control
+# header. picture() renders a <picture> with AVIF/WebP sources and a PNG
+# fallback, showing a tiny inlined placeholder until the image loads.
+#
+# The Shinylive build doesn't bundle the images into app.json: they are
+# static files in docs/assets (see tools/export_docs.py), and the app, which
+# Shinylive serves from docs/app_<id>/, links to them one level up.
+import json
+import os
+
+from shiny import ui
+
+from lazy import is_pyodide
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+ASSETS_PATH = "/assets"
+
+# Hashed file names never change content, so they can be cached for a year
+CACHE_CONTROL = b"public, max-age=31536000, immutable"
+
+
+def _load_manifest():
+    try:
+        with open(os.path.join(ASSETS_DIR, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+MANIFEST = _load_manifest()
+
+
+# Relative, so it also resolves under a path prefix
+ASSETS_URL = "../assets" if is_pyodide() else ASSETS_PATH.lstrip("/")
+
+
+def asset_url(filename):
+    return f"{ASSETS_URL}/{filename}"
+
+
+def _srcset(files):
+    return ", ".join(f"{asset_url(filename)} {width}w" for filename, width in files)
+
+
+def image_url(name):
+    """URL of the PNG fallback for source image `name` (e.g. "goforit.png")."""
+    return asset_url(MANIFEST[name]["fallback"])
+
+
+def picture(name, sizes="100vw", **attrs):
+    """Render source image `name` as a responsive <picture>.
+
+    `attrs` go on the <img> (overriding the intrinsic width/height). The largest WebP and the placeholder are also
+    exposed as data-full / data-placeholder for the lightbox.
+    """
+    entry = MANIFEST[name]
+    sources = [
+        ui.tags.source(type=media_type, srcset=_srcset(files), sizes=sizes)
+        for media_type, files in entry["sources"].items()
+    ]
+    style = f"background: url({entry['placeholder']}) center / cover no-repeat;"
+    if "style" in attrs:
+        style += " " + attrs.pop("style")
+    img_attrs = {
+        "src": image_url(name),
+        "width": entry["width"],
+        "height": entry["height"],
+        "decoding": "async",
+        "style": style,
+        "data_full": asset_url(entry["sources"]["image/webp"][-1][0]),
+        "data_placeholder": entry["placeholder"],
+    }
+    img_attrs.update(attrs)
+    return ui.tags.picture(*sources, ui.tags.img(**img_attrs))
+
+
+def preload_links(names, sizes="100vw"):
+    """<link rel="preload"> tags for the AVIF variants of `names`.
+
+    Browsers without AVIF support skip these, and the <picture> falls back
+    to WebP/PNG as usual.
+    """
+    return [
+        ui.tags.link(
+            rel="preload",
+            as_="image",
+            type="image/avif",
+            imagesrcset=_srcset(MANIFEST[name]["sources"]["image/avif"]),
+            imagesizes=sizes
+        )
+        for name in names
+        if name in MANIFEST
+    ]
+
+
+class CacheHeadersMiddleware:
+    """ASGI middleware adding CACHE_CONTROL to successful responses under ASSETS_PATH."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(ASSETS_PATH + "/"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                headers.append((b"cache-control", CACHE_CONTROL))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
@@ -0,0 +1,556 @@
+# Shared state backends
+#
+# In multi-worker mode (see cluster.py) every worker process keeps its
+# process-wide state in one shared backend instead of in its own memory:
+#
+#   hub log    every kiosk's submissions and deletions, in order. Each
+#              worker's SubmissionsHub replays it into its live feed and
+#              Summary rollups, so all kiosks see all submissions whichever
+#              worker serves them. Replicas report how far they have read,
+#              and compact_events() drops deleted rows' appends and the
+#              deletes every live replica has applied, so the log (and a
+#              new worker's replay) stays proportional to the live rows.
+#   clients    each browser's submissions and sync checkpoint (the journal
+#              behind its SubmissionStore; see persistence.py), so a client
+#              can be served by any worker.
+#   outbox     batches waiting to go to the Google Sheet. Any worker uploads
+#              whatever is queued, under a lease, so batches a dead worker
+#              had claimed are picked up by another (see sync.py).
+#
+# SharedBackend is the interface. SQLiteBackend implements it on one SQLite
+# database in WAL mode, which is enough for the workers on one machine; a
+# networked store (Redis or similar) would implement the same methods.
+# MemoryBackend is an in-process stand-in, e.g. for running several hubs in
+# one test process.
+#
+# SSC_BACKEND picks the backend: unset for single-process mode (no backend),
+# "memory", or "sqlite:///path/to/shared.db". Every method is synchronous and
+# can block: a SQLite writer waits up to the busy timeout for another
+# worker's transaction. So callers on the event loop run them in a thread
+# (asyncio.to_thread), and SQLiteBackend gives each thread its own
+# connection. The exception is load_client() when a session opens, a read,
+# which in WAL mode doesn't wait for writers.
+import json
+import os
+import socket
+import threading
+import time
+from bisect import bisect_right
+
+from lazy import import_package
+
+# Events returned by one events_since() call
+EVENT_BATCH = 5000
+
+# Outbox batch states
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+# Finished outbox batches nobody collected are dropped after this long
+FINISHED_TTL = 3600
+
+# Hub replicas not heard from for this long don't hold back compaction
+REPLICA_TTL = 3600
+
+
+class BackendError(Exception):
+    pass
+
+
+def worker_id():
+    """This process's name in the backend (SSC_WORKER, set by cluster.py)."""
+    return os.environ.get("SSC_WORKER") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SharedBackend:
+    # -- Hub log --------------------------------------------------------------
+
+    def publish_many(self, events):
+        """Append (op, row_id, row) events to the hub log in one transaction.
+
+        `op` is "append", with `row` = (timestamp, beverage_type,
+        beverage_name, recommendation, reason, site), or "delete" with `row`
+        None.
+        """
+        raise NotImplementedError
+
+    def events_since(self, seq, limit=EVENT_BATCH):
+        """Up to `limit` (seq, op, row_id, row) events after `seq`, oldest first."""
+        raise NotImplementedError
+
+    def ack_events(self, replica, seq):
+        """Record that `replica` has applied the hub log up to `seq`, and
+        return the log's compaction point. A replica part-way through the log
+        but behind that point may have missed deletes that were compacted
+        away, and has to replay it from the start."""
+        raise NotImplementedError
+
+    def compact_events(self, replica_ttl=REPLICA_TTL):
+        """Drop the append events of deleted rows, and the delete events,
+        up to the oldest position acknowledged by a replica within
+        `replica_ttl` seconds. Returns the number of events dropped."""
+        raise NotImplementedError
+
+    # -- Client journals ----------------------------------------------------
+
+    def load_client(self, client_id):
+        """A client's stored submissions: (rows, deleted, last_seq, synced_seq,
+        tombstones). `rows` are (seq, row) live rows in seq order and `deleted`
+        (seq, row_id) rows deleted since the last sync checkpoint."""
+        raise NotImplementedError
+
+    def write_client(self, client_id, records):
+        """Apply journal records (see persistence.SubmissionLog) in one transaction."""
+        raise NotImplementedError
+
+    # -- Sheet sync outbox --------------------------------------------------
+
+    def enqueue_sync(self, records):
+        """Queue a batch of records for upload; returns the batch id."""
+        raise NotImplementedError
+
+    def pending_sync(self):
+        """Number of batches waiting or being uploaded."""
+        raise NotImplementedError
+
+    def claim_sync(self, worker, max_rows, lease):
+        """Claim the oldest unclaimed (or lease-expired) batches, up to
+        `max_rows` records but at least one batch, for `lease` seconds.
+        Returns [(batch_id, records)]."""
+        raise NotImplementedError
+
+    def finish_sync(self, batch_ids, error=None):
+        raise NotImplementedError
+
+    def sync_status(self, batch_ids):
+        """{batch_id: (state, error)}; batches that no longer exist are left out."""
+        raise NotImplementedError
+
+    def forget_sync(self, batch_ids):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _apply_client_record(client, record):
+    """Apply one journal record to a MemoryBackend client entry."""
+    op = record["op"]
+    if op == "append":
+        row = tuple(record["row"])
+        client["rows"].setdefault(row[0], (record["seq"], row))
+        client["last_seq"] = max(client["last_seq"], record["seq"])
+    elif op == "delete":
+        entry = client["rows"].pop(record["id"], None)
+        if entry is not None:
+            client["deleted"].append((entry[0], record["id"]))
+    elif op == "sync":
+        client["synced_seq"] = record["synced_seq"]
+        client["tombstones"] = list(record["tombstones"])
+        # Deletes up to here are either uploaded or in the tombstones
+        client["deleted"] = []
+
+
+class MemoryBackend(SharedBackend):
+    """Everything in this process's memory; shared by whatever holds it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._last_event = 0
+        # replica -> (seq, last heard from)
+        self._replicas = {}
+        self._compacted_through = 0
+        self._clients = {}
+        self._outbox = {}
+        self._next_batch = 1
+
+    def publish_many(self, events):
+        with self._lock:
+            for op, row_id, row in events:
+                self._last_event += 1
+                self._events.append((self._last_event, op, row_id, tuple(row) if row else None))
+
+    def events_since(self, seq, limit=EVENT_BATCH):
+        with self._lock:
+            start = bisect_right(self._events, seq, key=lambda event: event[0])
+            return self._events[start:start + limit]
+
+    def ack_events(self, replica, seq):
+        with self._lock:
+            self._replicas[replica] = (seq, time.time())
+            return self._compacted_through
+
+    def compact_events(self, replica_ttl=REPLICA_TTL):
+        now = time.time()
+        with self._lock:
+            self._replicas = {
+                replica: (seq, seen) for replica, (seq, seen) in self._replicas.items()
+                if seen >= now - replica_ttl
+            }
+            floor = min((seq for seq, _ in self._replicas.values()), default=0)
+            if not floor:
+                return 0
+            deleted = {row_id for seq, op, row_id, _ in self._events if op == "delete" and seq <= floor}
+            count = len(self._events)
+            self._events = [
+                event for event in self._events
+                if not (event[1] == "append" and event[2] in deleted or event[1] == "delete" and event[0] <= floor)
+            ]
+            self._compacted_through = max(self._compacted_through, floor)
+            return count - len(self._events)
+
+    def load_client(self, client_id):
+        with self._lock:
+            client = self._clients.get(client_id)
+            if client is None:
+                return [], [], 0, 0, []
+            rows = sorted(client["rows"].values())
+            return rows, list(client["deleted"]), client["last_seq"], client["synced_seq"], list(client["tombstones"])
+
+    def write_client(self, client_id, records):
+        with self._lock:
+            client = self._clients.setdefault(client_id, {
+                "rows": {}, "deleted": [], "last_seq": 0, "synced_seq": 0, "tombstones": []
+            })
+            for record in records:
+                _apply_client_record(client, record)
+
+    def enqueue_sync(self, records):
+        with self._lock:
+            batch_id = self._next_batch
+            self._next_batch += 1
+            self._outbox[batch_id] = {
+                "records": list(records), "state": PENDING, "worker": None,
+                "lease_until": 0.0, "error": None, "finished": None
+            }
+            return batch_id
+
+    def pending_sync(self):
+        with self._lock:
+            return sum(1 for batch in self._outbox.values() if batch["state"] in (PENDING, CLAIMED))
+
+    def claim_sync(self, worker, max_rows, lease):
+        now = time.time()
+        with self._lock:
+            for batch_id, batch in list(self._outbox.items()):
+                if batch["finished"] is not None and batch["finished"] < now - FINISHED_TTL:
+                    del self._outbox[batch_id]
+            claimed = []
+            rows = 0
+            for batch_id in sorted(self._outbox):
+                batch = self._outbox[batch_id]
+                if batch["state"] == PENDING or (batch["state"] == CLAIMED and batch["lease_until"] < now):
+                    if claimed and rows + len(batch["records"]) > max_rows:
+                        break
+                    batch.update(state=CLAIMED, worker=worker, lease_until=now + lease)
+                    claimed.append((batch_id, batch["records"]))
+                    rows += len(batch["records"])
+            return claimed
+
+    def finish_sync(self, batch_ids, error=None):
+        now = time.time()
+        with self._lock:
+            for batch_id in batch_ids:
+                batch = self._outbox.get(batch_id)
+                if batch is not None:
+                    batch.update(state=FAILED if error else DONE, error=error, finished=now)
+
+    def sync_status(self, batch_ids):
+        with self._lock:
+            return {
+                batch_id: (self._outbox[batch_id]["state"], self._outbox[batch_id]["error"])
+                for batch_id in batch_ids if batch_id in self._outbox
+            }
+
+    def forget_sync(self, batch_ids):
+        with self._lock:
+            for batch_id in batch_ids:
+                self._outbox.pop(batch_id, None)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hub_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    timestamp TEXT, beverage_type TEXT, beverage_name TEXT,
+    recommendation TEXT, reason TEXT, site TEXT
+);
+CREATE INDEX IF NOT EXISTS hub_events_row ON hub_events (row_id);
+CREATE INDEX IF NOT EXISTS hub_events_op ON hub_events (op, seq);
+CREATE TABLE IF NOT EXISTS hub_replicas (
+    replica TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hub_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    compacted_through INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO hub_state (id, compacted_through) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS client_rows (
+    client_id TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    timestamp TEXT, beverage_type TEXT, beverage_name TEXT,
+    recommendation TEXT, reason TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (client_id, row_id)
+);
+CREATE INDEX IF NOT EXISTS client_rows_seq ON client_rows (client_id, seq);
+CREATE TABLE IF NOT EXISTS client_state (
+    client_id TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    synced_seq INTEGER NOT NULL DEFAULT 0,
+    tombstones TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS sync_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    records TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS sync_outbox_state ON sync_outbox (state, id);
+"""
+
+
+class SQLiteBackend(SharedBackend):
+    """One SQLite database in WAL mode, shared by the workers on this machine."""
+
+    def __init__(self, path, busy_timeout=5.0):
+        # sqlite3 is only needed for multi-worker mode, never under Pyodide
+        self._sqlite3 = import_package("sqlite3")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        # One connection per thread; a connection can't be shared by threads
+        # that each run their own transactions
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @property
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit; writes use explicit BEGIN IMMEDIATE transactions so
+            # concurrent writers queue on the lock instead of failing mid-way
+            db = self._sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                       check_same_thread=False)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            with self._connections_lock:
+                self._connections.append(db)
+        return db
+
+    def _write(self, fn):
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    def publish_many(self, events):
+        self._write(lambda db: db.executemany(
+            "INSERT INTO hub_events (op, row_id, timestamp, beverage_type, beverage_name, "
+            "recommendation, reason, site) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(op, row_id, *(tuple(row) if row else (None,) * 6)) for op, row_id, row in events]
+        ))
+
+    def events_since(self, seq, limit=EVENT_BATCH):
+        cursor = self._db.execute(
+            "SELECT seq, op, row_id, timestamp, beverage_type, beverage_name, recommendation, reason, site "
+            "FROM hub_events WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit)
+        )
+        return [
+            (seq, op, row_id, tuple(row) if op == "append" else None)
+            for seq, op, row_id, *row in cursor
+        ]
+
+    def ack_events(self, replica, seq):
+        def ack(db):
+            db.execute(
+                "INSERT INTO hub_replicas (replica, seq, seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (replica) DO UPDATE SET seq = excluded.seq, seen = excluded.seen",
+                (replica, seq, time.time())
+            )
+            return db.execute("SELECT compacted_through FROM hub_state").fetchone()[0]
+        return self._write(ack)
+
+    def compact_events(self, replica_ttl=REPLICA_TTL):
+        def compact(db):
+            db.execute("DELETE FROM hub_replicas WHERE seen < ?", (time.time() - replica_ttl,))
+            floor = db.execute("SELECT MIN(seq) FROM hub_replicas").fetchone()[0]
+            if not floor:
+                return 0
+            dropped = db.execute(
+                "DELETE FROM hub_events WHERE op = 'append' AND row_id IN "
+                "(SELECT row_id FROM hub_events WHERE op = 'delete' AND seq <= ?)",
+                (floor,)
+            ).rowcount
+            dropped += db.execute("DELETE FROM hub_events WHERE op = 'delete' AND seq <= ?", (floor,)).rowcount
+            db.execute(
+                "UPDATE hub_state SET compacted_through = MAX(compacted_through, ?)", (floor,)
+            )
+            return dropped
+        return self._write(compact)
+
+    def load_client(self, client_id):
+        db = self._db
+        # One read transaction, so rows and checkpoint agree
+        db.execute("BEGIN")
+        try:
+            state = db.execute(
+                "SELECT last_seq, synced_seq, tombstones FROM client_state WHERE client_id = ?",
+                (client_id,)
+            ).fetchone()
+            rows = []
+            deleted = []
+            for seq, row_id, timestamp, beverage_type, beverage_name, recommendation, reason, is_deleted in db.execute(
+                "SELECT seq, row_id, timestamp, beverage_type, beverage_name, recommendation, reason, deleted "
+                "FROM client_rows WHERE client_id = ? ORDER BY seq",
+                (client_id,)
+            ):
+                if is_deleted:
+                    deleted.append((seq, row_id))
+                else:
+                    rows.append((seq, (row_id, timestamp, beverage_type, beverage_name, recommendation, reason)))
+        finally:
+            db.execute("COMMIT")
+        if state is None:
+            return rows, deleted, 0, 0, []
+        last_seq, synced_seq, tombstones = state
+        return rows, deleted, last_seq, synced_seq, json.loads(tombstones)
+
+    def write_client(self, client_id, records):
+        def write(db):
+            db.execute("INSERT OR IGNORE INTO client_state (client_id) VALUES (?)", (client_id,))
+            for record in records:
+                op = record["op"]
+                if op == "append":
+                    db.execute(
+                        "INSERT OR IGNORE INTO client_rows (client_id, row_id, timestamp, beverage_type, "
+                        "beverage_name, recommendation, reason, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (client_id, *record["row"], record["seq"])
+                    )
+                    db.execute(
+                        "UPDATE client_state SET last_seq = MAX(last_seq, ?) WHERE client_id = ?",
+                        (record["seq"], client_id)
+                    )
+                elif op == "delete":
+                    db.execute(
+                        "UPDATE client_rows SET deleted = 1 WHERE client_id = ? AND row_id = ?",
+                        (client_id, record["id"])
+                    )
+                elif op == "sync":
+                    db.execute(
+                        "UPDATE client_state SET synced_seq = ?, tombstones = ? WHERE client_id = ?",
+                        (record["synced_seq"], json.dumps(list(record["tombstones"])), client_id)
+                    )
+                    # Deletes up to here are either uploaded or in the tombstones
+                    db.execute("DELETE FROM client_rows WHERE client_id = ? AND deleted = 1", (client_id,))
+        self._write(write)
+
+    def enqueue_sync(self, records):
+        return self._write(lambda db: db.execute(
+            "INSERT INTO sync_outbox (records, row_count, state) VALUES (?, ?, ?)",
+            (json.dumps(records), len(records), PENDING)
+        ).lastrowid)
+
+    def pending_sync(self):
+        return self._db.execute(
+            "SELECT COUNT(*) FROM sync_outbox WHERE state IN (?, ?)", (PENDING, CLAIMED)
+        ).fetchone()[0]
+
+    def claim_sync(self, worker, max_rows, lease):
+        now = time.time()
+
+        def claim(db):
+            db.execute(
+                "DELETE FROM sync_outbox WHERE finished IS NOT NULL AND finished < ?",
+                (now - FINISHED_TTL,)
+            )
+            claimed = []
+            rows = 0
+            for batch_id, records, row_count in db.execute(
+                "SELECT id, records, row_count FROM sync_outbox "
+                "WHERE state = ? OR (state = ? AND lease_until < ?) ORDER BY id",
+                (PENDING, CLAIMED, now)
+            ).fetchall():
+                if claimed and rows + row_count > max_rows:
+                    break
+                claimed.append((batch_id, json.loads(records)))
+                rows += row_count
+            db.executemany(
+                "UPDATE sync_outbox SET state = ?, worker = ?, lease_until = ? WHERE id = ?",
+                [(CLAIMED, worker, now + lease, batch_id) for batch_id, _ in claimed]
+            )
+            return claimed
+        return self._write(claim)
+
+    def finish_sync(self, batch_ids, error=None):
+        now = time.time()
+        self._write(lambda db: db.executemany(
+            "UPDATE sync_outbox SET state = ?, error = ?, finished = ? WHERE id = ?",
+            [(FAILED if error else DONE, error, now, batch_id) for batch_id in batch_ids]
+        ))
+
+    def sync_status(self, batch_ids):
+        if not batch_ids:
+            return {}
+        marks = ",".join("?" * len(batch_ids))
+        return {
+            batch_id: (state, error)
+            for batch_id, state, error in self._db.execute(
+                f"SELECT id, state, error FROM sync_outbox WHERE id IN ({marks})", list(batch_ids)
+            )
+        }
+
+    def forget_sync(self, batch_ids):
+        self._write(lambda db: db.executemany(
+            "DELETE FROM sync_outbox WHERE id = ?", [(batch_id,) for batch_id in batch_ids]
+        ))
+
+    def close(self):
+        with self._connections_lock:
+            for db in self._connections:
+                db.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+# Backends by URL, one per process
+_backends = {}
+
+
+def open_backend(url=None):
+    """The shared backend for `url` (default: SSC_BACKEND), or None in
+    single-process mode."""
+    url = os.environ.get("SSC_BACKEND", "") if url is None else url
+    if not url:
+        return None
+    backend = _backends.get(url)
+    if backend is None:
+        if url == "memory":
+            backend = MemoryBackend()
+        elif url.startswith("sqlite://"):
+            backend = SQLiteBackend(url[len("sqlite://"):])
+        else:
+            raise BackendError(f"Unknown backend {url!r} (expected 'memory' or 'sqlite:///path')")
+        _backends[url] = backend
+    return backend
@@ -0,0 +1,129 @@
+# Bulk catalog import
+#
+# Streams a CSV or Parquet file of beverages in fixed-size chunks so large
+# menus can be classified without ever holding the whole file in memory.
+# Each chunk is a dict of column name -> list, ready for classify_beverages().
+import csv
+import os
+
+from classify import INPUT_COLUMNS
+from lazy import import_package, load_package
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Alternative column headers people tend to use in their spreadsheets
+COLUMN_ALIASES = {
+    "type": "beverage_type",
+    "name": "beverage_name",
+    "serving_size": "juice_serving_size",
+    "serving_size_oz": "juice_serving_size",
+    "100_percent_juice": "is_100_percent",
+    "100%_juice": "is_100_percent",
+    "is_100_percent_juice": "is_100_percent",
+    "flavored": "is_flavored",
+    "sweetened": "is_sweetened",
+    "artificial_sweeteners": "artificial",
+    "has_artificial": "artificial",
+    "total_sugar_g": "total_sugar",
+    "added_sugar_g": "added_sugar",
+}
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+def _normalize_column(name):
+    key = str(name).strip().lower().replace(" ", "_").replace("-", "_")
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _empty_chunk():
+    return {column: [] for column in INPUT_COLUMNS}
+
+
+def _iter_csv(path, chunk_size):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [_normalize_column(name) for name in header]
+        if "beverage_type" not in columns:
+            raise CatalogImportError("Catalog is missing a beverage_type column")
+        # Only keep the columns the classifier knows about
+        keep = [(i, name) for i, name in enumerate(columns) if name in INPUT_COLUMNS]
+
+        chunk = _empty_chunk()
+        size = 0
+        for row in reader:
+            if not row:
+                continue
+            for i, name in keep:
+                chunk[name].append(row[i].strip() if i < len(row) else None)
+            size += 1
+            if size == chunk_size:
+                yield _finish_chunk(chunk, size)
+                chunk = _empty_chunk()
+                size = 0
+        if size:
+            yield _finish_chunk(chunk, size)
+
+
+def _iter_parquet(path, chunk_size):
+    try:
+        pq = import_package("pyarrow.parquet")
+    except ImportError:
+        raise CatalogImportError("Parquet import requires the pyarrow package")
+
+    parquet_file = pq.ParquetFile(path)
+    columns = {_normalize_column(name): name for name in parquet_file.schema_arrow.names}
+    if "beverage_type" not in columns:
+        raise CatalogImportError("Catalog is missing a beverage_type column")
+    wanted = {name: source for name, source in columns.items() if name in INPUT_COLUMNS}
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=list(wanted.values())):
+        chunk = _empty_chunk()
+        for name, source in wanted.items():
+            chunk[name] = batch.column(source).to_pylist()
+        yield _finish_chunk(chunk, batch.num_rows)
+
+
+# Fill columns that were absent from the file with None and tidy up the
+# beverage type so "milk" or " MILK" still match "Milk"
+def _finish_chunk(chunk, size):
+    for name, values in chunk.items():
+        if not values:
+            chunk[name] = [None] * size
+    chunk["beverage_type"] = [
+        str(value).strip().capitalize() if value is not None else None
+        for value in chunk["beverage_type"]
+    ]
+    return chunk
+
+
+def _is_parquet(filename):
+    return os.path.splitext(filename)[1].lower() in (".parquet", ".pq")
+
+
+async def load_catalog_reader(filename):
+    """Make sure the reader for `filename` can be imported, downloading
+    pyarrow first under Pyodide for Parquet files."""
+    if not _is_parquet(filename):
+        return
+    try:
+        await load_package("pyarrow.parquet", "pyarrow")
+    except Exception:
+        # ImportError, or a failed download under Pyodide
+        raise CatalogImportError("Parquet import requires the pyarrow package")
+
+
+def iter_catalog_chunks(path, filename=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the catalog at `path` as chunks of at most `chunk_size` rows.
+
+    The format is picked from `filename` (or `path`): .parquet / .pq files are
+    read with pyarrow, everything else as CSV.
+    """
+    if _is_parquet(filename or path):
+        return _iter_parquet(path, chunk_size)
+    return _iter_csv(path, chunk_size)
@@ -0,0 +1,81 @@
+# Recommendation cache
+#
+# A bounded LRU cache keyed by the guideline table and the normalized inputs
+# that actually affect a recommendation, so repeat products skip both the
+# rules and the HTML rendering of the result.
+from collections import OrderedDict
+
+from rules import FLAG, TRUE_STRINGS
+
+# Sugar values and serving sizes are rounded to this many decimals
+KEY_DECIMALS = 2
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_inputs(rules, beverage_type, inputs):
+    """Keep only the inputs the rules for `beverage_type` look at, with flags
+    as bools and numbers rounded to KEY_DECIMALS."""
+    compiled = rules.types.get(beverage_type)
+    normalized = {}
+    for name, kind in (compiled.inputs.items() if compiled else ()):
+        value = inputs.get(name)
+        if kind == FLAG:
+            normalized[name] = str(value).strip().lower() in TRUE_STRINGS if value is not None else False
+        else:
+            try:
+                normalized[name] = round(float(value), KEY_DECIMALS)
+            except (TypeError, ValueError):
+                normalized[name] = None
+    return normalized
+
+
+def recommendation_key(rules, beverage_type, normalized):
+    # Includes the rule table, so a reloaded table never serves stale results
+    return (rules.key, beverage_type) + tuple(normalized.values())
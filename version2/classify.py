@@ -0,0 +1,129 @@
+# Beverage classification engine
+#
+# Evaluates the compiled guideline rule tables (see rules.py) for a whole
+# batch of beverages in one vectorized pass. The single-beverage form calls
+# this with a batch of one so the rules only live in one place.
+import numpy as np
+
+from rules import (
+    COLORS, GREEN, IMAGES, INVALID, INVALID_REASON, LABELS, NUMBER, RED,
+    TRUE_STRINGS, YELLOW, current_rules, str_to_sentence
+)
+
+BEVERAGE_TYPES = ["Juice", "Milk", "Other"]
+
+# Input columns (same names as the form inputs)
+INPUT_COLUMNS = [
+    "beverage_type",
+    "beverage_name",
+    "juice_serving_size",
+    "is_100_percent",
+    "is_flavored",
+    "is_sweetened",
+    "artificial",
+    "total_sugar",
+    "added_sugar",
+]
+
+
+def _bitmask(*flags):
+    mask = np.zeros(len(flags[0]), dtype=np.int64)
+    for bit, flag in enumerate(flags):
+        mask |= flag.astype(np.int64) << bit
+    return mask
+
+
+# Convert a column of "True"/"False" strings, bools or numbers to a bool array
+def _as_bool(values, n):
+    if values is None:
+        return np.zeros(n, dtype=bool)
+    arr = np.asarray(values)
+    if arr.dtype == bool:
+        return arr
+    if arr.dtype.kind in "iuf":
+        return np.nan_to_num(arr.astype(float)) != 0
+    return np.array(
+        [str(v).strip().lower() in TRUE_STRINGS if v is not None else False for v in arr],
+        dtype=bool
+    )
+
+
+# Convert a column to floats, with NaN for anything missing or non-numeric
+def _as_float(values, n):
+    if values is None:
+        return np.full(n, np.nan)
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iufb":
+        return arr.astype(float)
+    out = np.full(len(arr), np.nan)
+    for i, v in enumerate(arr):
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def _column(beverages, name):
+    if hasattr(beverages, "columns"):
+        return beverages[name].to_numpy() if name in beverages.columns else None
+    return beverages.get(name)
+
+
+def classify_beverages(beverages, rules=None):
+    """Classify a batch of beverages.
+
+    `beverages` is a DataFrame or a mapping of column name -> array, using the
+    names in INPUT_COLUMNS. Missing columns count as "No" / empty. Returns a
+    dict of arrays: code, color, label, image, reason. `rules` defaults to the
+    active guideline table.
+    """
+    if rules is None:
+        rules = current_rules()
+    types = _column(beverages, "beverage_type")
+    types = np.asarray(types if types is not None else [], dtype=object)
+    n = len(types)
+
+    # Each input is converted once, however many rules read it
+    converted = {}
+
+    def column(name, kind):
+        key = (name, kind)
+        if key not in converted:
+            values = _column(beverages, name)
+            converted[key] = _as_float(values, n) if kind == NUMBER else _as_bool(values, n)
+        return converted[key]
+
+    code = np.full(n, INVALID, dtype=np.int64)
+    reason = np.full(n, INVALID_REASON, dtype=object)
+
+    for beverage_type, compiled in rules.types.items():
+        rows = types == beverage_type
+        if not rows.any():
+            continue
+        for check in compiled.valid:
+            rows &= check.evaluate(column)
+        if compiled.criteria:
+            mask = _bitmask(*[check.evaluate(column) for check in compiled.criteria])[rows]
+        else:
+            mask = np.zeros(int(rows.sum()), dtype=np.int64)
+        # Result and reason per row are lookups by the bitmask of failed criteria
+        code[rows] = compiled.codes[mask]
+        reason[rows] = compiled.reasons[mask]
+
+    return {
+        "code": code,
+        "color": COLORS[code],
+        "label": LABELS[code],
+        "image": IMAGES[code],
+        "reason": reason,
+    }
+
+
+def classify_beverage(beverage_type, rules=None, **inputs):
+    """Classify a single beverage; returns a dict of scalars."""
+    batch = {"beverage_type": [beverage_type]}
+    for name, value in inputs.items():
+        batch[name] = [value]
+    result = classify_beverages(batch, rules)
+    return {key: values[:1].tolist()[0] for key, values in result.items()}
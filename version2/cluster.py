@@ -0,0 +1,331 @@
+# Multi-worker mode
+#
+# Runs the app as several uvicorn worker processes behind a sticky-session
+# router, so one Python process no longer caps a district-wide campaign at
+# one core:
+#
+#   python cluster.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+#       [--backend sqlite:///path/shared.db] [--no-router]
+#
+# Workers serve app:app on 127.0.0.1, ports --port+1 ... --port+N, and keep
+# their process-wide state (the hub log, client journals and the sheet sync
+# outbox) in the shared backend given to them as SSC_BACKEND, by default a
+# SQLite database in WAL mode in SSC_DATA_DIR (see backend.py).
+#
+# The router in this process forwards each HTTP request and websocket to one
+# worker, picked by hashing the browser's ssc_client_id cookie (or its
+# address, before it has one). A Shiny session lives in one worker's memory,
+# so its websocket, uploads and downloads must all reach that worker; the
+# cookie is set before the websocket opens, and is the key that keeps them
+# together. Workers that exit are restarted on the same port.
+#
+# Behind a load balancer that can hash on a cookie, run with --no-router and
+# hash on the same key there, e.g. for nginx (plus the usual websocket
+# Upgrade/Connection headers):
+#
+#   upstream ssc { hash $cookie_ssc_client_id consistent; server 127.0.0.1:8001; ... }
+#
+# Each worker's /metrics is on its own port.
+import argparse
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import sys
+import zlib
+
+from lazy import import_package
+from metrics import setup_logging
+from persistence import default_data_dir
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CLIENT_COOKIE = re.compile(r"(?:^|;\s*)ssc_client_id=([^;]*)")
+
+# Not forwarded between the client and a worker
+HOP_BY_HOP = {
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"trailers", b"transfer-encoding", b"upgrade",
+}
+# Handshake headers passed on to a worker's websocket
+WEBSOCKET_HEADERS = {b"cookie", b"origin", b"user-agent", b"accept-language"}
+
+# How long a request waits for a (re)starting worker to accept connections
+CONNECT_TIMEOUT = 10.0
+SUPERVISE_INTERVAL = 1.0
+
+logger = logging.getLogger("ssc.cluster")
+
+
+class Worker:
+    def __init__(self, index, port, env):
+        self.index = index
+        self.host = "127.0.0.1"
+        self.port = port
+        self.env = {**env, "SSC_WORKER": f"worker-{index}"}
+        self.process = None
+        self.restarts = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", self.host, "--port", str(self.port),
+             "--no-access-log"],
+            cwd=APP_DIR,
+            env=self.env
+        )
+        logger.info("worker_started", extra={"fields": {"worker": self.index, "port": self.port,
+                                                          "pid": self.process.pid}})
+
+    def stop(self, timeout=10):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def client_key(scope):
+    """What a request is routed by: its ssc_client_id cookie, else its address."""
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            match = CLIENT_COOKIE.search(value.decode("latin-1"))
+            if match and match.group(1):
+                return match.group(1)
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+class StickyRouter:
+    """ASGI app forwarding each request and websocket to one of `workers`."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        # Only needed here, never under Pyodide
+        self._h11 = import_package("h11")
+        self._ws_connect = import_package("websockets.asyncio.client").connect
+        self._ws_exceptions = import_package("websockets.exceptions")
+
+    def pick(self, scope):
+        return self.workers[zlib.crc32(client_key(scope).encode("utf-8")) % len(self.workers)]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send, self.pick(scope))
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send, self.pick(scope))
+
+    @staticmethod
+    def _target(scope):
+        target = scope.get("raw_path") or scope["path"].encode("utf-8")
+        if scope.get("query_string"):
+            target += b"?" + scope["query_string"]
+        return target
+
+    @staticmethod
+    def _forwarded(scope):
+        client = scope.get("client")
+        return [
+            (b"x-forwarded-for", (client[0] if client else "").encode("latin-1")),
+            (b"x-forwarded-proto", scope.get("scheme", "http").encode("latin-1")),
+        ]
+
+    async def _open(self, worker):
+        # Retry while the worker is (re)starting
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CONNECT_TIMEOUT
+        while True:
+            try:
+                return await asyncio.open_connection(worker.host, worker.port)
+            except OSError:
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+    async def _http(self, scope, receive, send, worker):
+        h11 = self._h11
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        try:
+            reader, writer = await self._open(worker)
+        except OSError:
+            await _plain_response(send, 502, b"Worker unavailable\n")
+            return
+
+        headers = [
+            (name, value) for name, value in scope["headers"]
+            if name not in HOP_BY_HOP and name != b"content-length"
+        ]
+        headers += self._forwarded(scope)
+        headers += [(b"content-length", str(len(body)).encode("ascii")), (b"connection", b"close")]
+        upstream = h11.Connection(h11.CLIENT)
+        try:
+            writer.write(upstream.send(h11.Request(method=scope["method"], target=self._target(scope),
+                                                   headers=headers)))
+            if body:
+                writer.write(upstream.send(h11.Data(data=bytes(body))))
+            writer.write(upstream.send(h11.EndOfMessage()))
+            await writer.drain()
+
+            started = False
+            while True:
+                event = upstream.next_event()
+                if event is h11.NEED_DATA:
+                    upstream.receive_data(await reader.read(65536))
+                elif isinstance(event, h11.Response):
+                    await send({
+                        "type": "http.response.start",
+                        "status": event.status_code,
+                        "headers": [(name, value) for name, value in event.headers if name not in HOP_BY_HOP],
+                    })
+                    started = True
+                elif isinstance(event, h11.Data):
+                    await send({"type": "http.response.body", "body": bytes(event.data), "more_body": True})
+                elif isinstance(event, (h11.EndOfMessage, h11.ConnectionClosed)):
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+        except (OSError, h11.ProtocolError):
+            if started:
+                raise
+            await _plain_response(send, 502, b"Bad response from worker\n")
+        finally:
+            writer.close()
+
+    async def _websocket(self, scope, receive, send, worker):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        uri = f"ws://{worker.host}:{worker.port}{self._target(scope).decode('latin-1')}"
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in scope["headers"] + self._forwarded(scope)
+            if name in WEBSOCKET_HEADERS or name.startswith(b"x-forwarded-")
+        ]
+        try:
+            upstream = await self._ws_connect(
+                uri,
+                additional_headers=headers,
+                subprotocols=scope.get("subprotocols") or None,
+                open_timeout=CONNECT_TIMEOUT,
+                ping_interval=None,
+                max_size=None
+            )
+        except (OSError, TimeoutError, self._ws_exceptions.InvalidHandshake):
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        await send({"type": "websocket.accept", "subprotocol": upstream.subprotocol})
+
+        async def client_to_worker():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("text") is not None:
+                    await upstream.send(message["text"])
+                elif message.get("bytes") is not None:
+                    await upstream.send(message["bytes"])
+
+        async def worker_to_client():
+            async for data in upstream:
+                if isinstance(data, str):
+                    await send({"type": "websocket.send", "text": data})
+                else:
+                    await send({"type": "websocket.send", "bytes": data})
+
+        from_client = asyncio.create_task(client_to_worker())
+        from_worker = asyncio.create_task(worker_to_client())
+        done, pending = await asyncio.wait({from_client, from_worker}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            # Connection drops either way just end the session
+            if not task.cancelled() and task.exception() is not None:
+                logger.info("websocket_closed", extra={"fields": {"error": repr(task.exception())}})
+        await upstream.close()
+        if from_client not in done:
+            try:
+                await send({"type": "websocket.close", "code": upstream.close_code or 1000})
+            except (OSError, RuntimeError):
+                pass
+
+
+async def _plain_response(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode("ascii"))],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def supervise(workers):
+    while True:
+        await asyncio.sleep(SUPERVISE_INTERVAL)
+        for worker in workers:
+            code = worker.process.poll()
+            if code is not None:
+                worker.restarts += 1
+                logger.warning("worker_exited", extra={"fields": {"worker": worker.index, "code": code,
+                                                                    "restarts": worker.restarts}})
+                worker.start()
+
+
+async def serve(args, workers):
+    supervisor = asyncio.create_task(supervise(workers))
+    try:
+        if args.no_router:
+            await supervisor
+        else:
+            uvicorn = import_package("uvicorn")
+            config = uvicorn.Config(StickyRouter(workers), host=args.host, port=args.port,
+                                    lifespan="off", access_log=False, ws_max_size=2 ** 31)
+            await uvicorn.Server(config).serve()
+    finally:
+        supervisor.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the app as several workers behind a sticky router")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="router port; workers use the ports after it")
+    parser.add_argument("--backend", help="shared backend URL (default: SSC_BACKEND or sqlite in SSC_DATA_DIR)")
+    parser.add_argument("--no-router", action="store_true",
+                        help="only run the workers, for a load balancer that does the routing")
+    args = parser.parse_args()
+
+    setup_logging()
+    backend = args.backend or os.environ.get("SSC_BACKEND") or \
+        "sqlite://" + os.path.join(os.path.abspath(default_data_dir()), "shared.db")
+    if backend == "memory":
+        parser.error("the memory backend can't be shared between worker processes")
+    env = {**os.environ, "SSC_BACKEND": backend}
+
+    workers = [Worker(i, args.port + 1 + i, env) for i in range(max(1, args.workers))]
+    logger.info("cluster_starting", extra={"fields": {"workers": len(workers), "backend": backend,
+                                                        "port": args.port}})
+    for worker in workers:
+        worker.start()
+    try:
+        asyncio.run(serve(args, workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    main()
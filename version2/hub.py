@@ -0,0 +1,306 @@
+# Process-wide submissions hub
+#
+# Every kiosk's live submissions also go into one shared log, with the
+# Summary tab's rollups kept alongside it. Only the newest rows are kept in
+# full (at least keep_rows, and as many as any subscriber asks for): that is
+# all a subscriber is ever handed, while the rollups and the set of live
+# RowIDs take care of everything older. Sessions subscribe with a cursor
+# (the last sequence number they have seen). A single fan-out task wakes at
+# most every FANOUT_INTERVAL seconds, hands each subscriber the rows appended
+# and deleted since its cursor in one batch, and then runs one reactive flush
+# for all sessions together, instead of invalidating every session on every
+# append.
+#
+# Publishing only touches plain Python structures on the event loop thread,
+# so it needs no lock; the reactive lock is only held for the fan-out flush.
+#
+# In multi-worker mode the log itself lives in the shared backend (see
+# backend.py) and each worker's hub is a replica of it: publishing applies
+# the event locally straight away and queues it for the backend, where a
+# writer task adds everything queued in one transaction, off the event loop.
+# The fan-out task also polls the backend every POLL_INTERVAL seconds while
+# anyone is subscribed, applying other workers' events in order. Applying an
+# event is idempotent, so a worker's own events coming back from the backend
+# are no-ops.
+#
+# While polling, a replica tells the backend how far it has read every
+# ACK_INTERVAL seconds and compacts the log every COMPACT_INTERVAL (see
+# SharedBackend.compact_events()). A replica that sat idle long enough for
+# compaction to pass it replays the log from the start.
+import asyncio
+import logging
+import time
+
+from shiny import reactive
+
+from lazy import import_package
+from metrics import FANOUT_SECONDS
+from rollups import SubmissionRollups
+from store import SubmissionStore
+
+FANOUT_INTERVAL = 0.25
+POLL_INTERVAL = 0.5
+KEEP_ROWS = 100
+ACK_INTERVAL = 30.0
+COMPACT_INTERVAL = 300.0
+# Backend events read per call while catching up
+EVENT_BATCH = 5000
+
+logger = logging.getLogger("ssc.hub")
+
+
+class Subscription:
+    def __init__(self, hub, callback, max_rows):
+        self._hub = hub
+        self.callback = callback
+        self.max_rows = max_rows
+        # Sequence number of the newest row delivered; 0 so the first batch
+        # carries the most recent rows already in the log
+        self.cursor = 0
+        # Position in the hub's deletion log
+        self.deleted_cursor = hub._deleted_end
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._hub._subscriptions.discard(self)
+
+
+class SubmissionsHub:
+    def __init__(self, fanout_interval=FANOUT_INTERVAL, backend=None, poll_interval=POLL_INTERVAL, replica=None,
+                 keep_rows=KEEP_ROWS):
+        # The newest rows only (see _trim()); _live has every live RowID
+        self.store = SubmissionStore()
+        self.keep_rows = keep_rows
+        self._live = set()
+        self.rollups = SubmissionRollups()
+        self.fanout_interval = fanout_interval
+        self.backend = backend
+        self.poll_interval = poll_interval
+        # This replica's name in the backend (backend.py is server-only, so
+        # it's imported by name)
+        self.replica = replica or (import_package("backend").worker_id() if backend is not None else None)
+        # Sequence number of the last backend event applied
+        self.backend_seq = 0
+        # When this replica last acknowledged its position / compacted
+        self._acked = None
+        self._compacted = None
+        self._subscriptions = set()
+        # RowIDs deleted from the shared log, oldest first; _deleted_base is
+        # the log position of _deleted[0] (positions before it were trimmed)
+        self._deleted = []
+        self._deleted_base = 0
+        self._changed = None
+        self._worker = None
+        # Events waiting for the backend writer, oldest first
+        self._outgoing = []
+        self._publisher = None
+
+    @property
+    def _deleted_end(self):
+        return self._deleted_base + len(self._deleted)
+
+    def publish_append(self, row_id, timestamp, beverage_type, beverage_name, recommendation, reason, site=None):
+        row = (timestamp, beverage_type, beverage_name, recommendation, reason, site)
+        self._publish([("append", row_id, row)])
+        if self._apply_append(row_id, *row):
+            self._notify()
+
+    def publish_appends(self, rows, site=None):
+        """publish_append() for each (row_id, timestamp, beverage_type,
+        beverage_name, recommendation, reason) in `rows`, in one backend
+        write and one notification."""
+        rows = [tuple(row) + (site,) for row in rows]
+        self._publish([("append", row[0], row[1:]) for row in rows])
+        changed = False
+        for row in rows:
+            changed |= self._apply_append(*row)
+        if changed:
+            self._notify()
+
+    def publish_delete(self, row_id):
+        # Published even if this replica hasn't seen the row yet
+        self._publish([("delete", row_id, None)])
+        if self._apply_delete(row_id):
+            self._notify()
+
+    def _publish(self, events):
+        if self.backend is None or not events:
+            return
+        self._outgoing.extend(events)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. a script importing the app): write them now
+            events, self._outgoing = self._outgoing, []
+            self.backend.publish_many(events)
+            return
+        if self._publisher is None or self._publisher.done():
+            self._publisher = loop.create_task(self._write_events())
+
+    async def _write_events(self):
+        # Everything published while a write is in flight goes in the next one
+        while self._outgoing:
+            events, self._outgoing = self._outgoing, []
+            try:
+                await asyncio.to_thread(self.backend.publish_many, events)
+            except Exception:
+                logger.exception("hub_publish_failed")
+                # Keep them, in order, and try again
+                self._outgoing[:0] = events
+                await asyncio.sleep(self.poll_interval)
+
+    def _apply_append(self, row_id, timestamp, beverage_type, beverage_name, recommendation, reason, site):
+        if row_id in self._live:
+            return False
+        self._live.add(row_id)
+        self.store.append(row_id, timestamp, beverage_type, beverage_name, recommendation, reason)
+        self.rollups.add(row_id, beverage_type, timestamp, recommendation, site)
+        self._trim()
+        return True
+
+    def _apply_delete(self, row_id):
+        if row_id not in self._live:
+            return False
+        self._live.discard(row_id)
+        # Gone from the store already if it was trimmed
+        self.store.delete(row_id)
+        self.rollups.remove(row_id)
+        self._deleted.append(row_id)
+        return True
+
+    def _trim(self):
+        # Let the store grow to twice keep_rows, then drop the oldest rows
+        # in one go, so trimming is cheap per append
+        excess = len(self.store) - self.keep_rows
+        if excess < self.keep_rows:
+            return
+        oldest = [row[0] for _, row in zip(range(excess), self.store.rows())]
+        self.store.delete_many(oldest)
+
+    async def pull(self):
+        """Apply the backend events this replica hasn't seen; returns True if
+        anything changed. Events are read in a thread and applied here, on
+        the event loop."""
+        changed = await self._maintain()
+        while True:
+            events = await asyncio.to_thread(self.backend.events_since, self.backend_seq, EVENT_BATCH)
+            for seq, op, row_id, row in events:
+                if op == "append":
+                    changed |= self._apply_append(row_id, *row)
+                elif op == "delete":
+                    changed |= self._apply_delete(row_id)
+                self.backend_seq = seq
+            if len(events) < EVENT_BATCH:
+                return changed
+
+    async def _maintain(self):
+        """Acknowledge this replica's position and compact the backend log,
+        when they are due; returns True if the replica had to start over."""
+        now = time.monotonic()
+        resynced = False
+        if self._acked is None or now - self._acked >= ACK_INTERVAL:
+            compacted_through = await asyncio.to_thread(self.backend.ack_events, self.replica, self.backend_seq)
+            self._acked = now
+            if 0 < self.backend_seq < compacted_through:
+                self._resync()
+                resynced = True
+        if self._compacted is None or now - self._compacted >= COMPACT_INTERVAL:
+            self._compacted = now
+            dropped = await asyncio.to_thread(self.backend.compact_events)
+            if dropped:
+                logger.info("hub_compacted", extra={"fields": {"events": dropped}})
+        return resynced
+
+    def _resync(self):
+        # Deletes this replica hadn't applied may have been compacted away;
+        # rebuild from what is left of the log
+        logger.warning("hub_resync", extra={"fields": {"replica": self.replica, "seq": self.backend_seq}})
+        self.store = SubmissionStore()
+        self._live = set()
+        self.rollups = SubmissionRollups()
+        self.backend_seq = 0
+        for subscription in self._subscriptions:
+            subscription.cursor = 0
+
+    def subscribe(self, callback, max_rows=50):
+        """Call `callback(rows, deleted_row_ids)` with what changed since the
+        last call, at most every fanout_interval seconds.
+
+        `rows` is at most the newest `max_rows` rows appended since then. The
+        first call carries the newest rows already in the log.
+        """
+        subscription = Subscription(self, callback, max_rows)
+        self.keep_rows = max(self.keep_rows, max_rows)
+        self._subscriptions.add(subscription)
+        self._notify()
+        return subscription
+
+    def _notify(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. a script importing the app); nobody to notify
+            return
+        if self._worker is None or self._worker.done():
+            self._changed = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+        self._changed.set()
+
+    async def _run(self):
+        while True:
+            woken = await self._wait_for_changes()
+            self._changed.clear()
+            start = time.perf_counter()
+            try:
+                # Nothing to hand out if a poll found nothing new
+                if self.backend is not None and not await self.pull() and not woken:
+                    continue
+                await self._fan_out()
+            except Exception:
+                logger.exception("fanout_failed")
+            FANOUT_SECONDS.observe(time.perf_counter() - start)
+            # Whatever is published meanwhile goes out in the next batch
+            await asyncio.sleep(self.fanout_interval)
+
+    async def _wait_for_changes(self):
+        """Wait until something is published or subscribes; with a backend
+        and subscribers, also wake every poll_interval. True unless the
+        wait timed out."""
+        if self.backend is None or not self._subscriptions:
+            await self._changed.wait()
+            return True
+        # Other workers' events only show up by polling
+        try:
+            await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _fan_out(self):
+        last_seq = self.store.last_seq
+        deleted_end = self._deleted_end
+        async with reactive.lock():
+            notified = False
+            for subscription in list(self._subscriptions):
+                if subscription.cursor == last_seq and subscription.deleted_cursor == deleted_end:
+                    continue
+                rows = self.store.rows_since(subscription.cursor)[-subscription.max_rows:]
+                deleted = self._deleted[subscription.deleted_cursor - self._deleted_base:]
+                subscription.cursor = last_seq
+                subscription.deleted_cursor = deleted_end
+                if rows or deleted:
+                    subscription.callback(rows, deleted)
+                    notified = True
+            if notified:
+                await reactive.flush()
+
+        # Every subscriber has seen these deletions
+        if self._subscriptions:
+            seen = min(s.deleted_cursor for s in self._subscriptions)
+        else:
+            seen = deleted_end
+        if seen > self._deleted_base:
+            del self._deleted[:seen - self._deleted_base]
+            self._deleted_base = seen
@@ -0,0 +1,34 @@
+# Optional dependencies, loaded on first use
+#
+# These are imported by name through importlib instead of with import
+# statements: Shinylive scans the app's source for imports and downloads every
+# package it finds before the app starts. Under Pyodide the package is fetched
+# with loadPackage() the first time it is needed. Server-only modules that
+# tools/export_docs.py leaves out of the Shinylive build (backend.py) are
+# imported the same way.
+import importlib
+import sys
+
+
+def is_pyodide():
+    try:
+        import pyodide  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+async def load_package(name, package=None):
+    """Import module `name`, first downloading `package` under Pyodide.
+
+    `package` defaults to the top-level module name.
+    """
+    if is_pyodide() and name not in sys.modules:
+        import pyodide_js
+        await pyodide_js.loadPackage(package or name.split(".")[0])
+    return importlib.import_module(name)
+
+
+def import_package(name):
+    """Import an optional package that is installed (or was loaded with load_package)."""
+    return importlib.import_module(name)
@@ -0,0 +1,359 @@
+# Instrumentation
+#
+# Timing histograms for the reactive effects and renders, counters for what
+# users do (submits, deletes, saves) and for the recommendation cache, and
+# structured logs. It is all
+# in-process and stdlib-only, so it runs unchanged under Pyodide; outside
+# Pyodide MetricsEndpoint serves the registry at METRICS_PATH in Prometheus
+# text format.
+#
+# Most metrics are recorded on the event loop, but the sheet sync, backend
+# and journal work runs in threads (asyncio.to_thread), so every metric
+# guards its series with its own lock; recording one is a perf_counter()
+# pair, a bisect and a dict update under an uncontended lock.
+#
+# Logs are one JSON object per line. Handlers only put records on a queue and
+# a QueueListener thread formats and writes them, so logging never blocks the
+# event loop on I/O (Pyodide has no threads; there the records go straight to
+# the browser console). Hot-path events logged with log_event() are sampled
+# at SSC_LOG_SAMPLE (default 0.1); everything else is always kept.
+import atexit
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; reactive work should sit in the low milliseconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+DEFAULT_LOG_SAMPLE = 0.1
+
+logger = logging.getLogger("ssc")
+
+
+# -- Metrics ------------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series = {}
+        self._function = None
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def set_function(self, fn):
+        """Take the (unlabelled) value from `fn()` whenever it is read, for
+        counts something else already keeps."""
+        if self.labels:
+            raise ValueError(f"{self.name} has labels; only unlabelled metrics can use a function")
+        self._function = fn
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} takes labels {', '.join(self.labels) or '(none)'}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        if self._function is not None:
+            yield from self._sample_lines((), self._function())
+            return
+        with self._lock:
+            series = [(key, self._copy(value)) for key, value in sorted(self._series.items())]
+        for key, value in series:
+            yield from self._sample_lines(key, value)
+
+    def _copy(self, value):
+        return value
+
+    def _sample_lines(self, key, value):
+        yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        if self._function is not None:
+            return self._function()
+        return self._series.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        if self._function is not None:
+            return self._function()
+        return self._series.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            return sum(series[0]) if series else 0
+
+    def _copy(self, series):
+        return [list(series[0]), series[1]]
+
+    def _sample_lines(self, key, series):
+        counts, total = series
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            le = _format_labels(self.labels, key, [("le", _format_value(bound))])
+            yield f"{self.name}_bucket{le} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labels, key)} {repr(total)}"
+        yield f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """The registry in Prometheus text exposition format."""
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+EFFECT_SECONDS = Histogram("ssc_effect_seconds", "Time spent running a reactive effect", ("effect",))
+RENDER_SECONDS = Histogram("ssc_render_seconds", "Time spent rendering an output", ("output",))
+FANOUT_SECONDS = Histogram("ssc_hub_fanout_seconds", "Time spent handing one hub batch to every session")
+SUBMITS = Counter("ssc_submits_total", "Beverage form submissions by result", ("result",))
+DELETES = Counter("ssc_deletes_total", "Submission rows asked to be deleted, by outcome", ("outcome",))
+SAVES = Counter("ssc_saves_total", "Save data requests by outcome", ("outcome",))
+SESSIONS = Counter("ssc_sessions_total", "Sessions started")
+ACTIVE_SESSIONS = Gauge("ssc_active_sessions", "Sessions currently connected")
+CACHE_HITS = Counter("ssc_recommendation_cache_hits_total", "Recommendation cache lookups answered from the cache")
+CACHE_MISSES = Counter("ssc_recommendation_cache_misses_total", "Recommendation cache lookups that ran the rules")
+CACHE_ENTRIES = Gauge("ssc_recommendation_cache_entries", "Recommendations currently cached")
+
+
+# Set by the reactive profiler when it is on: tracer(kind, name, fn) wraps
+# each timed function to trace its runs as well
+_tracer = None
+
+
+def set_tracer(tracer):
+    global _tracer
+    _tracer = tracer
+
+
+def timed(histogram, name=None):
+    """Decorator recording each call's duration in `histogram`, labelled with
+    `name` (default: the function's name). Goes directly on the function,
+    under the reactive/render decorators; works for sync and async functions."""
+    def decorator(fn):
+        kind = histogram.labels[0]
+        label = name or fn.__name__
+        labels = {kind: label}
+        observe = histogram.observe
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_fn(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(time.perf_counter() - start, **labels)
+        else:
+            @functools.wraps(fn)
+            def timed_fn(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    observe(time.perf_counter() - start, **labels)
+        return _tracer(kind, label, timed_fn) if _tracer is not None else timed_fn
+    return decorator
+
+
+class MetricsEndpoint:
+    """ASGI middleware answering GET METRICS_PATH with the registry."""
+
+    def __init__(self, app, registry=None):
+        self.app = app
+        self.registry = REGISTRY if registry is None else registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] not in ("GET", "HEAD"):
+            status, body, content_type = 405, b"Method Not Allowed\n", b"text/plain"
+        else:
+            status, body, content_type = 200, self.registry.render().encode("utf-8"), CONTENT_TYPE
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"cache-control", b"no-store"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+# -- Logging ------------------------------------------------------------------
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Keeps `rate` of the records marked sampled, and every other record."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return not getattr(record, "sampled", False) or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the message on the calling thread; leave
+    # that to the listener and only drop what can't cross threads safely
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_logging = {"listener": None}
+
+
+def setup_logging(level=None, sample=None, stream=None):
+    """Send the "ssc" loggers' records through the sampling queue handler.
+
+    Safe to call more than once; only the first call configures anything.
+    """
+    if logger.handlers:
+        return
+    level = level or os.environ.get("SSC_LOG_LEVEL", "INFO")
+    if sample is None:
+        sample = float(os.environ.get("SSC_LOG_SAMPLE", DEFAULT_LOG_SAMPLE))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, output)
+    try:
+        listener.start()
+    except RuntimeError:
+        # No threads (Pyodide): write directly
+        handler = output
+    else:
+        handler = _QueueHandler(records)
+        _logging["listener"] = listener
+        atexit.register(listener.stop)
+
+    handler.addFilter(SampleFilter(sample))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+
+def log_event(event, **fields):
+    """Sampled structured log line for a hot-path event."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(event, extra={"fields": fields, "sampled": True})
@@ -0,0 +1,473 @@
+# Durable local submissions
+#
+# Each client's submissions are kept in an append-only write-ahead log (JSON
+# lines) next to a compacted snapshot. Appends and deletes are buffered and
+# written with a single write + fsync per group commit, and the log is folded
+# into a fresh snapshot once it is mostly dead weight. On a server commits and
+# compactions run in a thread, one at a time and in order, so disk I/O never
+# stalls the event loop. Opening a log replays
+# snapshot + WAL into a SubmissionStore (and its SyncTracker), so reloads and
+# server restarts pick up where they left off.
+#
+# Under Pyodide the same files live in an IndexedDB-backed directory (IDBFS)
+# that is synced to the browser's IndexedDB after every commit.
+#
+# In multi-worker mode the journal goes to the shared backend instead
+# (SharedSubmissionLog), with the same group commit (also in a thread), so
+# whichever worker serves a client sees its submissions.
+#
+# On a server, every session of one client shares a single log, store and
+# tracker (ClientSubmissions).
+import asyncio
+import json
+import logging
+import os
+import re
+
+from store import SubmissionStore
+from sync import SyncTracker
+
+# Group commit: flush after this many buffered records or this many seconds
+COMMIT_RECORDS = 256
+COMMIT_INTERVAL = 0.2
+
+# Compact once the WAL has this many records and twice as many as live rows
+COMPACT_MIN_RECORDS = 1000
+
+BROWSER_DATA_DIR = "/ssc-data"
+# Under Pyodide the storage belongs to the one browser, so it needs no client id
+BROWSER_LOG_NAME = "default"
+
+_browser_storage_ready = None
+
+logger = logging.getLogger("ssc.persistence")
+
+
+def safe_client_id(client_id):
+    """The file-name safe form of a client id from the browser, or None if
+    nothing usable is left."""
+    client_id = re.sub(r"[^A-Za-z0-9_-]", "", str(client_id or ""))[:64]
+    return client_id or None
+
+
+async def _syncfs(populate):
+    import pyodide_js
+    from pyodide.ffi import create_once_callable
+
+    future = asyncio.get_running_loop().create_future()
+
+    def done(error=None):
+        if not future.done():
+            future.set_result(error)
+
+    pyodide_js.FS.syncfs(populate, create_once_callable(done))
+    return await future
+
+
+async def _mount_browser_storage():
+    global _browser_storage_ready
+    if _browser_storage_ready is None:
+        import pyodide_js
+
+        fs = pyodide_js.FS
+        os.makedirs(BROWSER_DATA_DIR, exist_ok=True)
+        fs.mount(fs.filesystems.IDBFS, {}, BROWSER_DATA_DIR)
+        _browser_storage_ready = asyncio.ensure_future(_syncfs(True))
+    await _browser_storage_ready
+
+
+class SubmissionLog:
+    def __init__(self, directory, name, browser=False):
+        os.makedirs(directory, exist_ok=True)
+        self.wal_path = os.path.join(directory, f"{name}.wal")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot")
+        self.browser = browser
+        self.store = None
+        self.tracker = None
+        self._buffer = []
+        self._flush_handle = None
+        self._writer = None
+        self._wal = None
+        self._wal_records = 0
+        # Bumped on every compaction; the WAL starts with the generation of the
+        # snapshot it applies to, so a WAL left over from a compaction that
+        # crashed halfway is ignored
+        self._generation = 0
+
+    # -- Replay ---------------------------------------------------------------
+
+    def replay(self, store, tracker):
+        """Load snapshot + WAL into `store`/`tracker`, then start logging to them."""
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                self._generation = header.get("generation", 0)
+                for line in f:
+                    seq, *row = json.loads(line)
+                    store.append(*row, seq=seq)
+                store.last_seq = max(store.last_seq, header.get("last_seq", 0))
+                tracker.restore(header.get("synced_seq", 0), header.get("tombstones", []))
+
+        current = False
+        good_bytes = 0
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete record")
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash mid-commit; nothing after it was committed
+                        break
+                    good_bytes += len(line)
+                    if record["op"] == "begin":
+                        current = record["generation"] == self._generation
+                        if not current:
+                            break
+                        continue
+                    self._apply(record, store, tracker)
+                    self._wal_records += 1
+
+        if current:
+            # Drop any torn tail so new records start on a clean line
+            with open(self.wal_path, "r+b") as f:
+                f.truncate(good_bytes)
+            self._wal = open(self.wal_path, "a", encoding="utf-8")
+        else:
+            self._start_wal()
+        self.store = store
+        self.tracker = tracker
+        store.journal = self
+        tracker.journal = self
+
+    def _apply(self, record, store, tracker):
+        op = record["op"]
+        if op == "append":
+            if record["row"][0] not in store:
+                store.append(*record["row"], seq=record["seq"])
+        elif op == "delete":
+            seq = store.seq_of(record["id"])
+            if seq is not None:
+                store.delete(record["id"])
+                tracker.record_delete(record["id"], seq)
+        elif op == "sync":
+            tracker.restore(record["synced_seq"], record["tombstones"])
+
+    # -- Logging --------------------------------------------------------------
+
+    def log_append(self, seq, row):
+        self._log({"op": "append", "seq": seq, "row": list(row)})
+
+    def log_delete(self, row_id):
+        self._log({"op": "delete", "id": row_id})
+
+    def log_sync(self, synced_seq, tombstones):
+        self._log({"op": "sync", "synced_seq": synced_seq, "tombstones": list(tombstones)})
+
+    def _log(self, record):
+        self._buffer.append(json.dumps(record))
+        if len(self._buffer) >= COMMIT_RECORDS:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(COMMIT_INTERVAL, self.flush)
+
+    def flush(self):
+        """Group commit: write every buffered record with one write + fsync.
+
+        On a server this runs in a thread, one commit at a time, so the disk
+        never holds up the event loop (see drain()); under Pyodide (no
+        threads) and outside an event loop it is done here and now.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer or self._wal is None:
+            return
+        loop = None
+        if not self.browser:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        if loop is None:
+            records, self._buffer = self._buffer, []
+            self._commit(records)
+            self._wal_records += len(records)
+            if self._compaction_due():
+                self.compact()
+            elif self.browser:
+                self._persist_browser()
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write())
+
+    async def _write(self):
+        # Records logged while a commit is in flight go in the next one
+        while self._buffer:
+            records, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(self._commit, records)
+                self._wal_records += len(records)
+                if self._compaction_due():
+                    # The snapshot is taken here, on the event loop; records
+                    # logged meanwhile go to the new WAL and replay as no-ops
+                    await asyncio.to_thread(self._write_snapshot, self._snapshot_lines())
+            except OSError:
+                logger.exception("journal_write_failed", extra={"fields": {"path": self.wal_path}})
+                # Keep them, in order, and try again
+                self._buffer[:0] = records
+                await asyncio.sleep(COMMIT_INTERVAL)
+
+    def _commit(self, records):
+        self._wal.write("\n".join(records) + "\n")
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+
+    def _compaction_due(self):
+        return self._wal_records >= COMPACT_MIN_RECORDS and self._wal_records >= 2 * len(self.store)
+
+    def compact(self):
+        """Write the live rows to a new snapshot and start an empty WAL."""
+        self._write_snapshot(self._snapshot_lines())
+        if self.browser:
+            self._persist_browser()
+
+    def _snapshot_lines(self):
+        lines = [json.dumps({
+            "generation": self._generation + 1,
+            "last_seq": self.store.last_seq,
+            "synced_seq": self.tracker.synced_seq,
+            "tombstones": self.tracker.tombstones
+        })]
+        lines.extend(json.dumps([seq, *row]) for seq, row in self.store.seq_rows())
+        return lines
+
+    def _write_snapshot(self, lines):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._generation += 1
+
+        self._wal.close()
+        self._start_wal()
+
+    def _start_wal(self):
+        self._wal = open(self.wal_path, "w", encoding="utf-8")
+        self._wal.write(json.dumps({"op": "begin", "generation": self._generation}) + "\n")
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+        self._wal_records = 0
+
+    def _persist_browser(self):
+        asyncio.ensure_future(_syncfs(False))
+
+    async def drain(self):
+        """Commit everything logged so far and wait until it is written."""
+        self.flush()
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    def close(self):
+        if self._writer is not None and not self._writer.done():
+            # The commit in flight also writes whatever is still buffered
+            self._writer.add_done_callback(lambda _: self.close())
+            return
+        if self._buffer and self._wal is not None:
+            self._commit(self._buffer)
+            self._buffer = []
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+        if self.store is not None:
+            self.store.journal = None
+            self.tracker.journal = None
+
+
+class SharedSubmissionLog:
+    """A client's journal kept in the shared backend (see backend.py)."""
+
+    def __init__(self, backend, client_id):
+        self.backend = backend
+        self.client_id = client_id
+        self.store = None
+        self.tracker = None
+        self._buffer = []
+        self._flush_handle = None
+        self._writer = None
+
+    def replay(self, store, tracker):
+        rows, deleted, last_seq, synced_seq, tombstones = self.backend.load_client(self.client_id)
+        for seq, row in rows:
+            store.append(*row, seq=seq)
+        store.last_seq = max(store.last_seq, last_seq)
+        tracker.restore(synced_seq, tombstones)
+        # Rows deleted since the last checkpoint; with their seq,
+        # record_delete() knows which ones still need a tombstone
+        for seq, row_id in deleted:
+            tracker.record_delete(row_id, seq)
+        self.store = store
+        self.tracker = tracker
+        store.journal = self
+        tracker.journal = self
+
+    def log_append(self, seq, row):
+        self._log({"op": "append", "seq": seq, "row": list(row)})
+
+    def log_delete(self, row_id):
+        self._log({"op": "delete", "id": row_id})
+
+    def log_sync(self, synced_seq, tombstones):
+        self._log({"op": "sync", "synced_seq": synced_seq, "tombstones": list(tombstones)})
+
+    def _log(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= COMMIT_RECORDS:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(COMMIT_INTERVAL, self.flush)
+
+    def flush(self):
+        """Group commit: one backend transaction for every buffered record,
+        written in the background (see drain())."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            records, self._buffer = self._buffer, []
+            self.backend.write_client(self.client_id, records)
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write())
+
+    async def _write(self):
+        # Records logged while a write is in flight go in the next one
+        while self._buffer:
+            records, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(self.backend.write_client, self.client_id, records)
+            except Exception:
+                logger.exception("journal_write_failed", extra={"fields": {"client": self.client_id}})
+                # Keep them, in order, and try again
+                self._buffer[:0] = records
+                await asyncio.sleep(COMMIT_INTERVAL)
+
+    async def drain(self):
+        """Commit everything logged so far and wait until it is written."""
+        self.flush()
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    def close(self):
+        self.flush()
+        if self.store is not None:
+            self.store.journal = None
+            self.tracker.journal = None
+
+
+def default_data_dir():
+    return os.environ.get(
+        "SSC_DATA_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    )
+
+
+async def open_browser_submission_log(store, tracker):
+    """Under Pyodide: open (and replay) this browser's log into `store` and
+    `tracker`."""
+    await _mount_browser_storage()
+    log = SubmissionLog(BROWSER_DATA_DIR, BROWSER_LOG_NAME, browser=True)
+    log.replay(store, tracker)
+    return log
+
+
+class ClientSubmissions:
+    """One client's store, tracker and log, shared by all of that client's
+    sessions in this process.
+
+    Two tabs with their own log on the same files (or the same backend
+    journal) would hand out the same sequence numbers, and one tab's
+    compaction would drop the rows the other had logged; so there is one log
+    per client, and every session reads and writes through it.
+    """
+
+    def __init__(self, key, store, tracker, log):
+        self.key = key
+        self.store = store
+        self.tracker = tracker
+        self.log = log
+        self._listeners = []
+
+    def attach(self, on_change):
+        """Add a session; `on_change()` is called whenever any of the
+        client's sessions changes the store."""
+        self._listeners.append(on_change)
+
+    async def detach(self, on_change):
+        """Remove a session; the last one out closes the log once its writes
+        are done. A session opened meanwhile attaches to this one, rather
+        than replaying a journal that is still being written."""
+        self._listeners.remove(on_change)
+        if self._listeners:
+            return
+        await self.log.drain()
+        if not self._listeners:
+            _open_clients.pop(self.key, None)
+            self.log.close()
+
+    def changed(self):
+        for on_change in list(self._listeners):
+            on_change()
+
+
+# (where the log lives, client id) -> ClientSubmissions
+_open_clients = {}
+
+
+def open_client_submissions(client_id, on_change, backend=None):
+    """The ClientSubmissions for `client_id`, opened and replayed by the first
+    of its sessions, with this session attached (detach it when the session
+    ends). Journals go to `backend` if there is one.
+
+    A session without a usable client id (no cookie yet, cookies blocked, a
+    non-browser client) isn't persisted at all and this returns None: falling
+    back to a shared name would hand one client's submissions to every other
+    client without an id.
+    """
+    client_id = safe_client_id(client_id)
+    if client_id is None:
+        return None
+
+    key = (id(backend) if backend is not None else default_data_dir(), client_id)
+    client = _open_clients.get(key)
+    if client is None:
+        store = SubmissionStore()
+        tracker = SyncTracker(store)
+        if backend is not None:
+            log = SharedSubmissionLog(backend, client_id)
+        else:
+            log = SubmissionLog(default_data_dir(), client_id)
+        log.replay(store, tracker)
+        client = _open_clients[key] = ClientSubmissions(key, store, tracker, log)
+    client.attach(on_change)
+    return client
@@ -0,0 +1,255 @@
+# Product lookup index
+#
+# A read-only, prefix-searchable index of beverage products (name, barcode and
+# nutrition facts) used to autocomplete the beverage name and prefill the
+# form. The index is one binary file built offline by
+# tools/build_product_index.py:
+#
+#   header | records | display names | search keys | name entries | barcode entries
+#
+# Records are fixed-size structs. Name entries are (key position, record)
+# pairs sorted by the normalized name from that position, with one entry per
+# word start, so "cola" finds "Diet Cola" as well as "Cola Zero". Barcode
+# entries are records sorted by barcode. Lookups are binary searches straight
+# over the file's bytes: the file is memory-mapped (or, where mmap isn't
+# available as under Pyodide, read into a single bytes object) and nothing is
+# unpacked into Python objects except the handful of results returned.
+import os
+import re
+import struct
+
+DEFAULT_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "products.idx")
+
+MAGIC = b"SSCPIDX1"
+# magic, records, name entries, then the offsets of the sections after the header
+HEADER = struct.Struct("<8sII6I")
+# display start/len, key start/len, type, flags, barcode len, barcode, serving, total, added
+RECORD = struct.Struct("<IHIHBBB14sfff")
+NAME_ENTRY = struct.Struct("<II")
+BARCODE_ENTRY = struct.Struct("<I")
+
+BEVERAGE_TYPES = ["Juice", "Milk", "Other"]
+# Yes/no facts, two bits each: 0 unknown, 1 no, 2 yes
+FLAGS = ["is_100_percent", "is_flavored", "is_sweetened", "artificial"]
+NUMBERS = ["juice_serving_size", "total_sugar", "added_sugar"]
+
+# Words of a name that get their own name entry
+MAX_INDEXED_WORDS = 6
+
+_NON_WORD = re.compile(r"[^\w%]+")
+
+
+class ProductIndexError(Exception):
+    pass
+
+
+def normalize(text):
+    """Search key form of a product name or query: casefolded words separated by single spaces."""
+    return " ".join(_NON_WORD.sub(" ", str(text).casefold()).split())
+
+
+def _flag_bits(value):
+    if value is None or value == "":
+        return 0
+    if isinstance(value, str):
+        return 2 if value.strip().lower() in ("true", "t", "yes", "y", "1") else 1
+    return 2 if value else 1
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def build_product_index(products, path):
+    """Write the index for `products`, an iterable of dicts with a
+    beverage_name, optional barcode and beverage_type, and the FLAGS/NUMBERS
+    inputs. Returns the number of products indexed."""
+    records = []
+    display = bytearray()
+    keys = bytearray()
+    name_entries = []
+    barcodes = []
+    for product in products:
+        name = str(product.get("beverage_name") or "").strip()
+        key = normalize(name).encode("utf-8")
+        if not key:
+            continue
+        barcode = re.sub(r"\D", "", str(product.get("barcode") or ""))[:14].encode("ascii")
+        beverage_type = product.get("beverage_type")
+        type_code = BEVERAGE_TYPES.index(beverage_type) + 1 if beverage_type in BEVERAGE_TYPES else 0
+        flags = 0
+        for i, flag in enumerate(FLAGS):
+            flags |= _flag_bits(product.get(flag)) << (2 * i)
+
+        number = len(records)
+        name_bytes = name.encode("utf-8")[:0xFFFF]
+        records.append((
+            len(display), len(name_bytes), len(keys), len(key), type_code, flags,
+            len(barcode), barcode, *[_number(product.get(field)) for field in NUMBERS]
+        ))
+        # One entry per word start
+        starts = [0] + [i + 1 for i, byte in enumerate(key) if byte == 0x20]
+        for start in starts[:MAX_INDEXED_WORDS]:
+            name_entries.append((key[start:], len(keys) + start, number))
+        if barcode:
+            barcodes.append((barcode, number))
+        display += name_bytes
+        # NUL ends each key, so a prefix never matches across two products
+        keys += key + b"\0"
+
+    name_entries.sort()
+    barcodes.sort()
+
+    records_offset = HEADER.size
+    display_offset = records_offset + RECORD.size * len(records)
+    keys_offset = display_offset + len(display)
+    names_offset = keys_offset + len(keys)
+    barcodes_offset = names_offset + NAME_ENTRY.size * len(name_entries)
+    end = barcodes_offset + BARCODE_ENTRY.size * len(barcodes)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, len(records), len(name_entries),
+            records_offset, display_offset, keys_offset, names_offset, barcodes_offset, end
+        ))
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(display)
+        f.write(keys)
+        for _, position, number in name_entries:
+            f.write(NAME_ENTRY.pack(position, number))
+        for _, number in barcodes:
+            f.write(BARCODE_ENTRY.pack(number))
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class ProductIndex:
+    def __init__(self, path=DEFAULT_INDEX):
+        with open(path, "rb") as f:
+            try:
+                import mmap
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ImportError, OSError, ValueError):
+                # No mmap (Pyodide) or an empty file: one bytes object instead
+                self._data = f.read()
+        data = self._data
+        if len(data) < HEADER.size:
+            raise ProductIndexError(f"{path} is not a product index")
+        (magic, self._count, self._name_count, self._records, self._display, self._keys,
+         self._names, self._barcodes, end) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or end != len(data):
+            raise ProductIndexError(f"{path} is not a product index (or is truncated)")
+        self._barcode_count = (end - self._barcodes) // BARCODE_ENTRY.size
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        if hasattr(self._data, "close"):
+            self._data.close()
+
+    def _record(self, number):
+        return RECORD.unpack_from(self._data, self._records + number * RECORD.size)
+
+    # Binary search for the first entry whose key starts at or after `prefix`;
+    # `key_at(i)` gives entry i's key cut to len(prefix)
+    @staticmethod
+    def _lower_bound(count, key_at, prefix):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key_at(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def search(self, query, limit=8):
+        """Products whose name has a word starting with `query` (or, for a
+        query of digits, whose barcode starts with it), best matches first."""
+        digits = str(query).strip()
+        if digits.isascii() and digits.isdigit():
+            return [self.get(number) for number in self._search_barcode(digits.encode("ascii"), limit)]
+        prefix = normalize(query).encode("utf-8")
+        if not prefix:
+            return []
+        return [self.get(number) for number in self._search_name(prefix, limit)]
+
+    def _search_name(self, prefix, limit):
+        data = self._data
+        names = self._names
+        size = len(prefix)
+        entry = NAME_ENTRY.unpack_from
+
+        def key_at(i):
+            position = entry(data, names + i * NAME_ENTRY.size)[0]
+            return data[self._keys + position:self._keys + position + size]
+
+        i = self._lower_bound(self._name_count, key_at, prefix)
+        # Names that start with the query rank ahead of ones that only have a
+        # later word starting with it; scan a few extra matches to find them
+        found = {}
+        while i < self._name_count and len(found) < limit * 4:
+            position, number = entry(data, names + i * NAME_ENTRY.size)
+            if data[self._keys + position:self._keys + position + size] != prefix:
+                break
+            if number not in found:
+                key_start, key_len = self._record(number)[2:4]
+                found[number] = (position != key_start, key_len)
+            i += 1
+        return sorted(found, key=found.get)[:limit]
+
+    def _search_barcode(self, prefix, limit):
+        data = self._data
+        size = len(prefix)
+        entry = BARCODE_ENTRY.unpack_from
+
+        def barcode_at(i):
+            record = self._record(entry(data, self._barcodes + i * BARCODE_ENTRY.size)[0])
+            return record[7][:min(record[6], size)]
+
+        i = self._lower_bound(self._barcode_count, barcode_at, prefix)
+        numbers = []
+        while i < self._barcode_count and len(numbers) < limit:
+            number = entry(data, self._barcodes + i * BARCODE_ENTRY.size)[0]
+            if barcode_at(i) != prefix:
+                break
+            numbers.append(number)
+            i += 1
+        return numbers
+
+    def get(self, number):
+        """One product as a dict, with only the facts the catalog knows."""
+        (display_start, display_len, _, _, type_code, flags, barcode_len, barcode,
+         *numbers) = self._record(number)
+        start = self._display + display_start
+        product = {
+            "id": number,
+            "beverage_name": bytes(self._data[start:start + display_len]).decode("utf-8"),
+        }
+        if barcode_len:
+            product["barcode"] = barcode[:barcode_len].decode("ascii")
+        if type_code:
+            product["beverage_type"] = BEVERAGE_TYPES[type_code - 1]
+        for i, flag in enumerate(FLAGS):
+            bits = (flags >> (2 * i)) & 3
+            if bits:
+                product[flag] = "True" if bits == 2 else "False"
+        for field, value in zip(NUMBERS, numbers):
+            if value == value:
+                product[field] = round(value, 2)
+        return product
+
+
+def open_product_index(path=None):
+    """The product index at `path` (default: SSC_PRODUCT_INDEX or the bundled
+    products.idx), or None if there isn't one."""
+    path = path or os.environ.get("SSC_PRODUCT_INDEX", DEFAULT_INDEX)
+    if not os.path.exists(path):
+        return None
+    return ProductIndex(path)
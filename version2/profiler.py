@@ -0,0 +1,300 @@
+# Reactive profiler
+#
+# SSC_PROFILE=<directory> turns on a profiling mode for server(). Every
+# effect and output timed with metrics.timed() is also traced, and so are the
+# named reactive values made with profiled_value(). For each run the profiler
+# records how long it took, which traced values had changed since that
+# observer's previous run (what invalidated it) and what it produced: the
+# rendered output, or the custom messages it sent. A run that produced exactly
+# what the previous run did is redundant; it cost CPU and changed nothing the
+# user can see.
+#
+# The reports are rewritten whenever a session ends, and at exit:
+#
+#   profile.txt         per observer: runs, time, redundant runs and what
+#                       invalidated it; per value: who set it, what it woke
+#   profile.folded      collapsed stacks ("cause;effect name;redundant usec")
+#                       for flamegraph.pl, inferno or speedscope
+#   profile.trace.json  Chrome trace events, one per run, for Perfetto or
+#                       chrome://tracing
+#
+# With SSC_PROFILE unset nothing is wrapped and profiled_value() returns a
+# plain reactive.Value, so production pays nothing for it.
+import atexit
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from collections import Counter
+
+from shiny import reactive
+from shiny.session import get_current_session
+
+import metrics
+
+FIRST_RUN = "(first run)"
+UNTRACKED = "(input or untracked)"
+OUTSIDE = "(outside observers)"
+
+# Trace events kept for profile.trace.json; the aggregates are unbounded
+MAX_TRACE_EVENTS = 200_000
+
+# The observer run in progress, so value reads and sent messages can be
+# attributed to it
+_current_run = contextvars.ContextVar("ssc_profile_run", default=None)
+
+
+class _Run:
+    __slots__ = ("name", "reads", "output")
+
+    def __init__(self, name):
+        self.name = name
+        # ProfiledValue -> its version when first read in this run
+        self.reads = {}
+        # Digest of what the run produced, None if nothing
+        self.output = None
+
+    def add_output(self, data):
+        digest = hashlib.sha1(data.encode("utf-8", "replace"))
+        if self.output is not None:
+            digest.update(self.output)
+        self.output = digest.digest()
+
+
+class ObserverStats:
+    def __init__(self):
+        self.runs = 0
+        self.seconds = 0.0
+        self.redundant = 0
+        self.redundant_seconds = 0.0
+        self.causes = Counter()
+
+
+class ValueStats:
+    def __init__(self):
+        self.sets = 0
+        self.setters = Counter()
+
+
+class ProfiledValue(reactive.Value):
+    """A reactive.Value whose reads and changes the profiler sees."""
+
+    def __init__(self, value, name, profiler):
+        super().__init__(value)
+        self.profile_name = name
+        self.profile_version = 0
+        self._profiler = profiler
+
+    def get(self):
+        run = _current_run.get()
+        if run is not None:
+            run.reads.setdefault(self, self.profile_version)
+        return super().get()
+
+    def set(self, value):
+        changed = super().set(value)
+        if changed:
+            self.profile_version += 1
+            self._profiler.value_set(self.profile_name)
+        return changed
+
+
+class ReactiveProfiler:
+    def __init__(self, directory):
+        self.directory = directory
+        self.started = time.perf_counter()
+        # (kind, name) -> ObserverStats
+        self.observers = {}
+        # value name -> ValueStats
+        self.values = {}
+        # (session id, kind, name) -> (reads, output) of the previous run
+        self._previous = {}
+        self._sessions = {}
+        self.folded = Counter()
+        self.trace = []
+
+    # -- Recording ---------------------------------------------------------
+
+    def trace_observer(self, kind, name, fn):
+        """Wrap an effect or render function so each run is recorded."""
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def traced_async(*args, **kwargs):
+                run, token, start = self._begin(name)
+                try:
+                    result = await fn(*args, **kwargs)
+                    self._result(run, kind, result)
+                    return result
+                finally:
+                    _current_run.reset(token)
+                    self._end(kind, name, run, start)
+            return traced_async
+
+        @functools.wraps(fn)
+        def traced_sync(*args, **kwargs):
+            run, token, start = self._begin(name)
+            try:
+                result = fn(*args, **kwargs)
+                self._result(run, kind, result)
+                return result
+            finally:
+                _current_run.reset(token)
+                self._end(kind, name, run, start)
+        return traced_sync
+
+    def _begin(self, name):
+        run = _Run(name)
+        return run, _current_run.set(run), time.perf_counter()
+
+    @staticmethod
+    def _result(run, kind, result):
+        if kind == "output" and result is not None:
+            run.add_output(str(result))
+
+    def _end(self, kind, name, run, start):
+        end = time.perf_counter()
+        elapsed = end - start
+        session = get_current_session()
+        session_id = session.id if session is not None else None
+        key = (session_id, kind, name)
+
+        previous = self._previous.get(key)
+        if previous is None:
+            causes = [FIRST_RUN]
+        else:
+            causes = sorted({
+                value.profile_name for value, version in previous[0].items()
+                if value.profile_version != version
+            }) or [UNTRACKED]
+        redundant = previous is not None and run.output is not None and run.output == previous[1]
+        self._previous[key] = (run.reads, run.output)
+
+        stats = self.observers.get((kind, name))
+        if stats is None:
+            stats = self.observers[(kind, name)] = ObserverStats()
+        stats.runs += 1
+        stats.seconds += elapsed
+        for cause in causes:
+            stats.causes[cause] += 1
+        if redundant:
+            stats.redundant += 1
+            stats.redundant_seconds += elapsed
+
+        cause = "+".join(causes)
+        stack = f"{cause};{kind} {name}" + (";redundant" if redundant else "")
+        self.folded[stack] += max(1, round(elapsed * 1e6))
+        if len(self.trace) < MAX_TRACE_EVENTS:
+            self.trace.append({
+                "name": name,
+                "cat": kind,
+                "ph": "X",
+                "ts": round((start - self.started) * 1e6, 1),
+                "dur": round(elapsed * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": self._session_number(session_id),
+                "args": {"causes": causes, "redundant": redundant},
+            })
+
+    def _session_number(self, session_id):
+        return self._sessions.setdefault(session_id, len(self._sessions))
+
+    def value_set(self, name):
+        stats = self.values.get(name)
+        if stats is None:
+            stats = self.values[name] = ValueStats()
+        stats.sets += 1
+        run = _current_run.get()
+        stats.setters[run.name if run is not None else OUTSIDE] += 1
+
+    def watch_session(self, session):
+        """Count the custom messages `session` sends as output of the observer
+        sending them, and write the reports when the session ends."""
+        send = session.send_custom_message
+
+        async def send_custom_message(type, message):
+            run = _current_run.get()
+            if run is not None:
+                run.add_output(type + json.dumps(message, sort_keys=True, default=str))
+            await send(type, message)
+
+        session.send_custom_message = send_custom_message
+        session.on_ended(self.write_reports)
+
+    # -- Reports -----------------------------------------------------------
+
+    def report(self):
+        lines = [
+            f"Reactive profile: {sum(s.runs for s in self.observers.values())} runs "
+            f"over {time.perf_counter() - self.started:.1f}s",
+            "",
+            f"{'observer':40}{'runs':>7}{'total ms':>11}{'mean ms':>10}{'redundant':>16}  invalidated by",
+        ]
+        ranked = sorted(self.observers.items(), key=lambda item: item[1].seconds, reverse=True)
+        for (kind, name), stats in ranked:
+            redundant = f"{stats.redundant} ({stats.redundant / stats.runs:.0%})" if stats.redundant else "-"
+            causes = ", ".join(f"{cause} x{count}" for cause, count in stats.causes.most_common())
+            lines.append(
+                f"{kind + ' ' + name:40}{stats.runs:>7}{stats.seconds * 1e3:>11.2f}"
+                f"{stats.seconds / stats.runs * 1e3:>10.3f}{redundant:>16}  {causes}"
+            )
+
+        wasted = [(key, stats) for key, stats in ranked if stats.redundant]
+        if wasted:
+            lines += ["", "Redundant re-executions (same output as the run before):"]
+            for (kind, name), stats in sorted(wasted, key=lambda item: item[1].redundant_seconds, reverse=True):
+                lines.append(
+                    f"  {kind} {name}: {stats.redundant} of {stats.runs} runs, "
+                    f"{stats.redundant_seconds * 1e3:.2f}ms"
+                )
+
+        if self.values:
+            lines += ["", f"{'value':24}{'sets':>7}  set by / invalidated"]
+            for name, stats in sorted(self.values.items()):
+                setters = ", ".join(f"{setter} x{count}" for setter, count in stats.setters.most_common())
+                woke = ", ".join(
+                    f"{kind} {observer} x{observer_stats.causes[name]}"
+                    for (kind, observer), observer_stats in ranked if observer_stats.causes[name]
+                )
+                lines.append(f"{name:24}{stats.sets:>7}  set by {setters}")
+                lines.append(f"{'':31}  invalidated {woke or 'nothing'}")
+        return "\n".join(lines) + "\n"
+
+    def folded_stacks(self):
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(self.folded.items()))
+
+    def chrome_trace(self):
+        return json.dumps({"traceEvents": self.trace, "displayTimeUnit": "ms"})
+
+    def write_reports(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for filename, content in (
+            ("profile.txt", self.report()),
+            ("profile.folded", self.folded_stacks()),
+            ("profile.trace.json", self.chrome_trace()),
+        ):
+            path = os.path.join(self.directory, filename)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+
+
+PROFILER = ReactiveProfiler(os.environ["SSC_PROFILE"]) if os.environ.get("SSC_PROFILE") else None
+
+if PROFILER is not None:
+    metrics.set_tracer(PROFILER.trace_observer)
+    atexit.register(PROFILER.write_reports)
+
+
+def profiled_value(name, value=None):
+    """reactive.Value(value), traced under `name` when profiling is on."""
+    if PROFILER is None:
+        return reactive.Value(value)
+    return ProfiledValue(value, name, PROFILER)
+
+
+def watch_session(session):
+    if PROFILER is not None:
+        PROFILER.watch_session(session)
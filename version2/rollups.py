@@ -0,0 +1,72 @@
+# Live submission rollups
+#
+# Process-wide green/yellow/red counts by beverage type, by hour and by site,
+# updated as submissions are added and deleted so the Summary tab never has
+# to scan or group the submissions themselves.
+RESULTS = ("green", "yellow", "red")
+DIMENSIONS = ("type", "hour", "site")
+
+UNSPECIFIED_SITE = "Unspecified"
+
+_RESULT_INDEX = {result: i for i, result in enumerate(RESULTS)}
+
+
+class SubmissionRollups:
+    def __init__(self):
+        # dimension -> group -> [green, yellow, red]
+        self._counts = {dimension: {} for dimension in DIMENSIONS}
+        self._totals = [0] * len(RESULTS)
+        # RowID -> (groups, result index), so deletes know what to take off
+        self._rows = {}
+        # Bumped on every change
+        self.version = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, row_id, beverage_type, timestamp, recommendation, site=None):
+        """Count a new submission; returns False if it was already counted."""
+        result = _RESULT_INDEX.get(recommendation)
+        if result is None or row_id in self._rows:
+            return False
+        # Timestamps are "YYYY-MM-DD HH:MM:SS"; group by the hour
+        groups = (beverage_type or "", timestamp[:13] + ":00", site or UNSPECIFIED_SITE)
+        self._rows[row_id] = (groups, result)
+        self._update(groups, result, 1)
+        return True
+
+    def remove(self, row_id):
+        entry = self._rows.pop(row_id, None)
+        if entry is None:
+            return False
+        self._update(*entry, -1)
+        return True
+
+    def _update(self, groups, result, delta):
+        for dimension, group in zip(DIMENSIONS, groups):
+            counts = self._counts[dimension]
+            row = counts.get(group)
+            if row is None:
+                row = counts[group] = [0] * len(RESULTS)
+            row[result] += delta
+            if not any(row):
+                del counts[group]
+        self._totals[result] += delta
+        self.version += 1
+
+    def totals(self):
+        return dict(zip(RESULTS, self._totals))
+
+    def table(self, dimension):
+        """(group, green, yellow, red, total) rows for `dimension`.
+
+        Hours are newest first, sites busiest first, types alphabetical.
+        """
+        rows = [(group, *counts, sum(counts)) for group, counts in self._counts[dimension].items()]
+        if dimension == "hour":
+            rows.sort(reverse=True)
+        elif dimension == "site":
+            rows.sort(key=lambda row: (-row[-1], row[0]))
+        else:
+            rows.sort()
+        return rows
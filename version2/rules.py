@@ -0,0 +1,267 @@
+# Guideline rule tables
+#
+# The beverage guidelines (thresholds, reasons and results) live in versioned
+# JSON rule tables under guidelines/, so regional variants are a data file
+# rather than a fork of the app. A table is compiled once into plain Python
+# checks plus lookup tables indexed by the bitmask of failed criteria:
+# evaluating a beverage is a few comparisons and two array lookups, with no
+# parsing per call, and the same compiled rules serve single and batch
+# classification.
+#
+# SSC_GUIDELINES points at the table to use. It is re-read (and recompiled)
+# when the file changes, checked at most every RELOAD_CHECK_SECONDS; a table
+# that fails to load leaves the previous one in place.
+import hashlib
+import json
+import logging
+import math
+import operator
+import os
+import time
+
+import numpy as np
+
+DEFAULT_GUIDELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "guidelines", "ssc.json")
+RELOAD_CHECK_SECONDS = 2
+
+logger = logging.getLogger("ssc.rules")
+
+# Outcome codes and their lookups
+GREEN, YELLOW, RED, INVALID = 0, 1, 2, 3
+RESULT_CODES = {"green": GREEN, "yellow": YELLOW, "red": RED}
+COLORS = np.array(["green", "yellow", "red", None], dtype=object)
+LABELS = np.array(["Go For It!", "OK Sometimes", "Maybe Not", None], dtype=object)
+IMAGES = np.array(["goforit.png", "oksometimes.png", "maybenot.png", None], dtype=object)
+
+INVALID_REASON = "Missing or invalid inputs"
+
+# Comparisons a rule can use; "is" compares a yes/no input
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "is": operator.eq,
+}
+
+# Criteria per beverage type (the lookup tables have 2**n entries)
+MAX_CRITERIA = 12
+
+# How rules read an input: yes/no flags or numbers
+FLAG = "flag"
+NUMBER = "number"
+
+TRUE_STRINGS = {"true", "t", "yes", "y", "1"}
+
+
+class GuidelineError(Exception):
+    pass
+
+
+# Helper function to convert first letter to uppercase
+def str_to_sentence(text):
+    if not text:
+        return ""
+    return text[0].upper() + text[1:].lower()
+
+
+class Check:
+    """One compiled comparison of an input against a value or another input."""
+
+    def __init__(self, spec, where):
+        self.input = spec.get("input")
+        if not isinstance(self.input, str):
+            raise GuidelineError(f"{where}: missing input")
+        self.op = spec.get("op")
+        if self.op not in OPERATORS:
+            raise GuidelineError(f"{where}: unknown op {self.op!r}")
+        self._compare = OPERATORS[self.op]
+
+        value = spec.get("value")
+        self.other_input = None
+        if isinstance(value, dict):
+            self.other_input = value.get("input")
+            if not isinstance(self.other_input, str):
+                raise GuidelineError(f"{where}: value must be a number, true/false or {{\"input\": name}}")
+            self.value = None
+        elif self.op == "is":
+            if not isinstance(value, bool):
+                raise GuidelineError(f"{where}: 'is' needs true or false")
+            self.value = value
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.value = float(value)
+        else:
+            raise GuidelineError(f"{where}: value must be a number")
+        self.kind = FLAG if self.op == "is" else NUMBER
+
+    def inputs(self):
+        return [self.input] + ([self.other_input] if self.other_input else [])
+
+    def evaluate(self, column):
+        """`column(name, kind)` returns an input as floats or bools (scalar or array)."""
+        value = column(self.other_input, self.kind) if self.other_input else self.value
+        return self._compare(column(self.input, self.kind), value)
+
+
+class CompiledType:
+    def __init__(self, beverage_type, spec):
+        where = f"types.{beverage_type}"
+        self.valid = []
+        self.messages = []
+        for i, check in enumerate(spec.get("valid", [])):
+            self.valid.append(Check(check, f"{where}.valid[{i}]"))
+            self.messages.append(check.get("message") or INVALID_REASON)
+
+        criteria = spec.get("criteria", [])
+        if len(criteria) > MAX_CRITERIA:
+            raise GuidelineError(f"{where}: at most {MAX_CRITERIA} criteria")
+        self.criteria = [Check(c, f"{where}.criteria[{i}]") for i, c in enumerate(criteria)]
+        bits = {c.get("id"): bit for bit, c in enumerate(criteria) if c.get("id")}
+
+        passed = spec.get("pass", {})
+        if passed.get("result") not in RESULT_CODES:
+            raise GuidelineError(f"{where}.pass: result must be one of {', '.join(RESULT_CODES)}")
+
+        # Failed criteria -> result: the first "fail" entry whose when_any
+        # names a failed criterion (or that has no when_any) wins
+        outcomes = []
+        for i, fail in enumerate(spec.get("fail", [])):
+            if fail.get("result") not in RESULT_CODES:
+                raise GuidelineError(f"{where}.fail[{i}]: result must be one of {', '.join(RESULT_CODES)}")
+            when = 0
+            for criterion in fail.get("when_any", []):
+                if criterion not in bits:
+                    raise GuidelineError(f"{where}.fail[{i}]: unknown criterion {criterion!r}")
+                when |= 1 << bits[criterion]
+            outcomes.append((when, RESULT_CODES[fail["result"]]))
+        if criteria and not any(when == 0 for when, _ in outcomes):
+            raise GuidelineError(f"{where}.fail: needs a last entry without when_any")
+
+        sentence_case = spec.get("reason_case") == "sentence"
+        reason_texts = [c.get("reason") or c.get("id") or c["input"] for c in criteria]
+        size = 2 ** len(criteria)
+        self.codes = np.empty(size, dtype=np.int64)
+        self.reasons = np.empty(size, dtype=object)
+        for mask in range(size):
+            if mask == 0:
+                self.codes[mask] = RESULT_CODES[passed["result"]]
+                self.reasons[mask] = passed.get("reason")
+                continue
+            self.codes[mask] = next(code for when, code in outcomes if when == 0 or when & mask)
+            reasons = ", ".join(text for bit, text in enumerate(reason_texts) if mask & (1 << bit))
+            self.reasons[mask] = str_to_sentence(reasons) if sentence_case else reasons
+
+        # Inputs this type looks at, with how each is read
+        self.inputs = {}
+        for check in self.valid + self.criteria:
+            for name in check.inputs():
+                self.inputs.setdefault(name, check.kind)
+
+    def failed_validation(self, inputs):
+        """The message of the first validity check a single beverage fails, or None."""
+        column = _scalar_reader(inputs)
+        for check, message in zip(self.valid, self.messages):
+            if not check.evaluate(column):
+                return message
+        return None
+
+
+class RuleSet:
+    def __init__(self, spec, source=""):
+        if not isinstance(spec, dict) or not isinstance(spec.get("types"), dict):
+            raise GuidelineError("Guidelines need a 'types' object")
+        self.name = spec.get("name", "")
+        self.version = str(spec.get("version", ""))
+        self.types = {
+            beverage_type: CompiledType(beverage_type, type_spec)
+            for beverage_type, type_spec in spec["types"].items()
+        }
+        # Identifies this exact table (e.g. in cache keys), even if someone
+        # edits it without bumping the version
+        self.key = (self.name, self.version, hashlib.sha1(source.encode("utf-8")).hexdigest()[:12])
+
+    def __repr__(self):
+        return f"<RuleSet {self.name} {self.version}>"
+
+
+def _scalar_reader(inputs):
+    def column(name, kind):
+        value = inputs.get(name)
+        if kind == FLAG:
+            return _as_flag(value)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return math.nan
+    return column
+
+
+def _as_flag(value):
+    if value is None:
+        return False
+    if isinstance(value, (bool, int, float)):
+        return bool(value) and value == value
+    return str(value).strip().lower() in TRUE_STRINGS
+
+
+def compile_rules(source):
+    """Compile the JSON text of a rule table."""
+    try:
+        spec = json.loads(source)
+    except ValueError as e:
+        raise GuidelineError(f"Guidelines are not valid JSON: {e}")
+    return RuleSet(spec, source)
+
+
+def load_rules(path):
+    with open(path, encoding="utf-8") as f:
+        return compile_rules(f.read())
+
+
+# The active rule table, reloaded when its file changes
+_active = {"rules": None, "path": None, "mtime": None, "checked": 0.0}
+
+
+def guidelines_path():
+    return os.environ.get("SSC_GUIDELINES", DEFAULT_GUIDELINES)
+
+
+def current_rules():
+    """The active rule table, recompiled if its file changed since the last check."""
+    now = time.monotonic()
+    if _active["rules"] is None or now - _active["checked"] >= RELOAD_CHECK_SECONDS:
+        _active["checked"] = now
+        reload_rules()
+    return _active["rules"]
+
+
+def reload_rules(path=None):
+    """Recompile the rule table at `path` (default: SSC_GUIDELINES) if it changed.
+
+    Returns True if a new table was loaded. A table that fails to load keeps
+    the previous one active; with no previous one the error is raised.
+    """
+    path = path or guidelines_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError as e:
+        return _reload_failed(path, None, e)
+    if path == _active["path"] and mtime == _active["mtime"]:
+        return False
+    try:
+        rules = load_rules(path)
+    except (OSError, GuidelineError) as e:
+        return _reload_failed(path, mtime, e)
+    _active.update(rules=rules, path=path, mtime=mtime)
+    logger.info("guidelines_loaded", extra={"fields": {"name": rules.name, "version": rules.version, "path": path}})
+    return True
+
+
+def _reload_failed(path, mtime, error):
+    if _active["rules"] is None:
+        raise error
+    logger.warning("guidelines_not_reloaded", extra={"fields": {"path": path, "error": str(error)}})
+    # Don't retry a broken file until it changes again
+    _active.update(path=path, mtime=mtime)
+    return False
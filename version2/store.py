@@ -0,0 +1,238 @@
+# Submissions store
+#
+# Plain Python column arrays (no pandas) with an index from RowID to position.
+# Appends are amortized O(1) (list/array appends), deletes are O(1) tombstones
+# that get compacted once they make up half of the store. BeverageType and
+# Recommendation are kept as small integer codes into a per-store category list.
+from array import array
+from bisect import bisect_right
+
+COLUMNS = ["RowID", "Timestamp", "BeverageType", "BeverageName", "Recommendation", "Reason"]
+
+BEVERAGE_TYPE_CATEGORIES = ["Juice", "Milk", "Other"]
+RECOMMENDATION_CATEGORIES = ["green", "yellow", "red"]
+
+# Compact when at least this many rows are deleted and they make up half the store
+MIN_COMPACT_ROWS = 64
+
+# Display columns select() can sort by
+SORTABLE_COLUMNS = ("Date", "Type", "Result")
+
+
+class _Categories:
+    def __init__(self, categories):
+        self.values = list(categories)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value):
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code] if code >= 0 else None
+
+
+class SubmissionStore:
+    def __init__(self):
+        self._types = _Categories(BEVERAGE_TYPE_CATEGORIES)
+        self._recommendations = _Categories(RECOMMENDATION_CATEGORIES)
+        self._clear()
+        # Bumped on every change; used as the reactive "something changed" signal
+        self.version = 0
+        # Bumped when positions change meaning (appends, compaction, clear), but
+        # not on deletes, so positions from select() stay valid across deletes
+        self.layout_version = 0
+        # Append sequence number of the newest row (never reused)
+        self.last_seq = 0
+        # Optional persistence log that is told about every append and delete
+        self.journal = None
+
+    def _clear(self):
+        self._seqs = array("q")
+        self._row_ids = []
+        self._timestamps = []
+        self._type_codes = array("h")
+        self._names = []
+        self._recommendation_codes = array("h")
+        self._reasons = []
+        self._alive = bytearray()
+        self._index = {}
+        self._deleted = 0
+
+    def __len__(self):
+        return len(self._row_ids) - self._deleted
+
+    def __contains__(self, row_id):
+        return row_id in self._index
+
+    def append(self, row_id, timestamp, beverage_type, beverage_name, recommendation, reason, seq=None):
+        if row_id in self._index:
+            raise KeyError(f"Duplicate RowID: {row_id}")
+        # An explicit seq is only used when replaying a persisted store
+        if seq is None:
+            seq = self.last_seq + 1
+        elif seq <= self.last_seq:
+            raise ValueError(f"Sequence number {seq} is not after {self.last_seq}")
+        self.last_seq = seq
+        self._index[row_id] = len(self._row_ids)
+        self._seqs.append(seq)
+        self._row_ids.append(row_id)
+        self._timestamps.append(timestamp)
+        self._type_codes.append(self._types.encode(beverage_type))
+        self._names.append(beverage_name)
+        self._recommendation_codes.append(self._recommendations.encode(recommendation))
+        self._reasons.append(reason)
+        self._alive.append(1)
+        self.version += 1
+        self.layout_version += 1
+        if self.journal is not None:
+            self.journal.log_append(seq, (row_id, timestamp, beverage_type, beverage_name, recommendation, reason))
+
+    def extend(self, row_ids, timestamps, beverage_types, beverage_names, recommendations, reasons):
+        for row in zip(row_ids, timestamps, beverage_types, beverage_names, recommendations, reasons):
+            self.append(*row)
+
+    def delete(self, row_id):
+        deleted = self._delete(row_id)
+        self._maybe_compact()
+        return deleted
+
+    def delete_many(self, row_ids):
+        """Delete several rows; returns the (row_id, seq) pairs that were deleted."""
+        deleted = []
+        for row_id in row_ids:
+            seq = self.seq_of(row_id)
+            if seq is not None and self._delete(row_id):
+                deleted.append((row_id, seq))
+        self._maybe_compact()
+        return deleted
+
+    def _delete(self, row_id):
+        position = self._index.pop(row_id, None)
+        if position is None:
+            return False
+        self._alive[position] = 0
+        self._deleted += 1
+        self.version += 1
+        if self.journal is not None:
+            self.journal.log_delete(row_id)
+        return True
+
+    def _maybe_compact(self):
+        if self._deleted >= MIN_COMPACT_ROWS and self._deleted * 2 >= len(self._row_ids):
+            self._compact()
+
+    def clear(self):
+        self._clear()
+        self.version += 1
+        self.layout_version += 1
+
+    # Drop tombstoned rows and rebuild the RowID index
+    def _compact(self):
+        keep = [i for i, alive in enumerate(self._alive) if alive]
+        self._seqs = array("q", (self._seqs[i] for i in keep))
+        self._row_ids = [self._row_ids[i] for i in keep]
+        self._timestamps = [self._timestamps[i] for i in keep]
+        self._type_codes = array("h", (self._type_codes[i] for i in keep))
+        self._names = [self._names[i] for i in keep]
+        self._recommendation_codes = array("h", (self._recommendation_codes[i] for i in keep))
+        self._reasons = [self._reasons[i] for i in keep]
+        self._alive = bytearray(b"\x01" * len(keep))
+        self._index = {row_id: i for i, row_id in enumerate(self._row_ids)}
+        self._deleted = 0
+        self.layout_version += 1
+
+    def _row(self, i):
+        return (
+            self._row_ids[i],
+            self._timestamps[i],
+            self._types.decode(self._type_codes[i]),
+            self._names[i],
+            self._recommendations.decode(self._recommendation_codes[i]),
+            self._reasons[i],
+        )
+
+    def seq_of(self, row_id):
+        position = self._index.get(row_id)
+        return None if position is None else self._seqs[position]
+
+    def get(self, row_id):
+        row = self.get_row(row_id)
+        return None if row is None else dict(zip(COLUMNS, row))
+
+    def get_row(self, row_id):
+        position = self._index.get(row_id)
+        return None if position is None else self._row(position)
+
+    def rows(self):
+        """Iterate over live rows as tuples in COLUMNS order."""
+        for i, alive in enumerate(self._alive):
+            if alive:
+                yield self._row(i)
+
+    def seq_rows(self):
+        """Iterate over live rows as (seq, row) pairs."""
+        for i, alive in enumerate(self._alive):
+            if alive:
+                yield self._seqs[i], self._row(i)
+
+    def rows_since(self, seq):
+        """Live rows appended after sequence number `seq`, oldest first."""
+        start = bisect_right(self._seqs, seq)
+        return [self._row(i) for i in range(start, len(self._seqs)) if self._alive[i]]
+
+    def select(self, beverage_type=None, recommendation=None, date_prefix=None,
+               sort_by=None, descending=False):
+        """Return the positions of live rows matching the filters, in display order.
+
+        Positions stay valid until `layout_version` changes; use
+        live_positions() to drop rows deleted in the meantime.
+        """
+        type_code = recommendation_code = None
+        if beverage_type:
+            type_code = self._types.codes.get(beverage_type)
+            if type_code is None:
+                return []
+        if recommendation:
+            recommendation_code = self._recommendations.codes.get(recommendation)
+            if recommendation_code is None:
+                return []
+
+        positions = [
+            i for i, alive in enumerate(self._alive)
+            if alive
+            and (type_code is None or self._type_codes[i] == type_code)
+            and (recommendation_code is None or self._recommendation_codes[i] == recommendation_code)
+            and (not date_prefix or self._timestamps[i].startswith(date_prefix))
+        ]
+
+        # Rows are appended in time order, so "Date" needs no sort
+        if sort_by == "Type":
+            values = self._types.values
+            positions.sort(key=lambda i: values[self._type_codes[i]] if self._type_codes[i] >= 0 else "")
+        elif sort_by == "Result":
+            positions.sort(key=self._recommendation_codes.__getitem__)
+        if descending:
+            positions.reverse()
+        return positions
+
+    def live_positions(self, positions):
+        """Drop the positions of rows deleted since `positions` was selected."""
+        alive = self._alive
+        return [i for i in positions if alive[i]]
+
+    def rows_at(self, positions):
+        return [self._row(i) for i in positions]
+
+    def row_ids_at(self, positions):
+        row_ids = self._row_ids
+        return [row_ids[i] for i in positions]
+
+    def to_records(self):
+        return [dict(zip(COLUMNS, row)) for row in self.rows()]
@@ -0,0 +1,301 @@
+# Google Sheets sync
+#
+# One background worker per process posts submission batches to the Apps
+# Script endpoint. Sessions hand rows to submit() and await the outcome; the
+# worker coalesces whatever is queued into one request, sends it from a
+# thread over a pooled requests.Session so the event loop never blocks, and
+# retries failures with exponential backoff. The queue is bounded, so when
+# the endpoint falls behind submit() waits instead of piling up memory.
+#
+# In multi-worker mode SharedSheetSync keeps the queue in the shared
+# backend's outbox instead (see backend.py): sessions enqueue their batches
+# there and wait for them to be marked done, and every worker's uploader
+# claims whatever is queued, coalesced the same way. Claims are leases long
+# enough for every retry, so a worker that dies mid-upload only delays its
+# batches; delivery is at least once, as it is for a retried request. A
+# session waiting on its batches restarts this worker's uploader if it has
+# died, and gives up (SyncError) after wait_timeout.
+#
+# SyncTracker keeps track, per client (shared by its sessions; see
+# persistence.ClientSubmissions), of which rows have reached the sheet so
+# only changes are uploaded: new rows, plus tombstones for uploaded rows that
+# were deleted since.
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+
+from lazy import import_package
+from store import COLUMNS
+
+
+class SyncError(Exception):
+    pass
+
+
+# Row sync states
+PENDING = "pending"
+SYNCED = "synced"
+DELETED = "deleted"
+
+# Only compress bodies bigger than this
+GZIP_MIN_BYTES = 1024
+
+logger = logging.getLogger("ssc.sync")
+
+
+class SyncTracker:
+    def __init__(self, store):
+        self.store = store
+        # Rows with a sequence number up to synced_seq are on the sheet
+        self.synced_seq = 0
+        # Deleted RowIDs that were uploaded and still need a tombstone sent
+        self._tombstones = {}
+        # What the upload in flight covers, if any
+        self._sending_seq = None
+        self._sending_tombstones = []
+        # Optional persistence log for sync checkpoints
+        self.journal = None
+
+    @property
+    def tombstones(self):
+        return list(self._tombstones)
+
+    @property
+    def in_flight(self):
+        """Whether an upload from begin() hasn't finished yet."""
+        return self._sending_seq is not None
+
+    def restore(self, synced_seq, tombstones):
+        """Reset to a persisted checkpoint."""
+        self.synced_seq = synced_seq
+        self._tombstones = dict.fromkeys(tombstones)
+
+    def state(self, row_id):
+        if row_id in self._tombstones:
+            return DELETED
+        seq = self.store.seq_of(row_id)
+        if seq is None:
+            return None
+        return SYNCED if seq <= self.synced_seq else PENDING
+
+    def record_delete(self, row_id, seq):
+        # Rows that never left the browser/server just disappear; rows that
+        # were (or are being) uploaded need a tombstone
+        if seq <= max(self.synced_seq, self._sending_seq or 0):
+            self._tombstones[row_id] = None
+
+    def has_changes(self):
+        return bool(self._tombstones) or bool(self.store.rows_since(self.synced_seq))
+
+    def begin(self):
+        """Collect the changes to upload as records and mark them in flight."""
+        records = [dict(zip(COLUMNS, row)) for row in self.store.rows_since(self.synced_seq)]
+        self._sending_tombstones = list(self._tombstones)
+        records.extend({"RowID": row_id, "Deleted": True} for row_id in self._sending_tombstones)
+        self._sending_seq = self.store.last_seq
+        return records
+
+    def commit(self):
+        """The upload from begin() succeeded."""
+        self.synced_seq = self._sending_seq
+        for row_id in self._sending_tombstones:
+            self._tombstones.pop(row_id, None)
+        self._sending_seq = None
+        self._sending_tombstones = []
+        if self.journal is not None:
+            self.journal.log_sync(self.synced_seq, self._tombstones)
+
+    def abort(self):
+        """The upload from begin() failed; everything stays pending."""
+        self._sending_seq = None
+        self._sending_tombstones = []
+
+
+class SheetSync:
+    def __init__(self, url, max_batch_rows=500, max_queue=100, max_retries=4,
+                 backoff_base=0.5, backoff_max=30.0, timeout=30.0, pool_size=10,
+                 compress=False):
+        self.url = url
+        # Only turn on for endpoints that accept Content-Encoding: gzip
+        # (Apps Script web apps don't)
+        self.compress = compress
+        self.max_batch_rows = max_batch_rows
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        # Persistent connections to the endpoint, shared by all sessions.
+        # requests is only needed here, outside Pyodide, so it stays out of
+        # the Shinylive startup bundle
+        self._requests = import_package("requests")
+        self._http = self._requests.Session()
+        adapter = import_package("requests.adapters").HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._http.mount("https://", adapter)
+        self._http.mount("http://", adapter)
+
+        self._max_queue = max_queue
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, rows):
+        """Queue `rows` (a list of JSON-able records) and wait until they are sent.
+
+        Raises SyncError if the endpoint still fails after all retries.
+        """
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for i in range(0, len(rows), self.max_batch_rows):
+            future = loop.create_future()
+            # Blocks here when the queue is full (backpressure)
+            await self._queue.put((rows[i:i + self.max_batch_rows], future))
+            futures.append(future)
+        await asyncio.gather(*futures)
+        return len(rows)
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            count = len(batch[0][0])
+            # Coalesce anything else that is already waiting
+            while count < self.max_batch_rows and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                count += len(batch[-1][0])
+
+            payload = [row for rows, _ in batch for row in rows]
+            try:
+                await self._post_with_retry(json.dumps(payload))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _post(self, body):
+        headers = {"Content-Type": "application/json"}
+        data = body.encode("utf-8")
+        if self.compress and len(data) >= GZIP_MIN_BYTES:
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        return self._http.post(
+            self.url,
+            headers=headers,
+            data=data,
+            timeout=self.timeout
+        )
+
+    async def _post_with_retry(self, body):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await asyncio.to_thread(self._post, body)
+            except self._requests.RequestException as e:
+                error = SyncError(str(e))
+            else:
+                if response.status_code == 200:
+                    return
+                error = SyncError(f"Server returned status {response.status_code}")
+                # Client errors other than rate limiting won't get better by retrying
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    raise error
+
+            if attempt == self.max_retries:
+                raise error
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+
+class SharedSheetSync(SheetSync):
+    def __init__(self, url, backend, worker, poll_interval=0.5, wait_timeout=None, **options):
+        super().__init__(url, **options)
+        self.backend = backend
+        self.worker = worker
+        self.poll_interval = poll_interval
+        # Outbox batch states; backend.py is server-only, so it's imported by name
+        outbox = import_package("backend")
+        self._finished = (outbox.DONE, outbox.FAILED)
+        self._failed = outbox.FAILED
+        # Long enough for one request and all its retries
+        self.lease = (self.timeout + self.backoff_max) * (self.max_retries + 1)
+        # Time for the batches ahead in the outbox, then our own
+        self.wait_timeout = 2 * self.lease if wait_timeout is None else wait_timeout
+        self._wake = None
+
+    async def submit(self, rows):
+        """Queue `rows` in the shared outbox and wait until some worker has sent them.
+
+        Raises SyncError if the endpoint still fails after all retries, or
+        if the batches aren't done within wait_timeout.
+        """
+        self._ensure_worker()
+        batch_ids = []
+        for i in range(0, len(rows), self.max_batch_rows):
+            # Backpressure, as with the local queue
+            while await asyncio.to_thread(self.backend.pending_sync) >= self._max_queue:
+                await asyncio.sleep(self.poll_interval)
+            batch_ids.append(await asyncio.to_thread(self.backend.enqueue_sync, rows[i:i + self.max_batch_rows]))
+        self._wake.set()
+
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            status = await asyncio.to_thread(self.backend.sync_status, batch_ids)
+            if all(state in self._finished for state, _ in status.values()):
+                break
+            if time.monotonic() >= deadline:
+                # Whatever is still queued is dropped; the rows stay pending
+                # in the tracker and go in the next save
+                await asyncio.to_thread(self.backend.forget_sync, batch_ids)
+                raise SyncError("Timed out waiting for the upload")
+            # Nobody may be left to send them if our uploader died
+            self._ensure_worker()
+            await asyncio.sleep(self.poll_interval)
+        await asyncio.to_thread(self.backend.forget_sync, batch_ids)
+        errors = [error for state, error in status.values() if state == self._failed]
+        if errors:
+            raise SyncError(errors[0])
+        return len(rows)
+
+    def _ensure_worker(self):
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._worker is not None and self._worker.done() and not self._worker.cancelled():
+            error = self._worker.exception()
+            if error is not None:
+                logger.error("sync_worker_died", exc_info=error, extra={"fields": {"worker": self.worker}})
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batches = await asyncio.to_thread(self.backend.claim_sync, self.worker, self.max_batch_rows, self.lease)
+            if not batches:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batch_ids = [batch_id for batch_id, _ in batches]
+            payload = [row for _, records in batches for row in records]
+            try:
+                await self._post_with_retry(json.dumps(payload))
+            except Exception as e:
+                await asyncio.to_thread(self.backend.finish_sync, batch_ids, error=str(e) or type(e).__name__)
+            else:
+                await asyncio.to_thread(self.backend.finish_sync, batch_ids)
@@ -0,0 +1,6 @@
+# The app's modules import each other by bare name (they run from version2/,
+# as Shinylive runs them), so put version2/ on the path for the tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,57 @@
+import re
+
+from app import beverage_inputs, delete_request, product_query_request, submission_row, window_int
+from classify import BEVERAGE_TYPES
+
+
+def test_submission_row_is_keyed_by_row_id():
+    html = str(submission_row(("row-1", "2026-01-01 10:00:00", "Milk", "Whole milk", "green", None)))
+    assert html.startswith('<tr data-row-id="row-1">')
+    assert html.count("<td>") == 6
+    assert "delete-row" in html
+
+
+def test_submission_row_escapes_values():
+    html = str(submission_row(('"><script>', "2026-01-01 10:00:00", "Milk", "<b>milk</b>", "green", None)))
+    assert "<script>" not in html
+    assert "<b>" not in html
+    assert "&lt;b&gt;milk&lt;/b&gt;" in html
+
+
+def test_window_int():
+    assert window_int(10, 50) == 10
+    assert window_int("25", 50) == 25
+    assert window_int(7.9, 50) == 7
+    for bad in (None, "", "ten", [1], {}, float("nan"), float("inf")):
+        assert window_int(bad, 50) == 50
+
+
+def test_delete_request():
+    assert delete_request({"id": 3, "row_ids": ("a", "b")}) == (3, ["a", "b"])
+    assert delete_request({"id": 4, "row_ids": ["a", 5, None, ["b"], "c"]}) == (4, ["a", "c"])
+    assert delete_request({"id": 5, "row_ids": "abc"}) == (5, [])
+    assert delete_request({"row_ids": {"a": 1}}) == (None, [])
+    assert delete_request(["a"]) == (None, [])
+    assert delete_request(None) == (None, [])
+
+
+def test_product_query_request():
+    assert product_query_request({"id": 1, "q": "cola"}) == (1, "cola")
+    assert product_query_request({"id": "7", "q": "x" * 500}) == ("7", "x" * 100)
+    assert product_query_request({"id": [1], "q": ["cola"]}) == (None, "")
+    assert product_query_request("cola") == (None, "")
+    assert product_query_request(None) == (None, "")
+
+
+def test_beverage_inputs_stay_in_the_browser():
+    html = str(beverage_inputs())
+    assert re.findall(r'data-beverage-type="(\w+)"', html) == BEVERAGE_TYPES
+    # Only the Juice group shows until another type is picked
+    assert html.count("display: none;") == len(BEVERAGE_TYPES) - 1
+    ids = re.findall(r'<(?:input|div)[^>]* id="(\w+)"', html)
+    for input_id in ("juice_serving_size", "is_100_percent", "is_flavored", "is_sweetened", "total_sugar", "added_sugar"):
+        assert input_id in ids
+    # Every field with an id is kept out of Shiny's input bindings
+    for tag in re.findall(r'<(?:input|div)[^>]* id="\w+"[^>]*>', html):
+        if 'id="beverage_inputs"' not in tag:
+            assert "data-shiny-no-bind-input" in tag, tag
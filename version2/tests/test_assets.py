@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+from assets import ASSETS_DIR, CACHE_CONTROL, MANIFEST, CacheHeadersMiddleware, image_url, picture, preload_links
+
+
+def test_manifest_files_exist():
+    assert MANIFEST
+    for entry in MANIFEST.values():
+        files = [entry["fallback"]] + [name for files in entry["sources"].values() for name, _ in files]
+        for filename in files:
+            assert os.path.exists(os.path.join(ASSETS_DIR, filename)), filename
+        assert entry["placeholder"].startswith("data:image/")
+
+
+def test_picture():
+    name = next(iter(MANIFEST))
+    html = str(picture(name, alt="Result", style="max-width: 100%;"))
+    assert html.startswith("<picture>")
+    assert 'type="image/avif"' in html
+    assert 'type="image/webp"' in html
+    assert f'src="{image_url(name)}"' in html
+    assert 'alt="Result"' in html
+    assert "max-width: 100%;" in html
+    assert image_url(name).startswith("assets/")
+
+
+def test_preload_links_skip_unknown_images():
+    name = next(iter(MANIFEST))
+    assert len(preload_links([name, "missing.png"])) == 1
+
+
+def request(path, status=200):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"cache-control", b"no-cache")]})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "path": path}
+    asyncio.run(CacheHeadersMiddleware(app)(scope, None, send))
+    return dict(messages[0]["headers"])[b"cache-control"]
+
+
+def test_hashed_assets_are_cached_for_good():
+    assert request("/assets/goforit.d077eca6a9.png") == CACHE_CONTROL
+    assert request("/assets/missing.png", status=404) == b"no-cache"
+    assert request("/") == b"no-cache"
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from backend import CLAIMED, DONE, FAILED, BackendError, MemoryBackend, SQLiteBackend, open_backend
+
+ROW = ("2026-01-01 10:00:00", "Milk", "Whole milk", "green", None, None)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    backend = MemoryBackend() if request.param == "memory" else SQLiteBackend(str(tmp_path / "shared.db"))
+    yield backend
+    backend.close()
+
+
+def test_events_are_read_in_order(backend):
+    backend.publish_many([("append", "a", ROW), ("append", "b", ROW), ("delete", "a", None)])
+    events = backend.events_since(0)
+    assert [(op, row_id) for _, op, row_id, _ in events] == [("append", "a"), ("append", "b"), ("delete", "a")]
+    assert tuple(events[0][3]) == ROW and events[2][3] is None
+    assert [event[2] for event in backend.events_since(events[0][0], limit=1)] == ["b"]
+    assert backend.events_since(events[-1][0]) == []
+
+
+def test_compaction_waits_for_every_live_replica(backend):
+    backend.publish_many([("append", "a", ROW), ("append", "b", ROW), ("delete", "a", None)])
+    last = backend.events_since(0)[-1][0]
+    assert backend.compact_events() == 0
+
+    backend.ack_events("one", last)
+    backend.ack_events("two", 1)
+    assert backend.compact_events() == 0
+    # A replica that went quiet stops holding the log back
+    assert backend.compact_events(replica_ttl=-1) == 0
+
+    backend.ack_events("one", last)
+    backend.ack_events("two", last)
+    assert backend.compact_events() == 2
+    assert [event[2] for event in backend.events_since(0)] == ["b"]
+    assert backend.ack_events("three", 0) == last
+
+
+def test_client_journal(backend):
+    assert backend.load_client("c") == ([], [], 0, 0, [])
+    backend.write_client("c", [
+        {"op": "append", "seq": 1, "row": ["a", *ROW[:5]]},
+        {"op": "append", "seq": 2, "row": ["b", *ROW[:5]]},
+        {"op": "append", "seq": 2, "row": ["b", *ROW[:5]]},
+    ])
+    backend.write_client("c", [{"op": "delete", "id": "a"}])
+    rows, deleted, last_seq, synced_seq, tombstones = backend.load_client("c")
+    assert [(seq, row[0]) for seq, row in rows] == [(2, "b")]
+    assert deleted == [(1, "a")] and last_seq == 2 and synced_seq == 0
+
+    backend.write_client("c", [{"op": "sync", "synced_seq": 2, "tombstones": ["a"]}])
+    assert backend.load_client("c")[1:] == ([], 2, 2, ["a"])
+    assert backend.load_client("other") == ([], [], 0, 0, [])
+
+
+def test_outbox_claims_and_leases(backend):
+    first = backend.enqueue_sync([{"RowID": "a"}, {"RowID": "b"}])
+    second = backend.enqueue_sync([{"RowID": "c"}])
+    third = backend.enqueue_sync([{"RowID": "d"}, {"RowID": "e"}])
+    assert backend.pending_sync() == 3
+
+    # Whole batches up to max_rows, but always at least one
+    claimed = backend.claim_sync("w1", 3, lease=60)
+    assert [batch_id for batch_id, _ in claimed] == [first, second]
+    assert claimed[0][1] == [{"RowID": "a"}, {"RowID": "b"}]
+    assert [batch_id for batch_id, _ in backend.claim_sync("w2", 1, lease=60)] == [third]
+    assert backend.claim_sync("w2", 10, lease=60) == []
+    assert backend.sync_status([first, third])[first] == (CLAIMED, None)
+
+    backend.finish_sync([first])
+    backend.finish_sync([second], error="HTTP 500")
+    assert backend.sync_status([first, second, third]) == {
+        first: (DONE, None), second: (FAILED, "HTTP 500"), third: (CLAIMED, None)
+    }
+    assert backend.pending_sync() == 1
+    backend.forget_sync([first, second])
+    assert backend.sync_status([first, second]) == {}
+
+
+def test_expired_leases_are_claimed_again(backend):
+    batch_id = backend.enqueue_sync([{"RowID": "a"}])
+    assert backend.claim_sync("dead", 10, lease=0.01)
+    assert backend.sync_status([batch_id]) == {batch_id: (CLAIMED, None)}
+    time.sleep(0.05)
+    assert [claimed for claimed, _ in backend.claim_sync("alive", 10, lease=60)] == [batch_id]
+
+
+def test_open_backend(tmp_path):
+    assert open_backend("") is None
+    assert open_backend("memory") is open_backend("memory")
+    assert isinstance(open_backend(f"sqlite://{tmp_path}/shared.db"), SQLiteBackend)
+    with pytest.raises(BackendError):
+        open_backend("redis://localhost")
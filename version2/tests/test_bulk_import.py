@@ -0,0 +1,42 @@
+import pytest
+
+from bulk_import import CatalogImportError, iter_catalog_chunks
+from classify import INPUT_COLUMNS
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / "catalog.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_csv_in_chunks(tmp_path):
+    rows = "".join(f"milk,Milk {i},no\n" for i in range(5))
+    path = write_csv(tmp_path, "Type,Name,Flavored\n" + rows)
+    chunks = list(iter_catalog_chunks(path, chunk_size=2))
+    assert [len(chunk["beverage_type"]) for chunk in chunks] == [2, 2, 1]
+    first = chunks[0]
+    assert set(first) == set(INPUT_COLUMNS)
+    # Aliased headers, normalized beverage types, absent columns filled in
+    assert first["beverage_type"] == ["Milk", "Milk"]
+    assert first["beverage_name"] == ["Milk 0", "Milk 1"]
+    assert first["is_flavored"] == ["no", "no"]
+    assert first["total_sugar"] == [None, None]
+
+
+def test_csv_short_rows_and_unknown_columns(tmp_path):
+    path = write_csv(tmp_path, "beverage_type,notes,total_sugar\nOther,x\n\nOther,y,4\n")
+    (chunk,) = iter_catalog_chunks(path)
+    assert "notes" not in chunk
+    assert chunk["total_sugar"] == [None, "4"]
+
+
+def test_csv_without_beverage_type(tmp_path):
+    path = write_csv(tmp_path, "name\nMilk\n")
+    with pytest.raises(CatalogImportError):
+        list(iter_catalog_chunks(path))
+
+
+def test_empty_csv(tmp_path):
+    assert list(iter_catalog_chunks(write_csv(tmp_path, ""))) == []
+
@@ -0,0 +1,63 @@
+from cache import LRUCache, normalize_inputs, recommendation_key
+from metrics import Counter, Registry
+from rules import current_rules
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_get_or_compute_and_stats():
+    cache = LRUCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_compute("key", compute) == "value"
+    assert cache.get_or_compute("key", compute) == "value"
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    cache.clear()
+    assert cache.stats()["hits"] == 0
+    assert len(cache) == 0
+
+
+def test_normalize_keeps_only_inputs_the_rules_read():
+    rules = current_rules()
+    normalized = normalize_inputs(rules, "Milk", {
+        "is_flavored": "Yes", "is_sweetened": None, "artificial": "false",
+        "beverage_name": "ignored", "total_sugar": "4",
+    })
+    assert normalized == {"is_sweetened": False, "is_flavored": True, "artificial": False}
+
+
+def test_equivalent_inputs_share_a_key():
+    rules = current_rules()
+    first = normalize_inputs(rules, "Other", {"total_sugar": "10.001", "added_sugar": "0", "artificial": "no"})
+    second = normalize_inputs(rules, "Other", {"total_sugar": 10, "added_sugar": 0.0, "artificial": None})
+    assert recommendation_key(rules, "Other", first) == recommendation_key(rules, "Other", second)
+    other = normalize_inputs(rules, "Other", {"total_sugar": "11", "added_sugar": "0"})
+    assert recommendation_key(rules, "Other", first) != recommendation_key(rules, "Other", other)
+
+
+def test_metrics_read_from_the_cache():
+    cache = LRUCache()
+    hits = Counter("test_cache_hits_total", "Test cache hits", registry=Registry())
+    hits.set_function(lambda: cache.hits)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    assert hits.value() == 2
+    assert "test_cache_hits_total 2" in list(hits.lines())
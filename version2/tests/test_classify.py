@@ -0,0 +1,66 @@
+import numpy as np
+
+from classify import classify_beverage, classify_beverages
+from rules import GREEN, INVALID, INVALID_REASON, RED, YELLOW
+
+
+def test_plain_milk_is_green():
+    result = classify_beverage("Milk", is_flavored="False", is_sweetened="False", artificial="False")
+    assert result["code"] == GREEN
+    assert result["color"] == "green"
+    assert result["image"] == "goforit.png"
+
+
+def test_failed_criteria_are_listed_in_the_reason():
+    result = classify_beverage("Milk", is_flavored="True", is_sweetened="yes", artificial="False")
+    assert result["color"] == "red"
+    assert result["reason"] == "Milk sweetened, milk flavored"
+
+
+def test_juice_serving_size():
+    assert classify_beverage("Juice", juice_serving_size="8", is_100_percent="True")["color"] == "yellow"
+    oversized = classify_beverage("Juice", juice_serving_size="16", is_100_percent="True")
+    assert oversized["color"] == "red"
+    assert oversized["reason"] == "Serving size > 12oz"
+
+
+def test_other_thresholds():
+    assert classify_beverage("Other", total_sugar="5", added_sugar="0")["color"] == "green"
+    assert classify_beverage("Other", total_sugar="10", added_sugar="2")["color"] == "yellow"
+    assert classify_beverage("Other", total_sugar="30", added_sugar="2")["color"] == "red"
+
+
+def test_invalid_inputs():
+    for result in (
+        classify_beverage("Juice", juice_serving_size="0", is_100_percent="True"),
+        classify_beverage("Juice", juice_serving_size="lots"),
+        classify_beverage("Other", total_sugar="5", added_sugar="9"),
+        classify_beverage("Soda"),
+    ):
+        assert result["code"] == INVALID
+        assert result["color"] is None
+        assert result["reason"] == INVALID_REASON
+
+
+def test_batch_matches_single():
+    beverages = {
+        "beverage_type": ["Milk", "Juice", "Other", "Other", "Juice"],
+        "is_flavored": ["True", None, None, None, None],
+        "juice_serving_size": [None, 6, None, None, "20"],
+        "is_100_percent": [None, True, None, None, "no"],
+        "total_sugar": [None, None, 3.0, 40, None],
+        "added_sugar": [None, None, 0, 20, None],
+    }
+    batch = classify_beverages(beverages)
+    assert batch["code"].tolist() == [RED, YELLOW, GREEN, RED, RED]
+    for i in range(len(beverages["beverage_type"])):
+        inputs = {name: values[i] for name, values in beverages.items() if name != "beverage_type"}
+        single = classify_beverage(beverages["beverage_type"][i], **inputs)
+        assert single["code"] == batch["code"][i]
+        assert single["reason"] == batch["reason"][i]
+
+
+def test_empty_batch():
+    result = classify_beverages({"beverage_type": []})
+    assert len(result["code"]) == 0
+    assert isinstance(result["code"], np.ndarray)
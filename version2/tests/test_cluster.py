@@ -0,0 +1,28 @@
+from cluster import StickyRouter, Worker, client_key
+
+
+def scope(cookie=None, client=("10.0.0.5", 5123)):
+    headers = [(b"host", b"kiosk")]
+    if cookie is not None:
+        headers.append((b"cookie", cookie.encode("latin-1")))
+    return {"type": "http", "headers": headers, "client": client}
+
+
+def test_client_key_prefers_the_client_cookie():
+    assert client_key(scope("theme=dark; ssc_client_id=abc123; other=1")) == "abc123"
+    assert client_key(scope("ssc_client_id=xyz")) == "xyz"
+    assert client_key(scope("not_ssc_client_id=abc")) == "10.0.0.5"
+    assert client_key(scope("ssc_client_id=")) == "10.0.0.5"
+    assert client_key(scope()) == "10.0.0.5"
+    assert client_key(scope(client=None)) == ""
+
+
+def test_router_is_sticky_per_client():
+    workers = [Worker(i, 8001 + i, {}) for i in range(4)]
+    router = StickyRouter(workers)
+    picked = {router.pick(scope(f"ssc_client_id=client-{i}")) for i in range(100)}
+    assert picked == set(workers)
+    # Same cookie, any address: same worker
+    assert router.pick(scope("ssc_client_id=abc", ("10.0.0.1", 1))) is \
+        router.pick(scope("ssc_client_id=abc", ("10.0.0.2", 2)))
+    assert workers[0].env["SSC_WORKER"] == "worker-0"
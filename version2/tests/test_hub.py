@@ -0,0 +1,101 @@
+import asyncio
+
+from hub import SubmissionsHub
+
+
+def publish(hub, row_id, recommendation="green"):
+    hub.publish_append(row_id, "2026-01-01 10:00:00", "Milk", row_id, recommendation, None)
+
+
+def subscribe(hub, max_rows=50):
+    batches = []
+    subscription = hub.subscribe(lambda rows, deleted: batches.append(([row[0] for row in rows], list(deleted))),
+                                 max_rows=max_rows)
+    return subscription, batches
+
+
+async def settle(hub):
+    # A couple of fan-out rounds
+    await asyncio.sleep(hub.fanout_interval * 4)
+
+
+def test_subscribers_get_the_newest_rows_then_changes():
+    async def run():
+        hub = SubmissionsHub(fanout_interval=0.01)
+        for i in range(5):
+            publish(hub, f"r{i}")
+        _, batches = subscribe(hub, max_rows=3)
+        await settle(hub)
+        assert batches == [(["r2", "r3", "r4"], [])]
+
+        publish(hub, "r5")
+        hub.publish_delete("r0")
+        await settle(hub)
+        assert batches[1:] == [(["r5"], ["r0"])]
+
+        # Nothing new, nothing sent
+        await settle(hub)
+        assert len(batches) == 2
+
+    asyncio.run(run())
+
+
+def test_publishing_is_batched_per_fan_out():
+    async def run():
+        hub = SubmissionsHub(fanout_interval=0.05)
+        _, batches = subscribe(hub)
+        await asyncio.sleep(0)
+        for i in range(10):
+            publish(hub, f"r{i}")
+        await settle(hub)
+        assert [row_id for rows, _ in batches for row_id in rows] == [f"r{i}" for i in range(10)]
+        assert len(batches) <= 2
+
+    asyncio.run(run())
+
+
+def test_rollups_follow_appends_and_deletes():
+    async def run():
+        hub = SubmissionsHub(fanout_interval=0.01)
+        publish(hub, "a", "green")
+        publish(hub, "b", "red")
+        publish(hub, "a", "green")
+        hub.publish_delete("b")
+        hub.publish_delete("missing")
+        assert hub.rollups.totals() == {"green": 1, "yellow": 0, "red": 0}
+
+    asyncio.run(run())
+
+
+def test_closed_subscriptions_get_nothing():
+    async def run():
+        hub = SubmissionsHub(fanout_interval=0.01)
+        subscription, batches = subscribe(hub)
+        other, other_batches = subscribe(hub)
+        subscription.close()
+        publish(hub, "a")
+        await settle(hub)
+        assert batches == []
+        assert other_batches == [(["a"], [])]
+
+    asyncio.run(run())
+
+
+def test_the_store_keeps_only_the_newest_rows():
+    async def run():
+        hub = SubmissionsHub(fanout_interval=0.01, keep_rows=3)
+        for i in range(10):
+            publish(hub, f"r{i}")
+        assert 3 <= len(hub.store) < 6
+        assert [row[0] for row in hub.store.rows()][-3:] == ["r7", "r8", "r9"]
+        assert hub.rollups.totals()["green"] == 10
+
+        # Rows trimmed from the store still count as live
+        publish(hub, "r0")
+        hub.publish_delete("r0")
+        assert hub.rollups.totals()["green"] == 9
+
+        subscribe(hub, max_rows=5)
+        assert hub.keep_rows == 5
+
+    asyncio.run(run())
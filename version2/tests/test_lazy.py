@@ -0,0 +1,35 @@
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bulk_import import CatalogImportError, load_catalog_reader
+from lazy import import_package, is_pyodide, load_package
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_outside_pyodide_packages_are_plain_imports():
+    assert not is_pyodide()
+    assert asyncio.run(load_package("json.decoder", "json")) is import_package("json.decoder")
+
+
+def test_csv_needs_no_extra_package():
+    asyncio.run(load_catalog_reader("catalog.csv"))
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed")
+def test_parquet_without_pyarrow():
+    with pytest.raises(CatalogImportError, match="pyarrow"):
+        asyncio.run(load_catalog_reader("catalog.parquet"))
+
+
+def test_app_starts_without_pandas():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app; print('pandas' in sys.modules)"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == "False"
@@ -0,0 +1,153 @@
+import asyncio
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram, JsonFormatter, MetricsEndpoint, Registry, SampleFilter, timed
+
+
+def test_metrics_can_be_recorded_from_threads():
+    registry = Registry()
+    counter = Counter("test_total", "Test counter", ("kind",), registry=registry)
+    histogram = Histogram("test_seconds", "Test histogram", registry=registry)
+
+    def record():
+        for _ in range(5000):
+            counter.inc(kind="a")
+            histogram.observe(0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value(kind="a") == 20000
+    assert histogram.count() == 20000
+    assert 'test_seconds_count 20000' in registry.render()
+
+
+def test_prometheus_text_format():
+    registry = Registry()
+    counter = Counter("test_total", "Test counter", ("kind",), registry=registry)
+    gauge = Gauge("test_open", "Test gauge", registry=registry)
+    histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1), registry=registry)
+    counter.inc(kind='say "hi"\n')
+    counter.inc(2, kind="b")
+    gauge.set(3)
+    gauge.dec()
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert registry.render().splitlines() == [
+        "# HELP test_open Test gauge",
+        "# TYPE test_open gauge",
+        "test_open 2",
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        "test_seconds_sum 5.55",
+        "test_seconds_count 3",
+        "# HELP test_total Test counter",
+        "# TYPE test_total counter",
+        'test_total{kind="b"} 2',
+        'test_total{kind="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_labels_and_registration_are_checked():
+    registry = Registry()
+    counter = Counter("test_total", "Test counter", ("kind",), registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.set_function(lambda: 1)
+    with pytest.raises(ValueError):
+        Counter("test_total", "Again", registry=registry)
+
+
+def test_function_metrics_are_read_when_rendered():
+    registry = Registry()
+    gauge = Gauge("test_entries", "Test gauge", registry=registry)
+    entries = []
+    gauge.set_function(lambda: len(entries))
+    entries.extend([1, 2])
+    assert gauge.value() == 2
+    assert "test_entries 2" in registry.render()
+
+
+def test_timed_records_sync_and_async_calls(monkeypatch):
+    monkeypatch.setattr(metrics, "_tracer", None)
+    histogram = Histogram("test_seconds", "Test histogram", ("effect",), registry=Registry())
+
+    @timed(histogram)
+    def work():
+        raise RuntimeError("boom")
+
+    @timed(histogram, name="renamed")
+    async def async_work():
+        return 42
+
+    with pytest.raises(RuntimeError):
+        work()
+    assert asyncio.run(async_work()) == 42
+    assert work.__name__ == "work"
+    assert histogram.count(effect="work") == 1
+    assert histogram.count(effect="renamed") == 1
+
+
+def call_endpoint(endpoint, method="GET", path="/metrics"):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(endpoint({"type": "http", "method": method, "path": path}, None, send))
+    return sent
+
+
+def test_metrics_endpoint():
+    registry = Registry()
+    Counter("test_total", "Test counter", registry=registry).inc()
+    passed = []
+
+    async def app(scope, receive, send):
+        passed.append(scope["path"])
+
+    endpoint = MetricsEndpoint(app, registry)
+    start, body = call_endpoint(endpoint)
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-type"] == metrics.CONTENT_TYPE
+    assert b"test_total 1" in body["body"]
+    assert call_endpoint(endpoint, "HEAD")[1]["body"] == b""
+    assert call_endpoint(endpoint, "POST")[0]["status"] == 405
+    assert call_endpoint(endpoint, path="/") == [] and passed == ["/"]
+
+
+def test_json_formatter_adds_fields():
+    record = logging.LogRecord("ssc.test", logging.INFO, __file__, 1, "saved %s", ("rows",), None)
+    record.fields = {"count": 3}
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["event"] == "saved rows"
+    assert entry["level"] == "info" and entry["logger"] == "ssc.test"
+    assert entry["count"] == 3
+
+
+def test_sample_filter_only_drops_sampled_records():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(SampleFilter(0))
+    log = logging.getLogger("ssc.test_sampling")
+    log.addHandler(handler)
+    log.propagate = False
+    try:
+        log.warning("hot", extra={"sampled": True})
+        log.warning("kept")
+    finally:
+        log.removeHandler(handler)
+    assert stream.getvalue() == "kept\n"
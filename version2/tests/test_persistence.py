@@ -0,0 +1,168 @@
+import asyncio
+import json
+
+import persistence
+from backend import MemoryBackend
+from persistence import SharedSubmissionLog, SubmissionLog, open_client_submissions, safe_client_id
+from store import SubmissionStore
+from sync import SyncTracker
+
+
+def add(store, row_id):
+    store.append(row_id, "2026-01-01 10:00:00", "Milk", row_id, "green", None)
+
+
+def open_log(directory, name="client"):
+    store = SubmissionStore()
+    tracker = SyncTracker(store)
+    log = SubmissionLog(str(directory), name)
+    log.replay(store, tracker)
+    return log, store, tracker
+
+
+def test_replay_restores_rows_deletes_and_checkpoints(tmp_path):
+    log, store, tracker = open_log(tmp_path)
+    for row_id in "abc":
+        add(store, row_id)
+    tracker.begin()
+    tracker.commit()
+    for row_id, seq in store.delete_many(["b"]):
+        tracker.record_delete(row_id, seq)
+    log.close()
+
+    _, store, tracker = open_log(tmp_path)
+    assert [row[0] for row in store.rows()] == ["a", "c"]
+    assert store.last_seq == 3
+    assert tracker.synced_seq == 3
+    assert tracker.tombstones == ["b"]
+    # New rows carry on from the old sequence numbers
+    add(store, "d")
+    assert store.seq_of("d") == 4
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    log, store, _ = open_log(tmp_path)
+    add(store, "a")
+    add(store, "b")
+    log.close()
+    with open(log.wal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "append", "seq": 3, "row": ["c", "2026')
+
+    log, store, _ = open_log(tmp_path)
+    assert [row[0] for row in store.rows()] == ["a", "b"]
+    # Appends after the torn record start on a clean line
+    add(store, "d")
+    log.close()
+    _, store, _ = open_log(tmp_path)
+    assert [row[0] for row in store.rows()] == ["a", "b", "d"]
+
+
+def test_compaction_writes_a_snapshot_and_an_empty_wal(tmp_path):
+    log, store, tracker = open_log(tmp_path)
+    for i in range(10):
+        add(store, f"r{i}")
+    store.delete_many([f"r{i}" for i in range(5)])
+    tracker.begin()
+    tracker.commit()
+    log.compact()
+    with open(log.wal_path, encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["begin"]
+    add(store, "new")
+    log.close()
+
+    _, store, tracker = open_log(tmp_path)
+    assert [row[0] for row in store.rows()] == [f"r{i}" for i in range(5, 10)] + ["new"]
+    assert store.seq_of("r9") == 10
+    assert tracker.synced_seq == 10
+
+
+def test_wal_from_an_unfinished_compaction_is_ignored(tmp_path):
+    log, store, _ = open_log(tmp_path)
+    add(store, "a")
+    log.close()
+    with open(log.wal_path, encoding="utf-8") as f:
+        old_wal = f.read()
+    log, store, _ = open_log(tmp_path)
+    log.compact()
+    log.close()
+    # As if the crash came after the snapshot but before the new WAL
+    with open(log.wal_path, "w", encoding="utf-8") as f:
+        f.write(old_wal + json.dumps({"op": "append", "seq": 2, "row": ["b", "", "Milk", "b", "green", None]}) + "\n")
+
+    _, store, _ = open_log(tmp_path)
+    assert [row[0] for row in store.rows()] == ["a"]
+
+
+def test_commits_off_the_event_loop(tmp_path):
+    async def write():
+        log, store, _ = open_log(tmp_path)
+        for i in range(persistence.COMMIT_RECORDS + 10):
+            add(store, f"r{i}")
+        await log.drain()
+        with open(log.wal_path, encoding="utf-8") as f:
+            committed = sum(1 for _ in f) - 1
+        log.close()
+        return committed
+
+    assert asyncio.run(write()) == persistence.COMMIT_RECORDS + 10
+    _, store, _ = open_log(tmp_path)
+    assert len(store) == persistence.COMMIT_RECORDS + 10
+
+
+def test_safe_client_id():
+    assert safe_client_id("abc-123_x") == "abc-123_x"
+    assert safe_client_id("../../etc/passwd") == "etcpasswd"
+    assert safe_client_id("x" * 100) == "x" * 64
+    assert safe_client_id(None) is None
+    assert safe_client_id("/..") is None
+
+
+def test_sessions_of_one_client_share_its_submissions(tmp_path, monkeypatch):
+    monkeypatch.setenv("SSC_DATA_DIR", str(tmp_path))
+    calls = []
+
+    def first_tab():
+        calls.append("first")
+
+    def second_tab():
+        calls.append("second")
+
+    async def run():
+        first = open_client_submissions("client-1", first_tab)
+        second = open_client_submissions("client-1", second_tab)
+        assert first is second
+        assert open_client_submissions(None, first_tab) is None
+        add(first.store, "a")
+        first.changed()
+        await first.detach(first_tab)
+        await second.detach(second_tab)
+
+    asyncio.run(run())
+    assert calls == ["first", "second"]
+    _, store, _ = open_log(tmp_path, "client-1")
+    assert [row[0] for row in store.rows()] == ["a"]
+
+
+def test_shared_log_replays_from_the_backend():
+    backend = MemoryBackend()
+
+    def on_change():
+        pass
+
+    async def write():
+        client = open_client_submissions("client-2", on_change, backend=backend)
+        for row_id in "abc":
+            add(client.store, row_id)
+        client.tracker.begin()
+        client.tracker.commit()
+        for row_id, seq in client.store.delete_many(["a"]):
+            client.tracker.record_delete(row_id, seq)
+        await client.detach(on_change)
+
+    asyncio.run(write())
+    store = SubmissionStore()
+    tracker = SyncTracker(store)
+    SharedSubmissionLog(backend, "client-2").replay(store, tracker)
+    assert [row[0] for row in store.rows()] == ["b", "c"]
+    assert tracker.synced_seq == 3
+    assert tracker.tombstones == ["a"]
@@ -0,0 +1,62 @@
+import pytest
+
+from products import ProductIndex, ProductIndexError, build_product_index, normalize, open_product_index
+
+PRODUCTS = [
+    {"beverage_name": "Cola Zero", "barcode": "5000112", "beverage_type": "Other",
+     "artificial": "yes", "total_sugar": 0, "added_sugar": 0},
+    {"beverage_name": "Diet Cola", "barcode": "5000113", "beverage_type": "Other", "artificial": True},
+    {"beverage_name": "Orange Juice", "barcode": "0712-345", "beverage_type": "Juice",
+     "is_100_percent": "True", "juice_serving_size": "8"},
+    {"beverage_name": "Chocolate Milk", "beverage_type": "Milk", "is_flavored": "yes", "is_sweetened": "no"},
+    {"beverage_name": "  ", "barcode": "999"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "products.idx")
+    assert build_product_index(PRODUCTS, path) == 4
+    index = ProductIndex(path)
+    yield index
+    index.close()
+
+
+def test_normalize():
+    assert normalize("  Coca-Cola   ZERO!! ") == "coca cola zero"
+    assert normalize("100% Juice") == "100% juice"
+
+
+def test_search_matches_word_starts_and_ranks_name_starts_first(index):
+    assert len(index) == 4
+    names = [product["beverage_name"] for product in index.search("cola")]
+    assert names == ["Cola Zero", "Diet Cola"]
+    assert [p["beverage_name"] for p in index.search("CHOC")] == ["Chocolate Milk"]
+    assert [p["beverage_name"] for p in index.search("cola", limit=1)] == ["Cola Zero"]
+    assert index.search("tea") == []
+    assert index.search("  ") == []
+
+
+def test_search_by_barcode_prefix(index):
+    assert [p["beverage_name"] for p in index.search("500011")] == ["Cola Zero", "Diet Cola"]
+    assert [p["beverage_name"] for p in index.search("0712345")] == ["Orange Juice"]
+    assert index.search("999") == []
+
+
+def test_products_keep_only_known_facts(index):
+    juice = index.search("orange")[0]
+    assert juice == {
+        "id": juice["id"], "beverage_name": "Orange Juice", "barcode": "0712345",
+        "beverage_type": "Juice", "is_100_percent": "True", "juice_serving_size": 8.0,
+    }
+    milk = index.search("chocolate")[0]
+    assert milk["is_flavored"] == "True" and milk["is_sweetened"] == "False"
+    assert "barcode" not in milk and "total_sugar" not in milk
+
+
+def test_open_product_index(tmp_path):
+    assert open_product_index(str(tmp_path / "missing.idx")) is None
+    path = tmp_path / "bad.idx"
+    path.write_bytes(b"not an index")
+    with pytest.raises(ProductIndexError):
+        open_product_index(str(path))
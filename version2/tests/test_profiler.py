@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from shiny import reactive
+
+from profiler import FIRST_RUN, OUTSIDE, UNTRACKED, ProfiledValue, ReactiveProfiler
+
+
+def test_runs_are_attributed_to_the_values_that_changed(tmp_path):
+    profiler = ReactiveProfiler(str(tmp_path))
+    count = ProfiledValue(1, "count", profiler)
+    other = ProfiledValue("a", "other", profiler)
+
+    def render():
+        with reactive.isolate():
+            return f"count={count.get() % 2}"
+
+    render = profiler.trace_observer("output", "count_text", render)
+    render()
+    count.set(3)
+    render()
+    count.set(4)
+    other.set("b")
+    render()
+    render()
+
+    stats = profiler.observers[("output", "count_text")]
+    assert stats.runs == 4
+    assert stats.causes == {FIRST_RUN: 1, "count": 2, UNTRACKED: 1}
+    # count 1 -> 3 and the untracked re-run rendered the same text
+    assert stats.redundant == 2
+    assert profiler.values["count"].setters == {OUTSIDE: 2}
+    assert "count;output count_text;redundant" in profiler.folded_stacks()
+
+
+def test_values_set_by_an_observer_and_sent_messages(tmp_path):
+    profiler = ReactiveProfiler(str(tmp_path))
+    total = ProfiledValue(0, "total", profiler)
+    sent = []
+
+    class Session:
+        async def send_custom_message(self, type, message):
+            sent.append((type, message))
+
+        def on_ended(self, fn):
+            self.ended = fn
+
+    session = Session()
+    profiler.watch_session(session)
+
+    async def effect():
+        with reactive.isolate():
+            total.set(total.get() + 1)
+        await session.send_custom_message("total", {"n": 1})
+
+    effect = profiler.trace_observer("effect", "update_total", effect)
+    asyncio.run(effect())
+    asyncio.run(effect())
+
+    assert sent == [("total", {"n": 1})] * 2
+    assert profiler.values["total"].setters == {"update_total": 2}
+    assert profiler.observers[("effect", "update_total")].redundant == 1
+
+    session.ended()
+    report = (tmp_path / "profile.txt").read_text()
+    assert "effect update_total" in report and "Redundant re-executions" in report
+    trace = json.loads((tmp_path / "profile.trace.json").read_text())
+    assert [event["args"]["redundant"] for event in trace["traceEvents"]] == [False, True]
+    assert (tmp_path / "profile.folded").read_text().startswith(FIRST_RUN)
@@ -0,0 +1,46 @@
+from rollups import UNSPECIFIED_SITE, SubmissionRollups
+
+
+def filled_rollups():
+    rollups = SubmissionRollups()
+    rollups.add("a", "Milk", "2026-01-01 10:05:00", "green", "Lansing")
+    rollups.add("b", "Milk", "2026-01-01 10:45:00", "red", "Lansing")
+    rollups.add("c", "Juice", "2026-01-01 11:00:00", "yellow", "Detroit")
+    rollups.add("d", "Other", "2026-01-01 11:30:00", "green")
+    return rollups
+
+
+def test_counts_by_dimension():
+    rollups = filled_rollups()
+    assert len(rollups) == 4
+    assert rollups.totals() == {"green": 2, "yellow": 1, "red": 1}
+    assert rollups.table("type") == [
+        ("Juice", 0, 1, 0, 1), ("Milk", 1, 0, 1, 2), ("Other", 1, 0, 0, 1)
+    ]
+    # Newest hour first
+    assert rollups.table("hour") == [
+        ("2026-01-01 11:00", 1, 1, 0, 2), ("2026-01-01 10:00", 1, 0, 1, 2)
+    ]
+    # Busiest site first
+    assert rollups.table("site") == [
+        ("Lansing", 1, 0, 1, 2), ("Detroit", 0, 1, 0, 1), (UNSPECIFIED_SITE, 1, 0, 0, 1)
+    ]
+
+
+def test_adds_are_idempotent():
+    rollups = filled_rollups()
+    version = rollups.version
+    assert not rollups.add("a", "Milk", "2026-01-01 10:05:00", "green", "Lansing")
+    assert not rollups.add("e", "Milk", "2026-01-01 10:05:00", None)
+    assert rollups.version == version
+    assert len(rollups) == 4
+
+
+def test_remove_takes_the_row_off_every_dimension():
+    rollups = filled_rollups()
+    assert rollups.remove("c")
+    assert not rollups.remove("c")
+    assert rollups.totals() == {"green": 2, "yellow": 0, "red": 1}
+    # Emptied groups disappear
+    assert [row[0] for row in rollups.table("type")] == ["Milk", "Other"]
+    assert [row[0] for row in rollups.table("site")] == ["Lansing", UNSPECIFIED_SITE]
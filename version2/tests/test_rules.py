@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+import rules
+from classify import classify_beverage
+from rules import GREEN, RED, YELLOW, GuidelineError, compile_rules, current_rules, reload_rules
+
+
+def table(**types):
+    return json.dumps({"name": "Test", "version": "1", "types": types})
+
+
+SODA = {
+    "valid": [{"input": "sugar", "op": ">=", "value": 0, "message": "Sugar can't be negative"}],
+    "criteria": [
+        {"id": "sweet", "input": "sugar", "op": ">", "value": 10, "reason": "sweet"},
+        {"id": "very_sweet", "input": "sugar", "op": ">", "value": 30, "reason": "very sweet"},
+        {"id": "diet", "input": "diet", "op": "is", "value": True, "reason": "diet"},
+    ],
+    "pass": {"result": "green", "reason": "fine"},
+    "fail": [{"result": "red", "when_any": ["very_sweet"]}, {"result": "yellow"}],
+}
+
+
+def test_outcomes_follow_the_fail_list():
+    ruleset = compile_rules(table(Soda=SODA))
+    assert classify_beverage("Soda", ruleset, sugar=5)["code"] == GREEN
+    assert classify_beverage("Soda", ruleset, sugar=5)["reason"] == "fine"
+    assert classify_beverage("Soda", ruleset, sugar=20)["code"] == YELLOW
+    assert classify_beverage("Soda", ruleset, sugar=20, diet="yes")["reason"] == "sweet, diet"
+    assert classify_beverage("Soda", ruleset, sugar=40)["code"] == RED
+
+
+def test_validation_messages_and_inputs():
+    compiled = compile_rules(table(Soda=SODA)).types["Soda"]
+    assert compiled.failed_validation({"sugar": "-1"}) == "Sugar can't be negative"
+    assert compiled.failed_validation({"sugar": "abc"}) == "Sugar can't be negative"
+    assert compiled.failed_validation({"sugar": "3"}) is None
+    assert compiled.inputs == {"sugar": rules.NUMBER, "diet": rules.FLAG}
+
+
+def test_comparing_two_inputs():
+    spec = {
+        "valid": [{"input": "added", "op": "<=", "value": {"input": "total"}}],
+        "pass": {"result": "green"},
+    }
+    compiled = compile_rules(table(Other=spec)).types["Other"]
+    assert compiled.failed_validation({"added": 2, "total": 5}) is None
+    assert compiled.failed_validation({"added": 6, "total": 5}) == rules.INVALID_REASON
+
+
+def test_sentence_case_reasons():
+    spec = dict(SODA, reason_case="sentence")
+    ruleset = compile_rules(table(Soda=spec))
+    assert classify_beverage("Soda", ruleset, sugar=20, diet=True)["reason"] == "Sweet, diet"
+
+
+@pytest.mark.parametrize("value, flag", [
+    (None, False), (True, True), (0, False), (1.0, True), (float("nan"), False),
+    ("Yes", True), (" true ", True), ("No", False), ("", False),
+])
+def test_as_flag(value, flag):
+    assert rules._as_flag(value) is flag
+
+
+@pytest.mark.parametrize("source, message", [
+    ("not json", "not valid JSON"),
+    (json.dumps({"types": []}), "'types'"),
+    (table(X={"pass": {"result": "blue"}}), "pass: result"),
+    (table(X={"criteria": [{"input": "a", "op": "~", "value": 1}], "pass": {"result": "green"}}), "unknown op"),
+    (table(X={"criteria": [{"input": "a", "op": "is", "value": 1}], "pass": {"result": "green"}}), "true or false"),
+    (table(X={"criteria": [{"input": "a", "op": ">", "value": 1}], "pass": {"result": "green"},
+              "fail": [{"result": "red", "when_any": ["a"]}]}), "unknown criterion"),
+    (table(X={"criteria": [{"id": "a", "input": "a", "op": ">", "value": 1}], "pass": {"result": "green"},
+              "fail": [{"result": "red", "when_any": ["a"]}]}), "without when_any"),
+    (table(X={"criteria": [{"input": "a", "op": ">", "value": 1}] * (rules.MAX_CRITERIA + 1),
+              "pass": {"result": "green"}, "fail": [{"result": "red"}]}), "at most"),
+])
+def test_broken_tables_are_rejected(source, message):
+    with pytest.raises(GuidelineError, match=message):
+        compile_rules(source)
+
+
+def test_reload_on_change_and_keep_the_old_table_on_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(rules, "_active", dict(rules._active))
+    path = tmp_path / "guidelines.json"
+    path.write_text(table(Soda=SODA), encoding="utf-8")
+    monkeypatch.setenv("SSC_GUIDELINES", str(path))
+
+    assert reload_rules()
+    first = current_rules()
+    assert list(first.types) == ["Soda"]
+    assert not reload_rules()
+
+    path.write_text("{ broken", encoding="utf-8")
+    bump_mtime(path)
+    assert not reload_rules()
+    assert current_rules() is first
+
+    path.write_text(table(Tea={"pass": {"result": "green"}}), encoding="utf-8")
+    bump_mtime(path)
+    assert reload_rules()
+    assert list(current_rules().types) == ["Tea"]
+    assert current_rules().key != first.key
+
+
+def bump_mtime(path):
+    # Make sure the mtime moves even on coarse-grained file systems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
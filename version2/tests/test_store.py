@@ -0,0 +1,135 @@
+import pytest
+
+from store import COLUMNS, MIN_COMPACT_ROWS, SubmissionStore
+
+
+def add(store, row_id, beverage_type="Milk", recommendation="green", timestamp="2026-01-01 10:00:00"):
+    store.append(row_id, timestamp, beverage_type, f"name {row_id}", recommendation, None)
+
+
+def test_append_and_read_back():
+    store = SubmissionStore()
+    add(store, "a")
+    store.append("b", "2026-01-01 11:00:00", "Other", "Soda", "red", "Too sweet")
+    assert len(store) == 2
+    assert "b" in store
+    assert store.get_row("b") == ("b", "2026-01-01 11:00:00", "Other", "Soda", "red", "Too sweet")
+    assert store.get("b") == dict(zip(COLUMNS, store.get_row("b")))
+    assert [row[0] for row in store.rows()] == ["a", "b"]
+    assert store.last_seq == 2
+
+
+def test_duplicate_row_id():
+    store = SubmissionStore()
+    add(store, "a")
+    with pytest.raises(KeyError):
+        add(store, "a")
+
+
+def test_unknown_categories_and_missing_values():
+    store = SubmissionStore()
+    store.append("a", "2026-01-01 10:00:00", "Smoothie", "x", None, None)
+    assert store.get_row("a")[2] == "Smoothie"
+    assert store.get_row("a")[4] is None
+
+
+def test_delete():
+    store = SubmissionStore()
+    for row_id in "abc":
+        add(store, row_id)
+    version = store.version
+    assert store.delete("b")
+    assert not store.delete("b")
+    assert len(store) == 2
+    assert "b" not in store
+    assert store.get_row("b") is None
+    assert [row[0] for row in store.rows()] == ["a", "c"]
+    assert store.version > version
+
+
+def test_delete_many_reports_sequence_numbers():
+    store = SubmissionStore()
+    for row_id in "abc":
+        add(store, row_id)
+    assert store.delete_many(["c", "x", "a"]) == [("c", 3), ("a", 1)]
+    assert [row[0] for row in store.rows()] == ["b"]
+
+
+def test_compaction_keeps_live_rows_and_sequence_numbers():
+    store = SubmissionStore()
+    count = MIN_COMPACT_ROWS * 2
+    for i in range(count):
+        add(store, f"r{i}")
+    layout_version = store.layout_version
+    # Deleting half of the rows compacts the tombstones away
+    store.delete_many([f"r{i}" for i in range(0, count, 2)])
+    assert store.layout_version > layout_version
+    assert len(store._row_ids) == len(store) == count // 2
+    assert [row[0] for row in store.rows()] == [f"r{i}" for i in range(1, count, 2)]
+    assert store.seq_of("r1") == 2
+    assert store.get_row(f"r{count - 1}")[0] == f"r{count - 1}"
+    # Sequence numbers are never reused
+    add(store, "new")
+    assert store.seq_of("new") == count + 1
+
+
+def test_few_deletes_do_not_compact():
+    store = SubmissionStore()
+    for i in range(10):
+        add(store, f"r{i}")
+    layout_version = store.layout_version
+    store.delete_many([f"r{i}" for i in range(8)])
+    assert store.layout_version == layout_version
+    assert len(store) == 2
+
+
+def test_clear():
+    store = SubmissionStore()
+    add(store, "a")
+    store.clear()
+    assert len(store) == 0
+    assert list(store.rows()) == []
+    add(store, "a")
+    assert len(store) == 1
+
+
+
+def filled_store():
+    store = SubmissionStore()
+    add(store, "a", "Milk", "green", "2026-01-01 10:00:00")
+    add(store, "b", "Other", "red", "2026-01-02 10:00:00")
+    add(store, "c", "Juice", "yellow", "2026-01-02 11:00:00")
+    add(store, "d", "Milk", "red", "2026-01-03 09:00:00")
+    return store
+
+
+def ids(store, positions):
+    return [row[0] for row in store.rows_at(positions)]
+
+
+def test_select_filters():
+    store = filled_store()
+    assert ids(store, store.select()) == ["a", "b", "c", "d"]
+    assert ids(store, store.select(beverage_type="Milk")) == ["a", "d"]
+    assert ids(store, store.select(recommendation="red")) == ["b", "d"]
+    assert ids(store, store.select(date_prefix="2026-01-02")) == ["b", "c"]
+    assert ids(store, store.select(beverage_type="Milk", recommendation="red")) == ["d"]
+    assert store.select(beverage_type="Tea") == []
+    assert store.select(recommendation="blue") == []
+
+
+def test_select_sorts():
+    store = filled_store()
+    assert ids(store, store.select(sort_by="Date", descending=True)) == ["d", "c", "b", "a"]
+    assert ids(store, store.select(sort_by="Type")) == ["c", "a", "d", "b"]
+    assert ids(store, store.select(sort_by="Result")) == ["a", "c", "b", "d"]
+
+
+def test_positions_survive_deletes():
+    store = filled_store()
+    positions = store.select()
+    layout_version = store.layout_version
+    store.delete("b")
+    assert store.layout_version == layout_version
+    assert ids(store, store.live_positions(positions)) == ["a", "c", "d"]
+    assert store.row_ids_at(store.live_positions(positions)) == ["a", "c", "d"]
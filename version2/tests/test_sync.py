@@ -0,0 +1,223 @@
+import asyncio
+import http.server
+import json
+import threading
+
+import pytest
+
+from backend import MemoryBackend
+from store import SubmissionStore
+from sync import DELETED, PENDING, SYNCED, SharedSheetSync, SheetSync, SyncError, SyncTracker
+
+
+class Endpoint(http.server.ThreadingHTTPServer):
+    """Stand-in for the Apps Script endpoint: answers with the queued
+    statuses (then 200) and keeps the JSON bodies it was sent."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), EndpointHandler)
+        self.statuses = []
+        self.bodies = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/"
+
+
+class EndpointHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == 200:
+            self.server.bodies.append(body)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    server = Endpoint()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def records(*row_ids):
+    return [{"RowID": row_id} for row_id in row_ids]
+
+
+def test_submit_splits_into_batches(endpoint):
+    sync = SheetSync(endpoint.url, max_batch_rows=2)
+    assert asyncio.run(sync.submit(records("a", "b", "c"))) == 3
+    assert [row["RowID"] for body in endpoint.bodies for row in body] == ["a", "b", "c"]
+    assert all(len(body) <= 2 for body in endpoint.bodies)
+
+
+def test_concurrent_submits_are_coalesced(endpoint):
+    sync = SheetSync(endpoint.url)
+
+    async def submit_all():
+        await asyncio.gather(*(sync.submit(records(f"r{i}")) for i in range(5)))
+
+    asyncio.run(submit_all())
+    assert sorted(row["RowID"] for body in endpoint.bodies for row in body) == [f"r{i}" for i in range(5)]
+    assert len(endpoint.bodies) < 5
+
+
+def test_server_errors_are_retried(endpoint):
+    endpoint.statuses = [500, 429]
+    sync = SheetSync(endpoint.url, backoff_base=0.01)
+    asyncio.run(sync.submit(records("a")))
+    assert endpoint.bodies == [records("a")]
+
+
+def test_gives_up_after_the_retries(endpoint):
+    endpoint.statuses = [503] * 3
+    sync = SheetSync(endpoint.url, max_retries=2, backoff_base=0.01)
+    with pytest.raises(SyncError, match="503"):
+        asyncio.run(sync.submit(records("a")))
+
+
+def test_client_errors_are_not_retried(endpoint):
+    endpoint.statuses = [400]
+    sync = SheetSync(endpoint.url, backoff_base=0.01)
+    with pytest.raises(SyncError, match="400"):
+        asyncio.run(sync.submit(records("a")))
+    assert endpoint.statuses == []
+    assert endpoint.bodies == []
+
+
+def tracked_store(*row_ids):
+    store = SubmissionStore()
+    for row_id in row_ids:
+        store.append(row_id, "2026-01-01 10:00:00", "Milk", row_id, "green", None)
+    return store, SyncTracker(store)
+
+
+def delete(store, tracker, row_id):
+    for deleted_id, seq in store.delete_many([row_id]):
+        tracker.record_delete(deleted_id, seq)
+
+
+def uploaded(records):
+    return [(record["RowID"], record.get("Deleted", False)) for record in records]
+
+
+def test_tracker_uploads_only_new_rows():
+    store, tracker = tracked_store("a", "b")
+    assert tracker.has_changes()
+    assert uploaded(tracker.begin()) == [("a", False), ("b", False)]
+    assert tracker.in_flight
+    tracker.commit()
+    assert not tracker.in_flight
+    assert not tracker.has_changes()
+    assert tracker.state("a") == SYNCED
+
+    store.append("c", "2026-01-01 11:00:00", "Milk", "c", "green", None)
+    assert tracker.state("c") == PENDING
+    assert uploaded(tracker.begin()) == [("c", False)]
+
+
+def test_deleting_an_uploaded_row_sends_a_tombstone():
+    store, tracker = tracked_store("a", "b")
+    tracker.begin()
+    tracker.commit()
+    delete(store, tracker, "a")
+    assert tracker.state("a") == DELETED
+    assert tracker.tombstones == ["a"]
+    assert uploaded(tracker.begin()) == [("a", True)]
+    tracker.commit()
+    assert tracker.tombstones == []
+    assert not tracker.has_changes()
+
+
+def test_deleting_a_pending_row_sends_nothing():
+    store, tracker = tracked_store("a")
+    delete(store, tracker, "a")
+    assert tracker.tombstones == []
+    assert not tracker.has_changes()
+
+
+def test_deleting_a_row_while_it_uploads_sends_a_tombstone():
+    store, tracker = tracked_store("a")
+    tracker.begin()
+    delete(store, tracker, "a")
+    tracker.commit()
+    # The upload carried the row, so the sheet needs the tombstone next time
+    assert uploaded(tracker.begin()) == [("a", True)]
+
+
+def test_failed_upload_keeps_everything_pending():
+    store, tracker = tracked_store("a", "b")
+    tracker.begin()
+    tracker.commit()
+    delete(store, tracker, "a")
+    store.append("c", "2026-01-01 11:00:00", "Milk", "c", "green", None)
+    first = uploaded(tracker.begin())
+    tracker.abort()
+    assert not tracker.in_flight
+    assert uploaded(tracker.begin()) == first == [("c", False), ("a", True)]
+
+
+def test_restore_checkpoint():
+    store, tracker = tracked_store("a", "b", "c")
+    tracker.restore(2, ["x"])
+    assert uploaded(tracker.begin()) == [("c", False), ("x", True)]
+
+
+def shared_sync(url, backend, **options):
+    return SharedSheetSync(url, backend, "worker-1", poll_interval=0.01, backoff_base=0.01, backoff_max=0.05,
+                           max_batch_rows=2, **options)
+
+
+def test_shared_sync_sends_through_the_outbox(endpoint):
+    async def run():
+        backend = MemoryBackend()
+        sync = shared_sync(endpoint.url, backend)
+        assert await sync.submit(records("a", "b", "c")) == 3
+        # Finished batches are collected by the submitter
+        assert backend.pending_sync() == 0 and backend.sync_status([1, 2]) == {}
+    asyncio.run(run())
+    assert [row["RowID"] for body in endpoint.bodies for row in body] == ["a", "b", "c"]
+
+
+def test_shared_sync_restarts_a_dead_uploader(endpoint):
+    async def run():
+        sync = shared_sync(endpoint.url, MemoryBackend())
+
+        async def crash():
+            raise RuntimeError("uploader died")
+
+        sync._wake = asyncio.Event()
+        sync._worker = asyncio.get_running_loop().create_task(crash())
+        await asyncio.sleep(0)
+        assert await sync.submit(records("a")) == 1
+    asyncio.run(run())
+
+
+def test_shared_sync_times_out_and_drops_its_batches():
+    async def run():
+        backend = MemoryBackend()
+        # Another worker holds the batch's lease and never finishes it
+        sync = shared_sync("http://127.0.0.1:9/", backend, wait_timeout=0.1)
+        sync._wake = asyncio.Event()
+        sync._worker = asyncio.get_running_loop().create_future()
+        original_enqueue = backend.enqueue_sync
+
+        def enqueue_and_lose(rows):
+            batch_id = original_enqueue(rows)
+            backend.claim_sync("elsewhere", 10, lease=60)
+            return batch_id
+
+        backend.enqueue_sync = enqueue_and_lose
+        with pytest.raises(SyncError, match="Timed out"):
+            await sync.submit(records("a"))
+        assert backend.pending_sync() == 0
+        sync._worker.cancel()
+    asyncio.run(run())